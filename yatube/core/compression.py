@@ -0,0 +1,134 @@
+"""Сжатие ответов gzip или brotli.
+
+Кэшируемые страницы (index под cache_page, ленты с ETag) отдаются
+одинаковыми байтами много раз подряд, поэтому их сжатое тело лежит в
+кэше под ключом из кодировки и md5 несжатого тела: на попадании CPU на
+сжатие не тратится, а сжимаем один раз, зато на максимальном уровне.
+Остальные ответы сжимаем на лету, потоковые - по кускам, не собирая
+тело в памяти. brotli - необязательная зависимость (pip install brotli),
+без неё отдаём только gzip.
+"""
+import re
+from gzip import GzipFile
+from hashlib import md5
+from io import BytesIO
+
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.text import StreamingBuffer
+
+from yatube.settings import (COMPRESS_CONTENT_TYPES, COMPRESS_MIN_LENGTH,
+                             COMPRESSED_CACHE_TIMEOUT)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPT_RE = re.compile(r'(?:^|,)\s*([a-z*]+)\s*(?:;\s*q=([0-9.]+))?', re.I)
+MAX_AGE_RE = re.compile(r'\bmax-age=(\d+)')
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' или None - что умеет клиент и что умеем мы."""
+    accepted = set()
+    for match in ACCEPT_RE.finditer(accept_encoding):
+        try:
+            quality = float(match.group(2) or 1)
+        except ValueError:
+            continue
+        if quality > 0:
+            accepted.add(match.group(1).lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, best=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    buffer = BytesIO()
+    with GzipFile(mode='wb', compresslevel=9 if best else 6,
+                  fileobj=buffer, mtime=0) as file:
+        file.write(data)
+    return buffer.getvalue()
+
+
+def compress_stream(chunks, encoding):
+    """Сжимаем поток по кускам, как django.utils.text.compress_sequence."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    buffer = StreamingBuffer()
+    with GzipFile(mode='wb', compresslevel=6, fileobj=buffer,
+                  mtime=0) as file:
+        for chunk in chunks:
+            file.write(chunk)
+            # Без flush GzipFile копит вывод, и клиент ждёт весь ответ
+            file.flush()
+            data = buffer.read()
+            if data:
+                yield data
+    yield buffer.read()
+
+
+def compressible(response):
+    if response.has_header('Content-Encoding') or response.status_code == 206:
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    if not content_type.startswith(COMPRESS_CONTENT_TYPES):
+        return False
+    return response.streaming or len(response.content) >= COMPRESS_MIN_LENGTH
+
+
+def cacheable(response):
+    """Ответ одинаков для многих запросов: есть ETag или общий max-age."""
+    cache_control = response.get('Cache-Control', '')
+    if 'private' in cache_control or 'no-store' in cache_control:
+        return False
+    match = MAX_AGE_RE.search(cache_control)
+    return response.has_header('ETag') or bool(match and int(match.group(1)))
+
+
+def cached_compress(content, encoding):
+    key = f'compressed:{encoding}:{md5(content).hexdigest()}'
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(content, encoding, best=True)
+        cache.set(key, compressed, COMPRESSED_CACHE_TIMEOUT)
+    return compressed
+
+
+def compress_response(response, encoding):
+    """Сжатый ответ и Vary: Accept-Encoding; несжимаемые - как есть."""
+    if not compressible(response):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if encoding is None:
+        return response
+    if response.streaming:
+        response.streaming_content = compress_stream(
+            response.streaming_content, encoding)
+        del response['Content-Length']
+    else:
+        if cacheable(response):
+            compressed = cached_compress(response.content, encoding)
+        else:
+            compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+    # Сильный ETag у сжатого тела становится слабым (RFC 7232, 2.1)
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    response['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,70 @@
+"""Текст постов и комментариев в HTML: немного Markdown, ссылки и переносы.
+
+Рендерим один раз при сохранении, в шаблоне выводим готовый HTML.
+Весь пользовательский текст экранируется, ссылки - только http(s).
+При любом изменении вывода увеличивайте FORMATTER_VERSION и
+перерендерьте старые записи командой render_texts.
+"""
+import re
+
+from django.urls import reverse
+from django.utils.html import escape
+
+FORMATTER_VERSION = 2
+
+HASHTAG_PATTERN = r'(?<![\w&/#])#(?P<tag>\w{1,100})'
+HASHTAG_RE = re.compile(HASHTAG_PATTERN)
+
+INLINE_RE = re.compile(
+    r'`(?P<code>[^`\n]+)`'
+    r'|\[(?P<label>[^\]\n]+)\]\((?P<href>https?://[^\s)<>"]+)\)'
+    r'|(?P<url>https?://[^\s<>"]*[^\s<>".,:;!?)\]\'])'
+    r'|\*\*(?P<strong>[^*\s](?:[^*\n]*[^*\s])?)\*\*'
+    r'|\*(?P<em>[^*\s](?:[^*\n]*[^*\s])?)\*'
+    r'|' + HASHTAG_PATTERN
+)
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+
+
+def link(href, label):
+    return (f'<a href="{escape(href)}" rel="nofollow noopener" '
+            f'target="_blank">{label}</a>')
+
+
+def render_inline(text):
+    """Строчная разметка: `код`, [ссылка](url), url, **жирный**, *курсив*
+    и #теги.
+    """
+    parts = []
+    position = 0
+    for match in INLINE_RE.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        position = match.end()
+        if match.group('code'):
+            parts.append(f'<code>{escape(match.group("code"))}</code>')
+        elif match.group('href'):
+            parts.append(
+                link(match.group('href'), escape(match.group('label'))))
+        elif match.group('url'):
+            parts.append(link(match.group('url'), escape(match.group('url'))))
+        elif match.group('tag'):
+            tag = match.group('tag')
+            href = reverse('posts:tag_posts', args=[tag.lower()])
+            parts.append(f'<a href="{escape(href)}">#{escape(tag)}</a>')
+        elif match.group('strong'):
+            parts.append(
+                f'<strong>{render_inline(match.group("strong"))}</strong>')
+        else:
+            parts.append(f'<em>{render_inline(match.group("em"))}</em>')
+    parts.append(escape(text[position:]))
+    return ''.join(parts)
+
+
+def render_text(text):
+    """Абзацы по пустым строкам, внутри абзаца перенос строки - <br>."""
+    text = text.replace('\r\n', '\n').replace('\r', '\n').strip()
+    paragraphs = [
+        render_inline(paragraph.strip()).replace('\n', '<br>\n')
+        for paragraph in PARAGRAPH_RE.split(text) if paragraph.strip()
+    ]
+    return '\n'.join(f'<p>{paragraph}</p>' for paragraph in paragraphs)
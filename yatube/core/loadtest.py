@@ -0,0 +1,207 @@
+"""Нагрузочный прогон: локальный WSGI-сервер на нескольких процессах
+и asyncio-клиент, который гоняет по нему сценарии пользователей.
+"""
+import asyncio
+import random
+import re
+import socket
+import time
+from collections import defaultdict
+from multiprocessing import get_context
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.db import connections
+
+from .stats import percentile
+
+CSRF_COOKIE_RE = re.compile(r'csrftoken=([^;]+)')
+
+
+class QuietHandler(WSGIRequestHandler):
+    """Обработчик без лога каждого запроса в stderr."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(sock):
+    """Воркер: обслуживает общий слушающий сокет."""
+    from yatube.wsgi import application
+
+    server = WSGIServer(
+        sock.getsockname(), QuietHandler, bind_and_activate=False)
+    server.socket = sock
+    # Обычно это делает server_bind(), но сокет уже привязан родителем
+    server.server_name, server.server_port = sock.getsockname()[:2]
+    server.setup_environ()
+    server.set_app(application)
+    server.serve_forever()
+
+
+def start_server(workers, port=0):
+    """Форкаем workers процессов на одном сокете, возвращаем их и порт."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', port))
+    sock.listen(1024)
+    # Дочерним процессам нужны свои соединения с базой
+    connections.close_all()
+    context = get_context('fork')
+    processes = [
+        context.Process(target=serve, args=(sock,), daemon=True)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    return processes, sock.getsockname()[1]
+
+
+def stop_server(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+class Stats:
+    """Латентности и ошибки по маршрутам."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, route, latency, ok):
+        self.latencies[route].append(latency)
+        if not ok:
+            self.errors[route] += 1
+
+    def report(self, duration):
+        """Строки отчёта: запросы, rps, ошибки и перцентили в мс."""
+        lines = [
+            f'{"route":<24}{"reqs":>8}{"rps":>9}{"err%":>7}'
+            f'{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}'
+        ]
+        total = []
+        for route in sorted(self.latencies):
+            latencies = sorted(self.latencies[route])
+            total.extend(latencies)
+            lines.append(self._line(
+                route, latencies, self.errors[route], duration))
+        lines.append(self._line(
+            'TOTAL', sorted(total), sum(self.errors.values()), duration))
+        return lines
+
+    @staticmethod
+    def _line(route, latencies, errors, duration):
+        count = len(latencies)
+        return (
+            f'{route:<24}{count:>8}{count / duration:>9.1f}'
+            f'{100 * errors / max(count, 1):>7.1f}'
+            + ''.join(
+                f'{1000 * percentile(latencies, p):>9.1f}'
+                for p in (50, 95, 99, 100)
+            )
+        )
+
+
+class VirtualUser:
+    """Один пользователь: анонимный или с готовой сессией."""
+
+    def __init__(self, port, data, stats, session_key=None):
+        self.port = port
+        self.data = data
+        self.stats = stats
+        self.cookies = {}
+        if session_key:
+            self.cookies['sessionid'] = session_key
+
+    async def request(self, route, path, method='GET', body=b''):
+        """Один HTTP/1.0-запрос, соединение на запрос как в wsgiref."""
+        started = time.perf_counter()
+        headers = [
+            f'{method} {path} HTTP/1.0',
+            f'Host: 127.0.0.1:{self.port}',
+            f'Content-Length: {len(body)}',
+        ]
+        if self.cookies:
+            headers.append('Cookie: ' + '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()))
+        if method == 'POST':
+            headers.append('Content-Type: application/x-www-form-urlencoded')
+            headers.append(f'X-CSRFToken: {self.cookies.get("csrftoken")}')
+        try:
+            reader, writer = await asyncio.open_connection(
+                '127.0.0.1', self.port)
+            writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            head = response.split(b'\r\n\r\n', 1)[0].decode('latin-1')
+            status = int(head.split(' ', 2)[1])
+        except (OSError, ValueError, IndexError):
+            head, status = '', 0
+        match = CSRF_COOKIE_RE.search(head)
+        if match:
+            self.cookies['csrftoken'] = match.group(1)
+        self.stats.add(
+            route, time.perf_counter() - started, 0 < status < 400)
+
+    async def browse(self):
+        data = self.data
+        choice = random.random()
+        if 0.4 <= choice < 0.55 and data['groups']:
+            slug = random.choice(data['groups'])
+            await self.request('group_list', f'/group/{slug}/')
+        elif 0.55 <= choice < 0.7 and data['usernames']:
+            username = random.choice(data['usernames'])
+            await self.request('profile', f'/profile/{username}/')
+        elif choice >= 0.7 and data['posts']:
+            post_id = random.choice(data['posts'])
+            await self.request('post_detail', f'/posts/{post_id}/')
+        else:
+            await self.request('index', '/')
+
+    async def act(self):
+        """Действия залогиненного: лента подписок, лайк, коммент, подписка."""
+        data = self.data
+        choice = random.random()
+        if choice < 0.5 or not data['posts']:
+            await (self.request('follow_index', '/follow/')
+                   if choice < 0.2 else self.browse())
+            return
+        post_id = random.choice(data['posts'])
+        if choice < 0.65:
+            action = random.choice(('like', 'unlike'))
+            await self.request(
+                f'post_{action}', f'/posts/{post_id}/{action}/')
+        elif choice < 0.8:
+            if 'csrftoken' not in self.cookies:
+                await self.request('post_detail', f'/posts/{post_id}/')
+            await self.request(
+                'add_comment', f'/posts/{post_id}/comment/', 'POST',
+                urlencode({'text': 'Нагрузочный коммент'}).encode())
+        elif data['usernames']:
+            username = random.choice(data['usernames'])
+            action = random.choice(('follow', 'unfollow'))
+            await self.request(
+                f'profile_{action}', f'/profile/{username}/{action}/')
+
+    async def run(self, deadline):
+        while time.monotonic() < deadline:
+            if 'sessionid' in self.cookies:
+                await self.act()
+            else:
+                await self.browse()
+
+
+async def run_load(port, data, session_keys, duration):
+    """Гоняем по виртуальному юзеру на каждый ключ сессии (None - аноним)."""
+    stats = Stats()
+    deadline = time.monotonic() + duration
+    users = [
+        VirtualUser(port, data, stats, session_key)
+        for session_key in session_keys
+    ]
+    await asyncio.gather(*(user.run(deadline) for user in users))
+    return stats
@@ -0,0 +1,52 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+FEED = ('{% load post_cards %}{% for post in posts %}CARD'
+        '{% if not forloop.last %}<hr>{% endif %}{% endfor %}')
+CARDS = (
+    ('include', "{% include 'includes/post.html' %}"),
+    ('post_card', '{% post_card post %}'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает рендер ленты через include и через тег post_card '
+            'на 10 и 100 карточках. База не нужна, посты в памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 100],
+            help='Сколько карточек в ленте.')
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Сколько раз рендерить каждую ленту.')
+
+    def handle(self, *args, **options):
+        author = User(id=1, username='writer', first_name='Лев',
+                      last_name='Толстой')
+        group = Group(id=1, title='Классика', slug='classic')
+        now = timezone.now()
+        for size in options['sizes']:
+            posts = []
+            for i in range(1, size + 1):
+                post = Post(id=i, author=author, text=f'Пост {i}',
+                            group=group if i % 2 else None, pub_date=now)
+                post.likes_count, post.comments_count = i, i // 2
+                post.liked = i % 3 == 0
+                posts.append(post)
+            timings = {}
+            for name, card in CARDS:
+                template = Template(FEED.replace('CARD', card))
+                seconds = min(timeit.repeat(
+                    lambda: template.render(Context({'posts': posts})),
+                    number=options['repeat'], repeat=3))
+                timings[name] = seconds / options['repeat'] * 1000
+            self.stdout.write(
+                f'{size:>5} карточек: include {timings["include"]:.2f} мс, '
+                f'post_card {timings["post_card"]:.2f} мс '
+                f'(x{timings["include"] / timings["post_card"]:.1f})')
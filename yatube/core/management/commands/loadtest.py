@@ -0,0 +1,79 @@
+import asyncio
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Group, Post
+
+from ...loadtest import run_load, start_server, stop_server
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Поднимает yatube.wsgi.application на нескольких процессах '
+            'и гоняет по нему смесь анонимных и залогиненных сценариев.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число процессов сервера.')
+        parser.add_argument(
+            '--port', type=int, default=0,
+            help='Порт сервера, по умолчанию любой свободный.')
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='Сколько виртуальных юзеров работает одновременно.')
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность прогона в секундах.')
+        parser.add_argument(
+            '--logged-in', type=float, default=0.5,
+            help='Доля залогиненных виртуальных юзеров, от 0 до 1.')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        logged_in = round(concurrency * options['logged_in'])
+        users = list(User.objects.filter(is_active=True)[:logged_in])
+        if logged_in and not users:
+            raise CommandError('Для залогиненных сценариев нужны юзеры.')
+        data = {
+            'posts': list(Post.objects.values_list('id', flat=True)[:200]),
+            'groups': list(Group.objects.values_list('slug', flat=True)),
+            'usernames': list(
+                User.objects.values_list('username', flat=True)[:200]),
+        }
+        session_keys = [
+            self.login(users[i % len(users)]) for i in range(logged_in)
+        ]
+        session_keys += [None] * (concurrency - logged_in)
+
+        processes, port = start_server(options['workers'], options['port'])
+        self.stdout.write(
+            f'Сервер: http://127.0.0.1:{port}/, '
+            f'процессов {options["workers"]}, юзеров {concurrency} '
+            f'(залогиненных {logged_in}), {options["duration"]} с.')
+        try:
+            stats = asyncio.run(
+                run_load(port, data, session_keys, options['duration']))
+        finally:
+            stop_server(processes)
+            Session.objects.filter(
+                session_key__in=[key for key in session_keys if key]
+            ).delete()
+        for line in stats.report(options['duration']):
+            self.stdout.write(line)
+
+    @staticmethod
+    def login(user):
+        """Сессия залогиненного юзера без пароля, как force_login."""
+        session = SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from yatube.settings import PROFILE_TOKEN_MAX_AGE
+
+from ...profiling import make_token
+
+
+class Command(BaseCommand):
+    help = 'Выдаёт токен для заголовка X-Profile, включающего профиль запроса.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token())
+        self.stderr.write(
+            f'Токен действует {PROFILE_TOKEN_MAX_AGE} с: '
+            f'curl -H "X-Profile: <токен>" ...')
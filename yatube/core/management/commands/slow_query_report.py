@@ -0,0 +1,67 @@
+import glob
+import json
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand
+
+from yatube.settings import SLOW_QUERY_LOG
+
+from ...stats import percentile
+
+
+class Command(BaseCommand):
+    help = ('Сводка по логу медленных запросов: группы по отпечатку '
+            'запроса с суммарным временем и p95.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Файлы лога, по умолчанию SLOW_QUERY_LOG и его ротации.')
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='Сколько запросов показать.')
+        parser.add_argument(
+            '--sort', choices=('total', 'p95', 'count'), default='total',
+            help='По чему сортировать.')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or sorted(glob.glob(SLOW_QUERY_LOG + '*'))
+        groups = defaultdict(list)
+        for path in paths:
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    groups[entry['fingerprint']].append(entry)
+        if not groups:
+            self.stdout.write('Медленных запросов нет.')
+            return
+
+        rows = []
+        for key, entries in groups.items():
+            durations = sorted(entry['duration_ms'] for entry in entries)
+            rows.append({
+                'fingerprint': key,
+                'count': len(entries),
+                'total': sum(durations),
+                'p95': percentile(durations, 95),
+                'entries': entries,
+            })
+        rows.sort(key=lambda row: row[options['sort']], reverse=True)
+        self.stdout.write(
+            f'{"отпечаток":<14}{"раз":>7}{"всего, мс":>12}{"p95, мс":>10}')
+        for row in rows[:options['top']]:
+            self.stdout.write(
+                f'{row["fingerprint"]:<14}{row["count"]:>7}'
+                f'{row["total"]:>12.1f}{row["p95"]:>10.1f}')
+            entries = row['entries']
+            self.stdout.write(f'  {entries[-1]["sql"]}')
+            for name, label in (('view', 'view'), ('caller', 'код')):
+                counts = Counter(entry.get(name) for entry in entries)
+                self.stdout.write('  {}: {}'.format(label, ', '.join(
+                    f'{value} ({count})'
+                    for value, count in counts.most_common(3))))
+            for step in entries[-1].get('plan') or []:
+                self.stdout.write(f'  план: {step}')
@@ -0,0 +1,149 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core.storage import post_images
+from posts.models import Group, Post, visible_users
+from yatube.settings import POSTS_PER_PAGE, WARM_INDEX_PAGES, WARM_TOP_COUNT
+
+from ... import warmup
+from ...loadtest import Stats
+from ...templatetags.post_cards import (DETAIL_THUMBNAIL_OPTIONS,
+                                        THUMBNAIL_GEOMETRY)
+
+# Превью, которые режут шаблоны: карточка в ленте и страница поста
+THUMBNAILS = (
+    (THUMBNAIL_GEOMETRY, {}),
+    (THUMBNAIL_GEOMETRY, DETAIL_THUMBNAIL_OPTIONS),
+)
+
+
+def images(posts, count=POSTS_PER_PAGE):
+    """Картинки первых count постов выборки."""
+    return [name for name in posts.values_list('image', flat=True)[:count]
+            if name]
+
+
+class Command(BaseCommand):
+    help = ('Прогрев после деплоя. Режет превью картинок первых страниц '
+            'ленты, популярных групп, профилей и постов - они общие для '
+            'всех процессов. Затем запрашивает эти страницы у сервера: '
+            'процесс, который их отдал, запоминает строки kvstore превью, '
+            'копии страниц для деградированного режима и сжатые тела '
+            'кэшируемых. Сами страницы в кэше не лежат, кроме общей ленты '
+            '- на 5 секунд. Печатает, сколько это заняло.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000',
+            help='Адрес сервера, кэши которого греем.')
+        parser.add_argument(
+            '--pages', type=int, default=WARM_INDEX_PAGES,
+            help='Сколько страниц общей ленты греть.')
+        parser.add_argument(
+            '--top', type=int, default=WARM_TOP_COUNT,
+            help='Сколько популярных групп, профилей и постов греть.')
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Сколько запросов и превью делать одновременно.')
+        parser.add_argument(
+            '--passes', type=int, default=1,
+            help='Сколько раз запрашивать каждую страницу. Кэши у '
+                 'процессов сервера свои, а запрос попадает в процесс, '
+                 'который выберет сервер: больше проходов - больше шанс '
+                 'застать каждый, но не гарантия.')
+        parser.add_argument(
+            '--timeout', type=float, default=30,
+            help='Таймаут одного запроса в секундах.')
+
+    def handle(self, *args, **options):
+        self.timeout = options['timeout']
+        self.token = warmup.make_token()
+        pages, names = self.collect(options['pages'], options['top'])
+        urls = [(route, options['url'].rstrip('/') + path)
+                for route, path in pages] * options['passes']
+        stats = Stats()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            # Сначала превью: страницы тогда отрендерятся без их нарезки
+            for latency, ok in pool.map(self.thumbnail, names):
+                stats.add('thumbnail', latency, ok)
+            results = pool.map(self.fetch, [url for _, url in urls])
+            for (route, _), (latency, ok) in zip(urls, results):
+                stats.add(route, latency, ok)
+        duration = time.perf_counter() - started
+        for line in stats.report(duration):
+            self.stdout.write(line)
+        self.stdout.write(
+            f'Прогрев занял {duration:.2f} с: запросов {len(urls)}, '
+            f'картинок {len(names)}')
+
+    @staticmethod
+    def collect(pages, top):
+        """[(маршрут, путь)] страниц и картинки постов на них."""
+        posts = Post.objects.visible()
+        targets = [
+            ('index', reverse('posts:index') + (f'?page={n}' if n > 1 else ''))
+            for n in range(1, pages + 1)
+        ]
+        names = images(posts, pages * POSTS_PER_PAGE)
+        groups = Group.objects.filter(pending_deletion=False).annotate(
+            count=Count('posts')).order_by('-count').values_list(
+            'id', 'slug')[:top]
+        for group_id, slug in groups:
+            targets.append(('group_list', reverse('posts:group_list',
+                                                  args=[slug])))
+            names += images(posts.filter(group_id=group_id))
+        authors = visible_users().annotate(
+            count=Count('following')).order_by('-count').values_list(
+            'id', 'username')[:top]
+        for author_id, username in authors:
+            targets.append(('profile', reverse('posts:profile',
+                                               args=[username])))
+            names += images(posts.filter(author_id=author_id))
+        for post_id, name in posts.order_by('-views').values_list(
+                'id', 'image')[:top]:
+            targets.append(('post_detail', reverse('posts:post_detail',
+                                                   args=[post_id])))
+            if name:
+                names.append(name)
+        return targets, sorted(set(names))
+
+    @staticmethod
+    def thumbnail(name):
+        """Режем превью картинки, если их ещё нет."""
+        started = time.perf_counter()
+        try:
+            image = ImageFile(name, storage=post_images)
+            for geometry, options in THUMBNAILS:
+                get_thumbnail(image, geometry, **options)
+            ok = True
+        except OSError:
+            ok = False
+        finally:
+            # Поток пула открыл своё соединение с базой для kvstore
+            connection.close()
+        return time.perf_counter() - started, ok
+
+    def fetch(self, url):
+        """GET страницы анонимом; сжатие просим, чтобы прогреть и его.
+
+        Подписанный X-Warmup - чтобы прогрев не считался просмотром.
+        """
+        started = time.perf_counter()
+        request = Request(url, headers={
+            'Accept-Encoding': 'br, gzip', 'X-Warmup': self.token})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            ok = True
+        except (OSError, ValueError):
+            ok = False
+        return time.perf_counter() - started, ok
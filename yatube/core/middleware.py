@@ -0,0 +1,112 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from yatube.settings import (OVERLOAD_SHED_VIEWS, OVERLOAD_STALE_VIEWS,
+                             SLOW_QUERY_THRESHOLD_MS)
+
+from . import compression, overload, profiling
+from .slow_queries import SlowQueryLogger, current_view
+
+
+class SlowQueryMiddleware:
+    """Медленные запросы к базе в лог вместе с view, см. core.slow_queries.
+
+    Запросы потоковых ответов идут уже после middleware и в лог не попадают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.wrapper = SlowQueryLogger(SLOW_QUERY_THRESHOLD_MS)
+
+    def __call__(self, request):
+        token = current_view.set(None)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.wrapper))
+                return self.get_response(request)
+        finally:
+            current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        current_view.set(match.view_name if match else view_func.__qualname__)
+
+
+class ProfilerMiddleware:
+    """Профиль запроса по требованию, см. core.profiling.
+
+    Стоит после AuthenticationMiddleware: для ?_profile нужен request.user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.requested(request):
+            return self.get_response(request)
+        response, profiler, stacks, duration_ms = profiling.profile_call(
+            self.get_response, request)
+        response['X-Profile-Id'] = profiling.save(
+            request, profiler, stacks, duration_ms)
+        return response
+
+
+class CompressionMiddleware:
+    """gzip или brotli по Accept-Encoding, см. core.compression.
+
+    Стоит выше всех, кто меняет тело ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        encoding = compression.choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        return compression.compress_response(response, encoding)
+
+
+class OverloadMiddleware:
+    """Деградированный режим под перегрузкой, см. core.overload.
+
+    Стоит сразу за сжатием: устаревшие копии страниц тоже сжимаются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        monitor = overload.monitor
+        monitor.start()
+        start = time.perf_counter()
+        try:
+            request.degraded = monitor.degraded()
+            if request.degraded:
+                monitor.count('degraded')
+            response = self.get_response(request)
+        finally:
+            match = getattr(request, 'resolver_match', None)
+            monitor.finish(match.view_name if match else None,
+                           (time.perf_counter() - start) * 1000)
+        if (not request.degraded and match
+                and match.view_name in OVERLOAD_STALE_VIEWS):
+            overload.remember(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not request.degraded:
+            return None
+        view_name = request.resolver_match.view_name
+        if view_name in OVERLOAD_SHED_VIEWS:
+            overload.monitor.count('shed')
+            return overload.shed_response()
+        if view_name in OVERLOAD_STALE_VIEWS:
+            response = overload.stale_response(request)
+            overload.monitor.count('stale' if response else 'stale_miss')
+            return response
+        return None
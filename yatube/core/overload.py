@@ -0,0 +1,173 @@
+"""Сброс нагрузки: деградированный режим под перегрузкой.
+
+LoadMonitor процесса считает запросы в работе и скользящее среднее
+(EWMA) времени ответа по каждому view и по всем вместе. Когда в работе
+больше OVERLOAD_MAX_IN_FLIGHT запросов или среднее выше
+OVERLOAD_LATENCY_MS, процесс переходит в деградированный режим, а
+выходит из него, когда оба показателя опускаются вдвое ниже порогов:
+- анонимам страницы из OVERLOAD_STALE_VIEWS отдаются из устаревшей
+  копии, которую мы сохраняем в нормальном режиме;
+- view пропускают счётчики и комментарии (request.degraded);
+- некритичные записи из OVERLOAD_SHED_VIEWS сразу получают 503
+  с Retry-After.
+Копия хранится по пути и номеру страницы (не дальше
+OVERLOAD_STALE_MAX_PAGE), страницы с другими параметрами не копируются.
+В ключе - общая версия: drop_stale() после скрытия поста или удаления
+в админке разом делает копии всех процессов недействительными.
+Staff может включить или выключить режим руками на /staff/overload/:
+ручной режим общий для всех процессов (core.shared), а состояние и
+счётчики событий у каждого процесса свои.
+"""
+import threading
+import time
+from collections import Counter
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from yatube.settings import (OVERLOAD_LATENCY_MS, OVERLOAD_MAX_IN_FLIGHT,
+                             OVERLOAD_RETRY_AFTER, OVERLOAD_STALE_MAX_PAGE,
+                             OVERLOAD_STALE_REFRESH, OVERLOAD_STALE_TIMEOUT)
+
+from . import shared
+
+MODE_KEY = 'overload:mode'
+STALE_VERSION_KEY = 'overload:stale_version'
+MODES = ('auto', 'on', 'off')
+EWMA_ALPHA = 0.2
+
+
+class LoadMonitor:
+    """Запросы в работе и EWMA времени ответа одного процесса."""
+
+    def __init__(self, max_in_flight, latency_ms):
+        self.max_in_flight = max_in_flight
+        self.latency_ms = latency_ms
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.overall_ms = 0.0
+        self.view_ms = {}
+        self.overloaded = False
+        self.overloaded_since = None
+        self.metrics = Counter()
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+            self.metrics['requests'] += 1
+            self.update()
+
+    def finish(self, view, duration_ms):
+        with self.lock:
+            self.in_flight -= 1
+            self.overall_ms += EWMA_ALPHA * (duration_ms - self.overall_ms)
+            if view:
+                average = self.view_ms.get(view, duration_ms)
+                self.view_ms[view] = average + EWMA_ALPHA * (
+                    duration_ms - average)
+            self.update()
+
+    def update(self):
+        """Вход и выход из перегрузки; вызывается под self.lock."""
+        if not self.overloaded:
+            if (self.in_flight > self.max_in_flight
+                    or self.overall_ms > self.latency_ms):
+                self.overloaded = True
+                self.overloaded_since = time.monotonic()
+                self.metrics['overloads'] += 1
+        elif (self.in_flight <= self.max_in_flight // 2
+                and self.overall_ms <= self.latency_ms / 2):
+            self.overloaded = False
+            self.metrics['overloaded_seconds'] += round(
+                time.monotonic() - self.overloaded_since)
+
+    def degraded(self):
+        mode = get_mode()
+        return mode == 'on' or mode == 'auto' and self.overloaded
+
+    def count(self, event):
+        with self.lock:
+            self.metrics[event] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'in_flight': self.in_flight,
+                'overall_ms': round(self.overall_ms, 1),
+                'overloaded': self.overloaded,
+                'views': sorted(
+                    ((view, round(ms, 1))
+                     for view, ms in self.view_ms.items()),
+                    key=lambda item: -item[1]),
+                'metrics': dict(self.metrics),
+            }
+
+
+monitor = LoadMonitor(OVERLOAD_MAX_IN_FLIGHT, OVERLOAD_LATENCY_MS)
+
+
+def get_mode():
+    return shared.read(MODE_KEY, 'auto')
+
+
+def set_mode(mode):
+    shared.write(MODE_KEY, mode)
+
+
+def drop_stale():
+    """Сохранённые копии страниц всех процессов больше не отдаём."""
+    shared.write(STALE_VERSION_KEY, time.time_ns())
+
+
+def anonymous(request):
+    """Без cookie сессии - страница одна на всех, сессию не грузим."""
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def stale_key(request):
+    """Ключ копии по пути и ?page=, None - такую страницу не копируем."""
+    page = request.GET.get('page', '1')
+    if (set(request.GET) - {'page'} or not page.isdigit()
+            or not 1 <= int(page) <= OVERLOAD_STALE_MAX_PAGE):
+        return None
+    path = md5(request.path.encode()).hexdigest()
+    return f'stale:{shared.read(STALE_VERSION_KEY, 0)}:{path}:{int(page)}'
+
+
+def remember(request, response):
+    """Копия страницы для деградированного режима, раз в REFRESH секунд."""
+    if (request.method != 'GET' or response.status_code != 200
+            or response.streaming or response.cookies
+            or not anonymous(request)):
+        return
+    key = stale_key(request)
+    if key is None:
+        return
+    stored = cache.get(key)
+    if stored is None or time.time() - stored[0] > OVERLOAD_STALE_REFRESH:
+        cache.set(key, (time.time(), response.content,
+                        response['Content-Type']), OVERLOAD_STALE_TIMEOUT)
+
+
+def stale_response(request):
+    """Сохранённая копия страницы или None."""
+    if request.method != 'GET' or not anonymous(request):
+        return None
+    key = stale_key(request)
+    stored = cache.get(key) if key else None
+    if stored is None:
+        return None
+    _, content, content_type = stored
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Degraded'] = 'stale'
+    return response
+
+
+def shed_response():
+    response = HttpResponse(
+        'Сервер перегружен, попробуйте позже.', status=503,
+        content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(OVERLOAD_RETRY_AFTER)
+    return response
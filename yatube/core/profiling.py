@@ -0,0 +1,139 @@
+"""Профиль живого запроса по требованию.
+
+Включается на один запрос: заголовком X-Profile с токеном из команды
+profile_token или параметром ?_profile у staff. Запрос (view и рендер
+шаблона) идёт под cProfile, а рядом поток раз в PROFILE_SAMPLE_INTERVAL
+снимает стек - получаем pstats и свёрнутые стеки для flamegraph.pl или
+speedscope. Храним последние PROFILE_MAX_COUNT профилей в PROFILE_DIR.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from yatube.settings import (PROFILE_DIR, PROFILE_MAX_COUNT,
+                             PROFILE_SAMPLE_INTERVAL, PROFILE_TOKEN_MAX_AGE)
+
+HEADER = 'HTTP_X_PROFILE'
+PARAM = '_profile'
+SALT = 'yatube.profile'
+EXTENSIONS = ('json', 'prof', 'folded')
+
+
+def make_token():
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def requested(request):
+    """Профилировать ли запрос: подписанный заголовок или staff с ?_profile.
+    """
+    token = request.META.get(HEADER)
+    if token:
+        try:
+            signing.TimestampSigner(salt=SALT).unsign(
+                token, max_age=PROFILE_TOKEN_MAX_AGE)
+            return True
+        except signing.BadSignature:
+            return False
+    user = getattr(request, 'user', None)
+    return PARAM in request.GET and bool(user and user.is_staff)
+
+
+def frame_name(frame):
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(settings.BASE_DIR):
+        path = os.path.relpath(path, settings.BASE_DIR)
+    return f'{code.co_name} ({path}:{code.co_firstlineno})'
+
+
+class Sampler(threading.Thread):
+    """Раз в interval снимает стек потока thread_id."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def profile_call(func, *args):
+    """Вызываем func под cProfile и сэмплером.
+
+    Возвращает результат, cProfile.Profile, свёрнутые стеки и время в мс.
+    """
+    sampler = Sampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL)
+    profiler = cProfile.Profile()
+    sampler.start()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        result = func(*args)
+    finally:
+        profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+        sampler.stop()
+    return result, profiler, sampler.stacks, duration_ms
+
+
+def save(request, profiler, stacks, duration_ms):
+    """Пишем профиль в PROFILE_DIR, старые сверх лимита удаляем."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f'{timezone.now():%Y%m%d-%H%M%S}-{uuid4().hex[:8]}'
+    base = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(base + '.prof')
+    with open(base + '.folded', 'w', encoding='utf-8') as file:
+        for stack, count in stacks.most_common():
+            file.write(f'{stack} {count}\n')
+    match = request.resolver_match
+    with open(base + '.json', 'w', encoding='utf-8') as file:
+        json.dump({
+            'name': name,
+            'path': request.get_full_path(),
+            'view': match.view_name if match else None,
+            'duration_ms': round(duration_ms, 1),
+            'samples': sum(stacks.values()),
+            'created': timezone.now().isoformat(),
+        }, file, ensure_ascii=False)
+    for old in list_profiles()[PROFILE_MAX_COUNT:]:
+        for extension in EXTENSIONS:
+            path = os.path.join(PROFILE_DIR, f'{old["name"]}.{extension}')
+            if os.path.exists(path):
+                os.remove(path)
+    return name
+
+
+def list_profiles():
+    """Описания профилей, новые первыми."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if filename.endswith('.json'):
+            with open(os.path.join(PROFILE_DIR, filename),
+                      encoding='utf-8') as file:
+                profiles.append(json.load(file))
+    return profiles
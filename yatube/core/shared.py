@@ -0,0 +1,30 @@
+"""Значения, общие для всех процессов сервера.
+
+Кэш по умолчанию у каждого процесса свой (LocMemCache), и то, что
+должны сразу увидеть все воркеры, в нём хранить нельзя. Такие значения
+лежат в кэше 'shared' (по умолчанию - таблица в базе). Читать его на
+каждом запросе дорого, поэтому процесс держит прочитанное у себя
+SHARED_REFRESH секунд: изменение доходит до всех воркеров не позже.
+"""
+from django.core.cache import cache, caches
+
+from yatube.settings import SHARED_REFRESH
+
+
+def local_key(key):
+    return f'shared:{key}'
+
+
+def read(key, default):
+    """Значение key; default не должен быть None."""
+    value = cache.get(local_key(key))
+    if value is None:
+        value = caches['shared'].get(key, default)
+        cache.set(local_key(key), value, SHARED_REFRESH)
+    return value
+
+
+def write(key, value):
+    """Пишем для всех процессов, в своём - видно сразу."""
+    caches['shared'].set(key, value, None)
+    cache.set(local_key(key), value, SHARED_REFRESH)
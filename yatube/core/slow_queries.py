@@ -0,0 +1,111 @@
+"""Лог медленных запросов к базе без DEBUG.
+
+SlowQueryLogger вешается через connection.execute_wrapper и пишет
+запросы дольше порога в логгер yatube.slow_queries - по JSON-строке
+на запрос: отпечаток и нормализованный SQL, время, view, строка кода,
+откуда пришёл запрос, и план запроса. Разбирает лог команда
+slow_query_report.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import time
+from contextvars import ContextVar
+from hashlib import md5
+
+import django
+from django.conf import settings
+
+logger = logging.getLogger('yatube.slow_queries')
+
+current_view = ContextVar('current_view', default=None)
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(\.\d+)?\b')
+PLACEHOLDER_LIST_RE = re.compile(r'\((\s*(%s|\?)\s*,)+\s*(%s|\?)\s*\)')
+SPACE_RE = re.compile(r'\s+')
+
+# Кадры из этих мест - не наш код, ищем вызов выше по стеку
+SKIP_PATHS = (
+    os.path.dirname(django.__file__),
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'middleware.py'),
+)
+
+
+def normalize(sql):
+    """SQL без значений: одинаковые по форме запросы дают одну строку."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDER_LIST_RE.sub('(...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return md5(normalized.encode()).hexdigest()[:12]
+
+
+def caller():
+    """Первая строка нашего кода в стеке: 'posts/views.py:42 in index'."""
+    frame = sys._getframe(1)
+    while frame:
+        path = frame.f_code.co_filename
+        if (path.startswith(settings.BASE_DIR)
+                and not path.startswith(SKIP_PATHS)):
+            return (f'{os.path.relpath(path, settings.BASE_DIR)}:'
+                    f'{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    """План запроса сырым курсором, мимо execute_wrapper."""
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN '
+    else:
+        return None
+    # В выводе SQLite план в последней колонке, в PostgreSQL - в первой
+    column = -1 if connection.vendor == 'sqlite' else 0
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(prefix + sql, params)
+        return [str(row[column]) for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN не удался: {error}']
+    finally:
+        cursor.close()
+
+
+class SlowQueryLogger:
+    """execute_wrapper: пишет в лог запросы дольше threshold_ms."""
+
+    def __init__(self, threshold_ms):
+        self.threshold_ms = threshold_ms
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.log(sql, params, many, context, duration_ms)
+
+    def log(self, sql, params, many, context, duration_ms):
+        normalized = normalize(sql)
+        entry = {
+            'fingerprint': fingerprint(normalized),
+            'sql': normalized,
+            'duration_ms': round(duration_ms, 3),
+            'view': current_view.get(),
+            'caller': caller(),
+            'many': many,
+        }
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            entry['plan'] = explain(context['connection'], sql, params)
+        logger.warning(json.dumps(entry, ensure_ascii=False))
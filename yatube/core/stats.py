@@ -0,0 +1,9 @@
+"""Статистика по замерам: общая для нагрузочного прогона и отчётов."""
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
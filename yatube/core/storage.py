@@ -0,0 +1,71 @@
+"""Хранилище картинок по содержимому.
+
+Файл называется sha256 своего содержимого и лежит в подкаталогах по
+первым байтам хэша: posts/ab/cd/abcd…ef.gif. Одинаковые загрузки
+попадают в один файл, и sorl режет для него один набор превью.
+Удалять такой файл можно, только когда на него не ссылается ни один
+пост - это считают posts.media.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME_RE = re.compile(
+    r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def content_hash(content):
+    """sha256 файла, читаем его кусками."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(directory, digest, ext):
+    return posixpath.join(
+        directory, digest[:2], digest[2:4], digest + ext.lower())
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, в котором имя файла задаёт его содержимое."""
+
+    def get_available_name(self, name, max_length=None):
+        # Занятое имя - тот же самый файл, суффиксы не нужны
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        name = hashed_name(
+            directory, content_hash(content), posixpath.splitext(filename)[1])
+        if self.exists(name):
+            # Освежаем mtime: gc_media не удалит файл, на который сейчас
+            # сошлётся новый пост
+            os.utime(self.path(name))
+            return name
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Пишем во временный файл и подменяем атомарно: две одинаковые
+        # загрузки одновременно запишут одно и то же
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+
+post_images = ContentAddressedStorage()
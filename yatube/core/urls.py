@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    # Профили запросов, только для staff
+    path('staff/profiles/', views.profile_list, name='profile_list'),
+    path(
+        'staff/profiles/<str:name>.<str:extension>',
+        views.profile_download,
+        name='profile_download'
+    ),
+    # Деградированный режим: состояние, счётчики и переключатель
+    path('staff/overload/', views.overload_status, name='overload'),
+]
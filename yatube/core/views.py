@@ -1,5 +1,25 @@
 # core/views.py
-from django.shortcuts import render
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.shortcuts import redirect, render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from . import overload, profiling
+from .storage import HASHED_NAME_RE
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
 
 
 def page_not_found(request, exception):
@@ -19,3 +39,147 @@ def server_trouble(request, *args, **kwargs):
 def csrf_failure(request, reason=''):
     """Page 403."""
     return render(request, 'core/403csrf.html')
+
+
+def parse_range(header, size):
+    """(start, end) включительно из Range: bytes=a-b.
+
+    None - заголовка нет или в нём несколько диапазонов, отдаём весь файл;
+    (size, size) - диапазон за концом файла.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-500 - последние 500 байт
+        if not int(end):
+            return size, size
+        return max(size - int(end), 0), size - 1
+    end = min(int(end), size - 1) if end else size - 1
+    if int(start) >= size or int(start) > end:
+        return size, size
+    return int(start), end
+
+
+def read_range(path, start, end):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        left = end - start + 1
+        while left > 0:
+            chunk = file.read(min(CHUNK_SIZE, left))
+            if not chunk:
+                return
+            left -= len(chunk)
+            yield chunk
+
+
+def file_body(request, full_path, path, size, etag):
+    """Ответ с байтами файла: через прокси, диапазоном или целиком."""
+    sendfile = settings.MEDIA_SENDFILE_HEADER
+    if sendfile:
+        # Диапазоны и условные запросы к байтам прокси разберёт сам
+        response = HttpResponse()
+        response[sendfile] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(path)
+            if sendfile == 'X-Accel-Redirect' else full_path)
+        return response
+    byte_range = None
+    if request.META.get('HTTP_IF_RANGE', etag) == etag:
+        byte_range = parse_range(request.META.get('HTTP_RANGE', ''), size)
+    if byte_range == (size, size):
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end)
+            if request.method == 'GET' else [],
+            status=206,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+        return response
+    if request.method == 'HEAD':
+        response = HttpResponse()
+        response['Content-Length'] = size
+        return response
+    return FileResponse(open(full_path, 'rb'))
+
+
+@require_safe
+def media(request, path):
+    """Отдача media с Range, ETag и If-None-Match.
+
+    С прокси байты отдаёт он по X-Accel-Redirect/X-Sendfile, без прокси -
+    FileResponse через wsgi.file_wrapper, диапазоны - потоком.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if os.path.basename(path).startswith('.') or not os.path.isfile(
+            full_path):
+        raise Http404
+    stat = os.stat(full_path)
+    # Имя по хэшу содержимого само по себе сильный валидатор
+    immutable = HASHED_NAME_RE.search(path)
+    etag = (f'"{os.path.splitext(os.path.basename(path))[0]}"' if immutable
+            else f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"')
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    response = file_body(request, full_path, path, stat.st_size, etag)
+    if response.status_code == 416:
+        return response
+    content_type, encoding = mimetypes.guess_type(full_path)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = (
+        'public, max-age=31536000, immutable' if immutable
+        else 'public, no-cache')
+    return response
+
+
+@staff_member_required
+def profile_list(request):
+    """Последние профили запросов."""
+    return render(request, 'core/profile_list.html', {
+        'profiles': profiling.list_profiles(),
+    })
+
+
+@staff_member_required
+def profile_download(request, name, extension):
+    """Файл профиля: .prof для pstats, .folded для flamegraph."""
+    if extension not in profiling.EXTENSIONS or not name.replace(
+            '-', '').isalnum():
+        raise Http404
+    path = os.path.join(profiling.PROFILE_DIR, f'{name}.{extension}')
+    if not os.path.isfile(path):
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'), as_attachment=True, filename=f'{name}.{extension}')
+
+
+@staff_member_required
+def overload_status(request):
+    """Деградированный режим: состояние процесса и ручной переключатель."""
+    if request.method == 'POST':
+        mode = request.POST.get('mode')
+        if mode in overload.MODES:
+            overload.set_mode(mode)
+        return redirect('core:overload')
+    return render(request, 'core/overload.html', {
+        'mode': overload.get_mode(),
+        'modes': overload.MODES,
+        'state': overload.monitor.snapshot(),
+    })
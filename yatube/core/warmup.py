@@ -0,0 +1,29 @@
+"""Запросы прогрева (warm_up) - не просмотры.
+
+Команда подписывает заголовок X-Warmup тем же SECRET_KEY, что и у
+сервера. Заголовок без действующей подписи ничего не меняет: иначе
+любой клиент мог бы смотреть посты, не попадая в счётчик.
+"""
+from django.core import signing
+
+from yatube.settings import WARMUP_TOKEN_MAX_AGE
+
+HEADER = 'HTTP_X_WARMUP'
+SALT = 'yatube.warmup'
+
+
+def make_token():
+    return signing.TimestampSigner(salt=SALT).sign('warmup')
+
+
+def requested(request):
+    """Запрос прогрева: заголовок X-Warmup с действующей подписью."""
+    token = request.META.get(HEADER)
+    if not token:
+        return False
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=WARMUP_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
@@ -1,6 +1,21 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Sum
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from core import overload
+
+from .deletion import schedule_group_deletion
+from .models import (ArchivedPost, AuthorDailyStats, Comment, DeletionRequest,
+                     Follow, Group, GroupDailyStats, Like, Post, Tag)
+from .rollups import COUNTERS
 
-from .models import Comment, Follow, Group, Like, Post
+ANALYTICS_DAYS = 30
+ANALYTICS_TOP_AUTHORS = 20
 
 
 @admin.register(Post)
@@ -11,11 +26,101 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    # Копии страниц деградированного режима сбрасываем раз на удаление,
+    # а не на каждый пост: это запись в общий кэш
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(overload.drop_stale)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        transaction.on_commit(overload.drop_stale)
+
+
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug', 'pending_deletion')
+    list_filter = ('pending_deletion',)
+    search_fields = ('title',)
+    actions = ('schedule_deletion',)
+
+    def schedule_deletion(self, request, queryset):
+        for group in queryset:
+            schedule_group_deletion(group)
+        self.message_user(
+            request, f'В очереди на удаление групп: {len(queryset)}. '
+            f'Удалит их команда process_deletions.')
+    schedule_deletion.short_description = 'Удалить в фоне'
 
-admin.site.register(Group)
 
 admin.site.register(Comment)
 
 admin.site.register(Follow)
 
 admin.site.register(Like)
+
+admin.site.register(Tag)
+
+admin.site.register(ArchivedPost)
+
+
+@admin.register(GroupDailyStats)
+class GroupDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'group', 'posts', 'comments', 'likes')
+    list_filter = ('group',)
+    list_select_related = ('group',)
+    date_hierarchy = 'day'
+    empty_value_display = '-без группы-'
+    change_list_template = 'admin/posts/groupdailystats/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('analytics/',
+                 self.admin_site.admin_view(self.analytics_view),
+                 name='posts_analytics'),
+        ] + super().get_urls()
+
+    def analytics_view(self, request):
+        """Тренд по дням, группы и топ авторов - только из сводок."""
+        try:
+            days = max(int(request.GET.get('days', ANALYTICS_DAYS)), 1)
+        except ValueError:
+            days = ANALYTICS_DAYS
+        since = timezone.now().date() - timedelta(days=days - 1)
+        totals = {f'{name}_total': Sum(name) for name in COUNTERS}
+        group_stats = GroupDailyStats.objects.filter(day__gte=since)
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Аналитика',
+            opts=self.model._meta,
+            days=days,
+            trend=group_stats.values('day').annotate(
+                **totals).order_by('day'),
+            groups=group_stats.values('group__title').annotate(
+                **totals).order_by('-posts_total'),
+            authors=AuthorDailyStats.objects.filter(day__gte=since).values(
+                'author__username').annotate(**totals).order_by(
+                '-likes_total', '-comments_total')[:ANALYTICS_TOP_AUTHORS],
+        )
+        return TemplateResponse(request, 'admin/posts/analytics.html', context)
+
+
+@admin.register(AuthorDailyStats)
+class AuthorDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'author', 'posts', 'comments', 'likes')
+    list_select_related = ('author',)
+    search_fields = ('author__username',)
+    date_hierarchy = 'day'
+
+
+@admin.register(DeletionRequest)
+class DeletionRequestAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'name', 'object_id', 'created', 'finished',
+                    'deleted')
+    list_filter = ('kind', 'finished')
+    readonly_fields = ('kind', 'object_id', 'name', 'created', 'finished',
+                       'deleted')
+    empty_value_display = '-в очереди-'
+
+    def has_add_permission(self, request):
+        return False
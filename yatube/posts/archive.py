@@ -0,0 +1,104 @@
+"""Горячие и архивные посты.
+
+Старые посты с комментариями и лайками archive_posts переносит в
+таблицы Archived*, id сохраняются. Ленты сначала листают горячие посты
+и идут в архив, только когда страница заходит дальше них.
+"""
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject, cached_property
+
+from yatube.settings import ARCHIVE_COUNT_TIMEOUT
+
+from .counters import post_views
+from .media import retain
+from .models import (ArchivedComment, ArchivedLike, ArchivedPost, Comment,
+                     Like, Post)
+
+
+def cached_count(queryset):
+    """COUNT архивного запроса: архив меняется редко, держим в кэше."""
+    key = 'archive_count:' + md5(str(queryset.query).encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, ARCHIVE_COUNT_TIMEOUT)
+    return count
+
+
+class HotColdPosts:
+    """Горячие посты, за ними архивные - как один список для Paginator."""
+
+    def __init__(self, hot, cold):
+        self.hot = hot
+        self.cold = cold
+
+    @cached_property
+    def hot_count(self):
+        return self.hot.count()
+
+    @cached_property
+    def cold_count(self):
+        return cached_count(self.cold)
+
+    def count(self):
+        return self.hot_count + self.cold_count
+
+    def map(self, func):
+        """Тот же список с func, применённой к обоим запросам."""
+        mapped = HotColdPosts(func(self.hot), func(self.cold))
+        mapped.__dict__.update(
+            hot_count=self.hot_count, cold_count=self.cold_count)
+        return mapped
+
+    def __getitem__(self, key):
+        # Срез ленивый, как у QuerySet: Paginator берёт его сразу,
+        # а запрос нужен только когда страницу начнут листать
+        return SimpleLazyObject(lambda: self.slice(key.start or 0, key.stop))
+
+    def slice(self, start, stop):
+        posts = []
+        if start < self.hot_count:
+            posts += self.hot[start:min(stop, self.hot_count)]
+        if stop > self.hot_count and self.cold_count:
+            posts += self.cold[
+                max(start - self.hot_count, 0):stop - self.hot_count]
+        return posts
+
+
+def archive_posts(ids):
+    """Переносим посты с комментариями и лайками в архив одной транзакцией.
+
+    Картинки остаются на месте, архивный пост ссылается на тот же файл.
+    """
+    with transaction.atomic():
+        archived = ArchivedPost.objects.bulk_create([
+            ArchivedPost(
+                id=post.id, text=post.text, text_html=post.text_html,
+                pub_date=post.pub_date, author_id=post.author_id,
+                group_id=post.group_id, image=post.image.name,
+                views=post.views + post_views.get(post.id),
+            )
+            for post in Post.objects.filter(id__in=ids)
+        ])
+        # Картинки переходят к архивным постам: удаление горячих
+        # не должно обнулить их счётчики
+        retain(post.image.name for post in archived)
+        ArchivedComment.objects.bulk_create([
+            ArchivedComment(
+                id=comment.id, post_id=comment.post_id,
+                author_id=comment.author_id, text=comment.text,
+                text_html=comment.text_html, created=comment.created,
+            )
+            for comment in Comment.objects.filter(post_id__in=ids)
+        ])
+        ArchivedLike.objects.bulk_create([
+            ArchivedLike(id=like.id, post_id=like.post_id,
+                         author_id=like.author_id)
+            for like in Like.objects.filter(post_id__in=ids)
+        ])
+        Like.objects.filter(post_id__in=ids).delete()
+        Comment.objects.filter(post_id__in=ids).delete()
+        Post.objects.filter(id__in=ids).delete()
@@ -0,0 +1,79 @@
+"""Счётчики просмотров постов.
+
+UPDATE на каждый просмотр сериализует писателей SQLite, поэтому
+просмотры копим в памяти процесса и пишем пачкой, одним UPDATE на
+batch_size постов: views = views + CASE id WHEN … END. Прибавка не
+зависит от порядка, так что процессы сбрасывают свои буферы
+независимо. Упавший процесс теряет не больше flush_size просмотров
+и не больше flush_interval секунд.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.db import DatabaseError
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from yatube.settings import VIEWS_FLUSH_INTERVAL, VIEWS_FLUSH_SIZE
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Буфер просмотров одного процесса."""
+
+    def __init__(self, model, flush_size, flush_interval, batch_size=500):
+        self.model = model
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.pending_total = 0
+        self.flushed_at = time.monotonic()
+
+    def add(self, pk):
+        with self.lock:
+            self.pending[pk] += 1
+            self.pending_total += 1
+            due = (self.pending_total >= self.flush_size
+                   or time.monotonic() - self.flushed_at
+                   >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def get(self, pk):
+        """Просмотры pk, ещё не записанные в базу."""
+        return self.pending.get(pk, 0)
+
+    def flush(self):
+        """Пишем буфер в базу, вернувшиеся с ошибкой просмотры не теряем."""
+        with self.lock:
+            items = list(self.pending.items())
+            self.pending = Counter()
+            self.pending_total = 0
+            self.flushed_at = time.monotonic()
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start:start + self.batch_size]
+            try:
+                self.model.objects.filter(
+                    pk__in=[pk for pk, _ in batch]
+                ).update(views=F('views') + Case(
+                    *[When(pk=pk, then=Value(count)) for pk, count in batch],
+                    output_field=PositiveIntegerField(),
+                ))
+            except DatabaseError:
+                logger.exception('Не записали просмотры, вернули в буфер')
+                with self.lock:
+                    for pk, count in items[start:]:
+                        self.pending[pk] += count
+                        self.pending_total += count
+                return
+
+
+post_views = ViewCounter(Post, VIEWS_FLUSH_SIZE, VIEWS_FLUSH_INTERVAL)
+atexit.register(post_views.flush)
@@ -0,0 +1,136 @@
+"""Удаление юзеров и групп пачками в фоне.
+
+user.delete() каскадом проходит по постам, комментариям, лайкам и
+подпискам, group.delete() одним UPDATE обнуляет группу у всех постов -
+у тяжёлых авторов это секунды под блокировкой записи SQLite.
+Вместо этого schedule_* сразу прячет объект и заводит DeletionRequest:
+юзера прячет сам открытый запрос (pending_user_ids), группу - флаг
+pending_deletion. Команда
+process_deletions удаляет зависимые строки пачками по
+DELETION_BATCH_SIZE, каждую в своей транзакции. Шаги идемпотентны:
+упавший воркер при перезапуске продолжит с того же места.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from core import overload, shared
+from yatube.settings import DELETION_BATCH_PAUSE, DELETION_BATCH_SIZE
+
+from .models import (ArchivedComment, ArchivedLike, ArchivedPost,
+                     AuthorDailyStats, Comment, DeletionRequest, Follow,
+                     FollowSuggestion, Group, GroupDailyStats, Like, Post,
+                     PostTag, User)
+
+# Меняется, когда что-то спрятали: входит в ETag и ключи RSS/Atom лент.
+# Общая для всех процессов (core.shared). Заодно устаревают копии
+# страниц деградированного режима
+HIDDEN_VERSION_KEY = 'hidden_version'
+
+
+def hidden_version():
+    return shared.read(HIDDEN_VERSION_KEY, 0)
+
+
+def bump_hidden_version():
+    shared.write(HIDDEN_VERSION_KEY, time.time_ns())
+    overload.drop_stale()
+
+
+def schedule_user_deletion(user):
+    """Прячем юзера с постами и ставим его в очередь на удаление."""
+    with transaction.atomic():
+        deletion = DeletionRequest.objects.get_or_create(
+            kind=DeletionRequest.USER, object_id=user.pk, finished=None,
+            defaults={'name': user.username})[0]
+        # Прячет юзера сам запрос, а войти он уже не должен
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+    bump_hidden_version()
+    return deletion
+
+
+def schedule_group_deletion(group):
+    """Прячем группу и ставим её в очередь на удаление."""
+    group.pending_deletion = True
+    # save(), а не update(): сигнал сбросит кэш групп для формы
+    group.save(update_fields=['pending_deletion'])
+    bump_hidden_version()
+    return DeletionRequest.objects.get_or_create(
+        kind=DeletionRequest.GROUP, object_id=group.pk, finished=None,
+        defaults={'name': group.title})[0]
+
+
+def user_steps(user_id):
+    """(queryset, update) в порядке удаления; update=None - удалить."""
+    own = Q(author_id=user_id) | Q(post__author_id=user_id)
+    return (
+        (Like.objects.filter(own), None),
+        (ArchivedLike.objects.filter(own), None),
+        (Comment.objects.filter(own), None),
+        (ArchivedComment.objects.filter(own), None),
+        (PostTag.objects.filter(post__author_id=user_id), None),
+        (Follow.objects.filter(
+            Q(user_id=user_id) | Q(author_id=user_id)), None),
+        (FollowSuggestion.objects.filter(
+            Q(user_id=user_id) | Q(author_id=user_id)), None),
+        (AuthorDailyStats.objects.filter(author_id=user_id), None),
+        (Post.objects.filter(author_id=user_id), None),
+        (ArchivedPost.objects.filter(author_id=user_id), None),
+        (User.objects.filter(pk=user_id), None),
+    )
+
+
+def group_steps(group_id):
+    # updated - чтобы build_related_posts переиндексировал посты без группы
+    return (
+        (Post.objects.filter(group_id=group_id),
+         {'group': None, 'updated': Now()}),
+        (ArchivedPost.objects.filter(group_id=group_id), {'group': None}),
+        (GroupDailyStats.objects.filter(group_id=group_id), None),
+        (Group.objects.filter(pk=group_id), None),
+    )
+
+
+STEPS = {
+    DeletionRequest.USER: user_steps,
+    DeletionRequest.GROUP: group_steps,
+}
+
+
+def run_batch(queryset, update, batch_size):
+    """Одна пачка в своей транзакции, возвращает число строк."""
+    ids = list(queryset.order_by('pk').values_list(
+        'pk', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    batch = queryset.model.objects.filter(pk__in=ids)
+    with transaction.atomic():
+        if update is not None:
+            batch.update(**update)
+        else:
+            # delete() с сигналами: картинки постов отпускает posts.media.
+            # Копии страниц не сбрасываем: посты спрятаны ещё в schedule_*
+            batch.delete()
+    return len(ids)
+
+
+def process(deletion, batch_size=DELETION_BATCH_SIZE,
+            pause=DELETION_BATCH_PAUSE):
+    """Доводим запрос на удаление до конца, пачка за пачкой."""
+    for queryset, update in STEPS[deletion.kind](deletion.object_id):
+        while True:
+            count = run_batch(queryset, update, batch_size)
+            if not count:
+                break
+            deletion.deleted += count
+            deletion.save(update_fields=['deleted'])
+            if count < batch_size:
+                break
+            time.sleep(pause)
+    deletion.finished = timezone.now()
+    deletion.save(update_fields=['finished'])
+    return deletion
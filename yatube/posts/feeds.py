@@ -0,0 +1,241 @@
+"""RSS/Atom ленты и карта сайта.
+
+Ленты и карта меняются только с новым постом, поэтому ETag и
+Last-Modified берём по последнему посту - читалки и краулеры получают
+304 за один индексный запрос. Тело ленты держим в кэше под ключом с
+этим ETag. Карта сайта разбита на куски по диапазонам id и отдаётся
+потоком, в памяти не собирается.
+"""
+from hashlib import md5
+from xml.sax.saxutils import escape
+
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from yatube.settings import FEED_CACHE_TIMEOUT, FEED_ITEMS, SITEMAP_CHUNK_SIZE
+
+from .deletion import hidden_version
+from .models import ArchivedPost, Group, Post, visible_users
+
+
+class PostsFeed(Feed):
+    """Последние посты всех авторов."""
+    title = 'Yatube: последние посты'
+    description = 'Новые посты всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    @staticmethod
+    def scope():
+        """Посты ленты по аргументам url - для ETag без get_object."""
+        return Post.objects.visible()
+
+    def posts(self, obj):
+        return Post.objects.visible()
+
+    def items(self, obj):
+        return self.posts(obj).select_related(
+            'author', 'group')[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return item.text[:50]
+
+    def item_description(self, item):
+        return item.text_html
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.id])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class AuthorPostsFeed(PostsFeed):
+    """Посты автора."""
+
+    def get_object(self, request, username):
+        return get_object_or_404(visible_users(), username=username)
+
+    def title(self, obj):
+        return f'Yatube: посты {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Новые посты {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    @staticmethod
+    def scope(username):
+        return Post.objects.visible().filter(author__username=username)
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+
+class GroupPostsFeed(PostsFeed):
+    """Посты группы."""
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug, pending_deletion=False)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj.slug])
+
+    @staticmethod
+    def scope(slug):
+        return Post.objects.visible().filter(
+            group__slug=slug, group__pending_deletion=False)
+
+    def posts(self, obj):
+        return obj.posts.visible()
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self._get_dynamic_attr('description', obj)
+
+
+class PostsAtomFeed(AtomMixin, PostsFeed):
+    pass
+
+
+class AuthorPostsAtomFeed(AtomMixin, AuthorPostsFeed):
+    pass
+
+
+class GroupPostsAtomFeed(AtomMixin, GroupPostsFeed):
+    pass
+
+
+def latest_post(request, feed, kwargs):
+    """(id, pub_date) последнего поста ленты, один запрос на запрос."""
+    if not hasattr(request, 'latest_post'):
+        request.latest_post = feed.scope(**kwargs).order_by(
+            '-pub_date').values_list('id', 'pub_date').first()
+    return request.latest_post
+
+
+def feed_view(feed_class):
+    """Лента с 304 по последнему посту и телом в кэше до нового поста."""
+    feed = feed_class()
+
+    def etag(request, **kwargs):
+        post = latest_post(request, feed, kwargs)
+        # Спрятали юзера - лента меняется и без нового поста
+        return '{}-{}'.format(post[0] if post else 'empty', hidden_version())
+
+    def last_modified(request, **kwargs):
+        post = latest_post(request, feed, kwargs)
+        return post[1] if post else None
+
+    @condition(etag_func=etag, last_modified_func=last_modified)
+    def view(request, **kwargs):
+        key = 'feed:{}:{}'.format(
+            md5(request.get_full_path().encode()).hexdigest(),
+            etag(request, **kwargs))
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = feed(request, **kwargs)
+        cache.set(key, (response.content, response['Content-Type']),
+                  FEED_CACHE_TIMEOUT)
+        return response
+    return view
+
+
+def post_sources():
+    return (Post.objects.visible(), ArchivedPost.objects.visible())
+
+
+def sitemap_state(request, chunk=None):
+    """Число постов и последний id - в куске или во всей карте."""
+    if not hasattr(request, 'sitemap_state'):
+        count, last_id = 0, 0
+        for posts in post_sources():
+            if chunk is not None:
+                posts = posts.filter(
+                    id__gt=chunk * SITEMAP_CHUNK_SIZE,
+                    id__lte=(chunk + 1) * SITEMAP_CHUNK_SIZE)
+            state = posts.order_by().aggregate(
+                count=Count('id'), last_id=Max('id'))
+            count += state['count']
+            last_id = max(last_id, state['last_id'] or 0)
+        request.sitemap_state = count, last_id
+    return request.sitemap_state
+
+
+def sitemap_etag(request, chunk=None):
+    return '{}-{}'.format(*sitemap_state(request, chunk))
+
+
+def stream_xml(head, lines, tail):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n' + head + '\n'
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= 1000:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    yield ''.join(line + '\n' for line in buffer) + tail + '\n'
+
+
+@condition(etag_func=sitemap_etag)
+def sitemap_index(request):
+    """Индекс карты сайта: по куску на SITEMAP_CHUNK_SIZE id постов."""
+    _, last_id = sitemap_state(request)
+    chunks = range((last_id - 1) // SITEMAP_CHUNK_SIZE + 1 if last_id else 0)
+    lines = (
+        '<sitemap><loc>{}</loc></sitemap>'.format(escape(
+            request.build_absolute_uri(
+                reverse('posts:sitemap_chunk', args=[chunk]))))
+        for chunk in chunks
+    )
+    return StreamingHttpResponse(stream_xml(
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/'
+        'sitemap/0.9">', lines, '</sitemapindex>'),
+        content_type='application/xml')
+
+
+@condition(etag_func=sitemap_etag)
+def sitemap_chunk(request, chunk):
+    """Кусок карты сайта: посты и архив с id из диапазона куска."""
+    def lines():
+        # Ссылки на посты одинаковые, кроме id: reverse один раз
+        url = request.build_absolute_uri(
+            reverse('posts:post_detail', args=[0]))
+        prefix, suffix = url.rsplit('0', 1)
+        for posts in post_sources():
+            rows = posts.filter(
+                id__gt=chunk * SITEMAP_CHUNK_SIZE,
+                id__lte=(chunk + 1) * SITEMAP_CHUNK_SIZE,
+            ).order_by('id').values_list('id', 'pub_date')
+            for post_id, pub_date in rows.iterator(chunk_size=2000):
+                yield (f'<url><loc>{escape(prefix)}{post_id}'
+                       f'{escape(suffix)}</loc><lastmod>'
+                       f'{pub_date.date().isoformat()}</lastmod></url>')
+    return StreamingHttpResponse(stream_xml(
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+        lines(), '</urlset>'), content_type='application/xml')
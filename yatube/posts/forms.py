@@ -1,6 +1,79 @@
 from django import forms
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse
+from django.utils.html import escapejs
+from django.utils.safestring import mark_safe
 
-from .models import Comment, Post
+from yatube.settings import GROUP_SELECT_LIMIT
+
+from .models import Comment, Group, Post
+from .utils import group_choices
+
+AUTOCOMPLETE_SCRIPT = '''
+<script>
+(function () {
+  var select = document.getElementById('__ID__');
+  var search = document.getElementById('__ID___search');
+  var timer;
+  search.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      fetch('__URL__?q=' + encodeURIComponent(search.value))
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          for (var i = select.options.length - 1; i > 0; i--) {
+            if (!select.options[i].selected) select.remove(i);
+          }
+          data.results.forEach(function (group) {
+            if (String(group.id) !== select.value) {
+              select.add(new Option(group.title, group.id));
+            }
+          });
+        });
+    }, 200);
+  });
+})();
+</script>
+'''
+
+
+class CachedGroupIterator(ModelChoiceIterator):
+    """Группы из кэша, а не запросом на каждый рендер формы."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from group_choices()
+
+    def __len__(self):
+        return len(group_choices()) + (self.field.empty_label is not None)
+
+
+class GroupChoiceField(forms.ModelChoiceField):
+    """Выбор группы: список из кэша, проверка - запрос одной группы по id."""
+    iterator = CachedGroupIterator
+
+
+class GroupAutocomplete(forms.Select):
+    """Выбранная группа и поиск: остальные группы подгружает поиск."""
+
+    def optgroups(self, name, value, attrs=None):
+        titles = dict(group_choices())
+        self.choices = [('', '---------')] + [
+            (int(pk), titles[int(pk)]) for pk in value
+            if str(pk).isdigit() and int(pk) in titles
+        ]
+        return super().optgroups(name, value, attrs)
+
+    def render(self, name, value, attrs=None, renderer=None):
+        select_id = escapejs((attrs or {}).get('id', f'id_{name}'))
+        search = (f'<input type="search" id="{select_id}_search" '
+                  f'class="form-control mb-2" placeholder="Найти группу" '
+                  f'autocomplete="off">')
+        script = AUTOCOMPLETE_SCRIPT.replace('__ID__', select_id).replace(
+            '__URL__', escapejs(reverse('posts:group_autocomplete')))
+        return mark_safe(
+            search + super().render(name, value, attrs, renderer) + script)
 
 
 class PostForm(forms.ModelForm):
@@ -9,6 +82,14 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image',)
         labels = {'image': 'Красивая картиночка для поста', }
+        field_classes = {'group': GroupChoiceField}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['group'].queryset = Group.objects.filter(
+            pending_deletion=False)
+        if len(group_choices()) > GROUP_SELECT_LIMIT:
+            self.fields['group'].widget = GroupAutocomplete()
 
 
 class CommentForm(forms.ModelForm):
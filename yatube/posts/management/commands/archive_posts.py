@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from yatube.settings import ARCHIVE_AFTER_DAYS
+
+from ...archive import archive_posts
+from ...models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переносит старые посты с комментариями и лайками '
+            'в архивные таблицы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=ARCHIVE_AFTER_DAYS,
+            help='Архивировать посты старше стольки дней.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов переносить в одной транзакции.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, сколько постов уйдёт в архив.')
+
+    def handle(self, *args, **options):
+        old_posts = Post.objects.filter(
+            pub_date__lt=timezone.now() - timedelta(days=options['days']))
+        if options['dry_run']:
+            self.stdout.write(f'В архив уйдёт постов: {old_posts.count()}')
+            return
+        count = 0
+        while True:
+            # Короткие транзакции, чтобы не держать базу на запись
+            ids = list(old_posts.order_by('pub_date').values_list(
+                'id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            archive_posts(ids)
+            count += len(ids)
+        self.stdout.write(f'Перенесено в архив постов: {count}')
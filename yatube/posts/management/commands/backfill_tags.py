@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...models import Post
+from ...tags import sync_tags
+
+
+class Command(BaseCommand):
+    help = 'Разбирает хэштеги уже существующих постов пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько постов обрабатывать в одной транзакции.')
+
+    def handle(self, *args, **options):
+        last_id = 0
+        count = 0
+        while True:
+            posts = list(Post.objects.filter(id__gt=last_id).order_by(
+                'id').only('id', 'text')[:options['chunk_size']])
+            if not posts:
+                break
+            with transaction.atomic():
+                sync_tags(posts)
+            last_id = posts[-1].id
+            count += len(posts)
+        self.stdout.write(f'Хэштеги разобраны у {count} постов.')
@@ -0,0 +1,71 @@
+from functools import partial
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils import timezone
+
+from yatube.settings import FOLLOW_SUGGESTIONS_COUNT
+
+from ...models import FollowSuggestion
+from ...recommendations import (init_graph, load_activity, load_follow_graph,
+                                suggest_for_users, users_with_follows)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации "Кого почитать" по графу подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=FOLLOW_SUGGESTIONS_COUNT,
+            help='Сколько авторов рекомендовать каждому юзеру.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов для расчёта.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько юзеров считает воркер за одну задачу.')
+        parser.add_argument(
+            '--activity-days', type=int, default=30,
+            help='За сколько дней учитывать активность автора.')
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        offsets, targets = load_follow_graph()
+        activity = load_activity(len(offsets) - 2, options['activity_days'])
+        user_ids = users_with_follows(offsets)
+        size = options['chunk_size']
+        chunks = [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+        suggest = partial(suggest_for_users, top=options['top'])
+
+        if options['workers'] > 1:
+            # Воркеры в базу не ходят, но наследовать соединения незачем
+            connections.close_all()
+            with Pool(options['workers'], initializer=init_graph,
+                      initargs=(offsets, targets, activity)) as pool:
+                for results in pool.imap_unordered(suggest, chunks):
+                    self.save(results)
+        else:
+            init_graph(offsets, targets, activity)
+            for chunk in chunks:
+                self.save(suggest(chunk))
+
+        # Юзеры, которые отписались от всех, остались со старыми строками
+        FollowSuggestion.objects.filter(created__lt=started).delete()
+        self.stdout.write(
+            f'Рекомендации посчитаны для {len(user_ids)} юзеров '
+            f'за {(timezone.now() - started).total_seconds():.1f} с.')
+
+    @staticmethod
+    def save(results):
+        """Заменяем рекомендации пачки юзеров одной транзакцией."""
+        suggestions = [
+            FollowSuggestion(user_id=user_id, author_id=author_id,
+                             score=score)
+            for user_id, authors in results
+            for author_id, score in authors
+        ]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(
+                user_id__in=[user_id for user_id, _ in results]).delete()
+            FollowSuggestion.objects.bulk_create(suggestions, batch_size=500)
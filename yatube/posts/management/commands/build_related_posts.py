@@ -0,0 +1,49 @@
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max
+
+from ...models import Post
+from ...related import build_group, save, update_group
+
+
+class Command(BaseCommand):
+    help = ('Считает похожие посты внутри групп. Без --all дособирает '
+            'новые и изменённые посты - запускайте часто, с --all - раз '
+            'в сутки. Группа с изменениями и без --all читается и '
+            'векторизуется целиком: прогон стоит O(постов группы).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересобрать все группы целиком.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов для полной пересборки.')
+
+    def handle(self, *args, **options):
+        # Группа и её последний пост, посты без группы - группа None
+        last_ids = dict(Post.objects.order_by().values('group_id').annotate(
+            last_id=Max('id')).values_list('group_id', 'last_id'))
+        if not options['all']:
+            # Изменённые посты не видны по last_id - проверяем все группы
+            count = sum(update_group(group_id) for group_id in last_ids)
+            self.stdout.write(f'Дособрано постов: {count}')
+            return
+
+        pool = None
+        if options['workers'] > 1:
+            connections.close_all()
+            pool = Pool(options['workers'])
+        try:
+            # Считают воркеры, пишет в базу только этот процесс
+            results = (pool.imap_unordered(build_group, last_ids) if pool
+                       else map(build_group, last_ids))
+            for group_id, last_post_id, started, rows in results:
+                save(group_id, last_post_id, started, rows)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        self.stdout.write(f'Пересобрано групп: {len(last_ids)}')
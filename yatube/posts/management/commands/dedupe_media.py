@@ -0,0 +1,100 @@
+import os
+import shutil
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Value, When
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core.storage import (HASHED_NAME_RE, content_hash, hashed_name,
+                          post_images)
+
+from ...media import rebuild_refs
+from ...models import ArchivedPost, Post
+
+UPLOAD_DIR = 'posts'
+
+
+class Command(BaseCommand):
+    help = ('Переносит старые картинки из media/posts/ в хранилище по '
+            'содержимому: одинаковые файлы склеиваются в один, ссылки '
+            'постов переписываются, счётчики ссылок пересчитываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не менять.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько имён переписывать одной транзакцией.')
+
+    def handle(self, *args, **options):
+        renames = {}
+        # Уже встреченные новые имена: проверка по set, а не по values()
+        targets = set()
+        freed = 0
+        for name in self.legacy_names():
+            with post_images.open(name) as file:
+                digest = content_hash(File(file))
+            target = hashed_name(
+                UPLOAD_DIR, digest, os.path.splitext(name)[1])
+            if post_images.exists(target) or target in targets:
+                freed += post_images.size(name)
+            renames[name] = target
+            targets.add(target)
+        self.stdout.write(
+            f'Старых файлов: {len(renames)}, уникальных: '
+            f'{len(targets)}, освободится {freed} байт')
+        if options['dry_run']:
+            return
+
+        # Сначала кладём новые файлы, потом переписываем базу и только
+        # потом удаляем старые: упавшая команда ничего не ломает
+        for name, target in renames.items():
+            if not post_images.exists(target):
+                path = post_images.path(target)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.copy2(post_images.path(name), path)
+        self.rename_images(renames, options['batch_size'])
+        for name in renames:
+            # Превью старого файла резались через хранилище по умолчанию
+            default.kvstore.delete(ImageFile(name, storage=default_storage))
+            post_images.delete(name)
+        counts = rebuild_refs()
+        self.stdout.write(
+            f'Перенесено {len(renames)}, файлов со ссылками: {len(counts)}')
+
+    def legacy_names(self):
+        """Файлы в media/posts/, лежащие не по хэшу содержимого."""
+        root = post_images.path(UPLOAD_DIR)
+        for directory, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                name = os.path.relpath(
+                    os.path.join(directory, filename), post_images.location
+                ).replace(os.sep, '/')
+                if not (HASHED_NAME_RE.search(name)
+                        or filename.startswith('.upload-')):
+                    yield name
+
+    @staticmethod
+    def rename_images(renames, size):
+        """Переписываем image в постах и архиве пачками по size имён.
+
+        Каждая пачка - своя транзакция, чтобы не держать блокировку
+        записи на всё время переноса. Старые файлы ещё на месте, так что
+        пост между пачками показывает картинку и по старому имени.
+        """
+        items = list(renames.items())
+        for start in range(0, len(items), size):
+            batch = items[start:start + size]
+            with transaction.atomic():
+                for model in (Post, ArchivedPost):
+                    model.objects.filter(
+                        image__in=[name for name, _ in batch]
+                    ).update(image=Case(
+                        *[When(image=name, then=Value(target))
+                          for name, target in batch],
+                    ))
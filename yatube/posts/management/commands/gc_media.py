@@ -0,0 +1,202 @@
+import os
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core.storage import post_images
+from yatube.settings import GC_BATCH_PAUSE, GC_BATCH_SIZE, GC_MIN_AGE
+
+from ...models import ArchivedPost, MediaFile, Post
+
+UPLOAD_DIR = 'posts'
+
+
+def walk(storage, directory):
+    """(имя, путь) файлов каталога хранилища - по одному, без списка."""
+    for path, _, filenames in os.walk(storage.path(directory)):
+        for filename in filenames:
+            full_path = os.path.join(path, filename)
+            yield os.path.relpath(
+                full_path, storage.location).replace(os.sep, '/'), full_path
+
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Удаляет мусор: картинки постов без ссылок, строки kvstore '
+            'sorl без файлов, превью без строк и протухшие сессии. '
+            'Всё удаляется пачками с паузами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не удалять.')
+        parser.add_argument(
+            '--batch-size', type=int, default=GC_BATCH_SIZE,
+            help='Сколько файлов, строк kvstore или сессий в пачке.')
+        parser.add_argument(
+            '--pause', type=float, default=GC_BATCH_PAUSE,
+            help='Пауза между пачками в секундах.')
+        parser.add_argument(
+            '--min-age', type=int, default=GC_MIN_AGE,
+            help='Файлы моложе стольких секунд не трогаем.')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.size = options['batch_size']
+        self.pause = options['pause']
+        self.deadline = time.time() - options['min_age']
+        # Картинки, которые удалил бы gc_images без --dry-run
+        self.removed = set()
+        # Порядок важен: удалённые картинки делают свои строки kvstore
+        # протухшими, а из живых строк собираются имена нужных превью
+        images = self.gc_images()
+        entries, known = self.gc_kvstore()
+        thumbnails = self.gc_thumbnails(known)
+        sessions = self.gc_sessions()
+        verb = 'Будет удалено' if self.dry_run else 'Удалено'
+        self.stdout.write(
+            f'{verb}: картинок {images}, строк kvstore {entries}, '
+            f'превью {thumbnails}, сессий {sessions}')
+
+    def is_old(self, path):
+        try:
+            return os.path.getmtime(path) < self.deadline
+        except FileNotFoundError:
+            return False
+
+    def sweep(self, items, delete):
+        """Передаём items в delete пачками, возвращаем число удалённых."""
+        count = 0
+        for batch in batches(items, self.size):
+            if self.dry_run:
+                count += len(batch)
+                continue
+            count += delete(batch)
+            time.sleep(self.pause)
+        return count
+
+    def gc_images(self):
+        """Файлы в media/posts/, на которые не ссылается ни один пост."""
+        referenced = set(
+            MediaFile.objects.values_list('name', flat=True).iterator())
+        for model in (Post, ArchivedPost):
+            referenced.update(model.objects.exclude(image='').values_list(
+                'image', flat=True).iterator(chunk_size=self.size))
+        orphans = (
+            name for name, path in walk(post_images, UPLOAD_DIR)
+            if name not in referenced and self.is_old(path)
+        )
+        if self.dry_run:
+            # kvstore должен увидеть их удалёнными, как в настоящем прогоне
+            self.removed = set(orphans)
+            orphans = self.removed
+        return self.sweep(orphans, self.delete_images)
+
+    @staticmethod
+    def delete_images(names):
+        # Пока шёл обход, на файл могли сослаться снова
+        alive = set(MediaFile.objects.filter(
+            name__in=names).values_list('name', flat=True))
+        for model in (Post, ArchivedPost):
+            alive.update(model.objects.filter(
+                image__in=names).values_list('image', flat=True))
+        names = [name for name in names if name not in alive]
+        for name in names:
+            post_images.delete(name)
+        return len(names)
+
+    def gc_kvstore(self):
+        """Строки картинок kvstore без файла и имена живых превью."""
+        prefix = add_prefix('', 'image')
+        known = set()
+        # --dry-run: строки превью, которые ушли бы вместе с исходником
+        dropped = set()
+        count = 0
+        last_key = prefix
+        while True:
+            # По ключу, а не смещением: удалённые строки не сдвигают пачки
+            rows = list(KVStore.objects.filter(
+                key__gt=last_key, key__startswith=prefix
+            ).order_by('key').values_list('key', 'value')[:self.size])
+            if not rows:
+                return count, known
+            last_key = rows[-1][0]
+            stale = []
+            for key, value in rows:
+                if key in dropped:
+                    continue
+                image = deserialize_image_file(value)
+                if image.name not in self.removed and image.exists():
+                    known.add(image.name)
+                else:
+                    stale.append(image)
+            count += len(stale)
+            if self.dry_run:
+                self.plan_stale(stale, dropped, known)
+            elif stale:
+                for image in stale:
+                    # Вместе со строкой исходника уходят его превью
+                    default.kvstore.delete(image)
+                time.sleep(self.pause)
+
+    @staticmethod
+    def plan_stale(stale, dropped, known):
+        """--dry-run: превью протухших строк, как их удалит kvstore.delete.
+
+        Их строки в обходе уже не встретятся, а файлы - не дело
+        gc_thumbnails.
+        """
+        kvstore = default.kvstore
+        for image in stale:
+            keys = kvstore._get(image.key, identity='thumbnails') or []
+            for thumbnail in filter(None, map(kvstore._get, keys)):
+                dropped.add(add_prefix(thumbnail.key, 'image'))
+                known.add(thumbnail.name)
+
+    def gc_thumbnails(self, known):
+        """Файлы превью, о которых kvstore ничего не знает."""
+        storage = default.storage
+        orphans = (
+            name for name, path in walk(
+                storage, thumbnail_settings.THUMBNAIL_PREFIX)
+            if name not in known and self.is_old(path)
+        )
+
+        def delete(names):
+            for name in names:
+                storage.delete(name)
+            return len(names)
+
+        return self.sweep(orphans, delete)
+
+    def gc_sessions(self):
+        """Протухшие сессии - короткими DELETE вместо одного большого."""
+        expired = Session.objects.filter(expire_date__lt=timezone.now())
+        if self.dry_run:
+            return expired.count()
+        count = 0
+        while True:
+            keys = list(expired.values_list(
+                'session_key', flat=True)[:self.size])
+            if not keys:
+                return count
+            Session.objects.filter(session_key__in=keys).delete()
+            count += len(keys)
+            time.sleep(self.pause)
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from yatube.settings import DELETION_BATCH_PAUSE, DELETION_BATCH_SIZE
+
+from ...deletion import process
+from ...models import DeletionRequest
+
+
+class Command(BaseCommand):
+    help = ('Удаляет юзеров и группы из очереди DeletionRequest '
+            'небольшими пачками, каждую в своей транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DELETION_BATCH_SIZE,
+            help='Сколько строк удалять в одной транзакции.')
+        parser.add_argument(
+            '--pause', type=float, default=DELETION_BATCH_PAUSE,
+            help='Пауза между пачками в секундах.')
+        parser.add_argument(
+            '--forever', action='store_true',
+            help='Не выходить, а ждать новых запросов - режим воркера.')
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help='Как часто проверять очередь в режиме --forever.')
+
+    def handle(self, *args, **options):
+        while True:
+            for deletion in DeletionRequest.objects.filter(finished=None):
+                process(deletion, options['batch_size'], options['pause'])
+                self.stdout.write(
+                    f'Удалено: {deletion}, строк {deletion.deleted}')
+            if not options['forever']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,67 @@
+from datetime import timedelta
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Min
+from django.utils import timezone
+
+from ...models import ArchivedPost, Post
+from ...rollups import collect, save
+
+
+def collect_chunk(days):
+    return collect(*days)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сводки по группам и авторам за последние дни. '
+            'Запускайте раз в сутки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=7,
+            help='Сколько последних дней пересчитать, включая сегодня.')
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать всё, с первого поста.')
+        parser.add_argument(
+            '--chunk-days', type=int, default=7,
+            help='Сколько дней считает воркер за одну задачу.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов для подсчёта.')
+
+    def handle(self, *args, **options):
+        end = timezone.now().date() + timedelta(days=1)
+        start = end - timedelta(days=options['days'])
+        if options['all']:
+            firsts = [
+                model.objects.aggregate(first=Min('pub_date'))['first']
+                for model in (Post, ArchivedPost)
+            ]
+            firsts = [first.date() for first in firsts if first]
+            start = min(firsts) if firsts else end
+        step = timedelta(days=options['chunk_days'])
+        chunks = []
+        while start < end:
+            chunks.append((start, min(start + step, end)))
+            start += step
+
+        pool = None
+        if options['workers'] > 1:
+            connections.close_all()
+            pool = Pool(options['workers'])
+        try:
+            # Считают воркеры, пишет в базу только этот процесс
+            results = (pool.imap(collect_chunk, chunks) if pool
+                       else map(collect_chunk, chunks))
+            for (chunk_start, chunk_end), rows in zip(chunks, results):
+                save(chunk_start, chunk_end, *rows)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        days = sum((chunk_end - chunk_start).days
+                   for chunk_start, chunk_end in chunks)
+        self.stdout.write(f'Пересчитано дней: {days}')
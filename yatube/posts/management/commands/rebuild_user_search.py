@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from ...models import User
+from ...user_search import index_users
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает таблицу поиска юзеров пачками. Нужна один раз '
+            'для уже существующих юзеров, дальше её ведут сигналы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько юзеров обрабатывать в одной транзакции.')
+
+    def handle(self, *args, **options):
+        last_id = 0
+        count = 0
+        while True:
+            users = list(User.objects.filter(id__gt=last_id).order_by(
+                'id').only('id', 'username', 'first_name', 'last_name',
+                           'is_active')[:options['chunk_size']])
+            if not users:
+                break
+            index_users(users)
+            last_id = users[-1].id
+            count += len(users)
+        self.stdout.write(f'Проиндексировано юзеров: {count}')
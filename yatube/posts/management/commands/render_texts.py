@@ -0,0 +1,74 @@
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from core.formatting import FORMATTER_VERSION, render_text
+
+from ...models import Comment, Post
+
+
+def render_batch(rows):
+    """Рендерим пачку (id, text) в (id, html) - задача для воркера."""
+    return [(pk, render_text(text)) for pk, text in rows]
+
+
+class Command(BaseCommand):
+    help = ('Перерендеривает HTML постов и комментариев, '
+            'сохранённый старой версией форматтера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов для рендеринга.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько записей рендерит воркер за одну задачу.')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перерендерить все записи, а не только устаревшие.')
+
+    def handle(self, *args, **options):
+        pool = None
+        if options['workers'] > 1:
+            connections.close_all()
+            pool = Pool(options['workers'])
+        try:
+            for model in (Post, Comment):
+                count = self.render_model(model, pool, options)
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: '
+                    f'перерендерено {count}')
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+    def render_model(self, model, pool, options):
+        """Идём по id пачками, пачки одного круга рендерим параллельно."""
+        queryset = model.objects.order_by('id')
+        if not options['force']:
+            queryset = queryset.exclude(text_html_version=FORMATTER_VERSION)
+        size = options['batch_size']
+        batches_per_round = max(options['workers'], 1)
+        last_id = 0
+        count = 0
+        while True:
+            rows = list(queryset.filter(id__gt=last_id).values_list(
+                'id', 'text')[:size * batches_per_round])
+            if not rows:
+                return count
+            last_id = rows[-1][0]
+            batches = [rows[i:i + size] for i in range(0, len(rows), size)]
+            rendered = (pool.map(render_batch, batches) if pool
+                        else map(render_batch, batches))
+            texts = dict(rows)
+            # Пишем, только если текст тот же, что рендерили: правка
+            # поста за это время уже сохранила свежий HTML
+            with transaction.atomic():
+                for batch in rendered:
+                    for pk, html in batch:
+                        count += model.objects.filter(
+                            id=pk, text=texts[pk]).update(
+                            text_html=html,
+                            text_html_version=FORMATTER_VERSION)
@@ -0,0 +1,74 @@
+"""Счётчики ссылок на картинки постов.
+
+Одинаковые картинки хранятся одним файлом (core.storage), поэтому файл
+удаляем, только когда на него не ссылается ни один пост - ни горячий,
+ни архивный. Счётчики ведут сигналы, rebuild_refs пересчитывает их с
+нуля. release удаляет только файлы со счётчиком; файл без счётчика
+удаляет gc_media, если на него не ссылается ни один пост и он старше
+GC_MIN_AGE.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core.storage import post_images
+
+from .models import ArchivedPost, MediaFile, Post
+
+
+def retain(names):
+    """+1 к счётчику за каждое имя в names."""
+    for name, count in Counter(name for name in names if name).items():
+        with transaction.atomic():
+            updated = MediaFile.objects.filter(name=name).update(
+                refs=F('refs') + count)
+            if updated:
+                continue
+            try:
+                with transaction.atomic():
+                    MediaFile.objects.create(name=name, refs=count)
+            except IntegrityError:
+                # Счётчик успел создать параллельный запрос
+                MediaFile.objects.filter(name=name).update(
+                    refs=F('refs') + count)
+
+
+def release(name):
+    """-1 к счётчику, на нуле удаляем файл после коммита."""
+    if not name:
+        return
+    with transaction.atomic():
+        deleted, _ = MediaFile.objects.filter(name=name, refs__lte=1).delete()
+        if not deleted:
+            MediaFile.objects.filter(name=name).update(refs=F('refs') - 1)
+    if deleted:
+        transaction.on_commit(lambda: delete_file(name))
+
+
+def delete_file(name, storage=post_images):
+    """Удаляем файл и его превью, если на него снова не сослались."""
+    if MediaFile.objects.filter(name=name).exists():
+        return
+    image = ImageFile(name, storage=storage)
+    default.kvstore.delete(image)
+    image.delete()
+
+
+def rebuild_refs():
+    """Пересчитываем все счётчики по постам и архиву."""
+    counts = Counter()
+    for model in (Post, ArchivedPost):
+        counts.update(dict(
+            model.objects.exclude(image='').values_list('image')
+            .annotate(count=Count('id')).order_by()
+        ))
+    with transaction.atomic():
+        MediaFile.objects.all().delete()
+        MediaFile.objects.bulk_create(
+            [MediaFile(name=name, refs=refs) for name, refs in counts.items()],
+            batch_size=500,
+        )
+    return counts
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:28
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_follows(apps, schema_editor):
+    """Оставляем самую раннюю подписку из каждой пары юзер-автор."""
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = Follow.objects.values('user_id', 'author_id').annotate(
+        first_id=Min('id'), count=Count('id')).filter(count__gt=1).order_by()
+    for row in duplicates:
+        Follow.objects.filter(
+            user_id=row['user_id'], author_id=row['author_id']
+        ).exclude(id=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_auto_20261019_1527'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_auto_20261019_1537'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupDailyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('likes', models.PositiveIntegerField(default=0, verbose_name='Лайков')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name_plural': 'Статистика групп по дням',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AuthorDailyStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('likes', models.PositiveIntegerField(default=0, verbose_name='Лайков')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name_plural': 'Статистика авторов по дням',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupdailystats',
+            index=models.Index(fields=['day'], name='posts_group_day_adfbf1_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupdailystats',
+            constraint=models.UniqueConstraint(fields=('group', 'day'), name='unique_group_day'),
+        ),
+        migrations.AddIndex(
+            model_name='authordailystats',
+            index=models.Index(fields=['day'], name='posts_autho_day_7f51da_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='authordailystats',
+            constraint=models.UniqueConstraint(fields=('author', 'day'), name='unique_author_day'),
+        ),
+    ]
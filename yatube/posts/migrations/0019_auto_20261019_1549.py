@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:49
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def fill_search_title(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    groups = list(Group.objects.all())
+    for group in groups:
+        group.search_title = ' '.join(
+            unicodedata.normalize('NFKC', group.title).casefold().split())
+    Group.objects.bulk_update(groups, ['search_title'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_auto_20261019_1542'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='search_title',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200, verbose_name='Название для поиска'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_search_title, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_auto_20261019_1549'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionRequest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('group', 'Группа')], max_length=10, verbose_name='Что удаляем')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата запроса')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Дата удаления')),
+                ('deleted', models.PositiveIntegerField(default=0, verbose_name='Удалено строк')),
+            ],
+            options={
+                'verbose_name_plural': 'Запросы на удаление',
+                'ordering': ['created'],
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='pending_deletion',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Ждёт удаления'),
+        ),
+        migrations.AddConstraint(
+            model_name='deletionrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(finished__isnull=True), fields=('kind', 'object_id'), name='unique_pending_deletion'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 16:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0021_auto_20261019_1601'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchPrefix',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10, verbose_name='Префикс')),
+                ('term', models.CharField(max_length=300, verbose_name='Имя для поиска')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name_plural': 'Поиск юзеров',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='usersearchprefix',
+            index=models.Index(fields=['prefix', '-followers'], name='posts_users_prefix_1c0a1d_idx'),
+        ),
+    ]
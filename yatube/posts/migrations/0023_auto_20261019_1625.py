@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-19 16:25
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def set_updated_from_pub_date(apps, schema_editor):
+    # Иначе все старые посты выглядят изменёнными, и первый прогон
+    # build_related_posts пересобирает их целиком
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated=F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_auto_20261019_1602'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(
+            set_updated_from_pub_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='relatedindex',
+            name='updated',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата обновления'),
+        ),
+    ]
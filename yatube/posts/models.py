@@ -1,23 +1,92 @@
+import unicodedata
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from core.formatting import FORMATTER_VERSION, render_text
+from core.storage import post_images
+from yatube.settings import USER_SEARCH_PREFIX_LENGTH
 
 User = get_user_model()
 
 
+def search_key(text):
+    """Ключ поиска по префиксу: NFKC, без регистра и лишних пробелов."""
+    return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+def pending_user_ids():
+    """Подзапрос: id юзеров в очереди на удаление (posts.deletion)."""
+    return DeletionRequest.objects.filter(
+        kind=DeletionRequest.USER, finished=None).values('object_id')
+
+
+def visible_users():
+    """Юзеры, кроме ждущих удаления."""
+    return User.objects.exclude(id__in=pending_user_ids())
+
+
 class Group(models.Model):
     """Group model."""
     title = models.CharField(max_length=200, verbose_name="Группа")
     slug = models.SlugField(max_length=200, unique=True, verbose_name="slug")
     description = models.TextField(verbose_name="Описание")
+    search_title = models.CharField(
+        max_length=200,
+        db_index=True,
+        editable=False,
+        verbose_name="Название для поиска",
+    )
+    pending_deletion = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Ждёт удаления",
+    )
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.search_title = search_key(self.title)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name_plural = "Группы"
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def visible(self):
+        """Без постов юзеров, ждущих удаления."""
+        return self.exclude(author_id__in=pending_user_ids())
+
+
+class RenderedText(models.Model):
+    """Text with HTML rendered once on save."""
+    text_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="HTML текста",
+    )
+    text_html_version = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Версия форматтера",
+    )
+
+    class Meta:
+        abstract = True
+
+    def render_text(self):
+        self.text_html = render_text(self.text)
+        self.text_html_version = FORMATTER_VERSION
+
+    def save(self, *args, **kwargs):
+        self.render_text()
+        super().save(*args, **kwargs)
+
+
+class Post(RenderedText):
     """Post model."""
     text = models.TextField(
         verbose_name="Текст",
@@ -45,18 +114,74 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_images,
+        blank=True,
+    )
+    views = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Просмотры",
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения",
+    )
+    tags = models.ManyToManyField(
+        'Tag',
+        through='PostTag',
         blank=True,
+        related_name='posts',
+        verbose_name="Теги",
     )
 
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date']),
+            models.Index(fields=['group', '-pub_date']),
+            models.Index(fields=['author', '-pub_date']),
+        ]
         verbose_name_plural = "Посты"
 
 
-class Comment(models.Model):
+class Tag(models.Model):
+    """Hashtag from post text."""
+    name = models.CharField(max_length=100, unique=True, verbose_name="Тег")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name_plural = "Теги"
+
+
+class PostTag(models.Model):
+    """Post to tag link, parsed from text on save."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'post'], name='unique_post_tag'),
+        ]
+        verbose_name_plural = "Теги постов"
+
+
+class Comment(RenderedText):
     """Comment model."""
     post = models.ForeignKey(
         Post,
@@ -84,6 +209,7 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [models.Index(fields=['post', '-created'])]
         verbose_name_plural = "Комметарии"
 
 
@@ -101,6 +227,10 @@ class Follow(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
         verbose_name_plural = "Подписки"
 
 
@@ -121,3 +251,280 @@ class Like(models.Model):
 
     class Meta:
         verbose_name_plural = "Likes"
+
+
+class FollowSuggestion(models.Model):
+    """Precomputed "who to follow" suggestions for user."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Автор"
+    )
+    score = models.FloatField(verbose_name="Оценка")
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата расчёта"
+    )
+
+    class Meta:
+        ordering = ['-score']
+        indexes = [models.Index(fields=['user', '-score'])]
+        verbose_name_plural = "Рекомендации подписок"
+
+
+class ArchivedPost(models.Model):
+    """Old post moved out of the hot table by archive_posts."""
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name="Текст")
+    text_html = models.TextField(blank=True, verbose_name="HTML текста")
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name="Автор"
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        verbose_name="Группа",
+    )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        storage=post_images,
+        blank=True,
+    )
+    views = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
+
+    objects = PostQuerySet.as_manager()
+
+    def __str__(self):
+        return self.text[:15]
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date']),
+            models.Index(fields=['group', '-pub_date']),
+            models.Index(fields=['author', '-pub_date']),
+        ]
+        verbose_name_plural = "Архив постов"
+
+
+class ArchivedComment(models.Model):
+    """Comment of archived post."""
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name="Комментарий",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name="Автор"
+    )
+    text = models.TextField(verbose_name="Текст")
+    text_html = models.TextField(blank=True, verbose_name="HTML текста")
+    created = models.DateTimeField(verbose_name="Дата и время публикации")
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [models.Index(fields=['post', '-created'])]
+        verbose_name_plural = "Архив комментариев"
+
+
+class ArchivedLike(models.Model):
+    """Like of archived post."""
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        verbose_name="Like",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_likes',
+        verbose_name="Автор"
+    )
+
+    class Meta:
+        verbose_name_plural = "Архив лайков"
+
+
+class MediaFile(models.Model):
+    """How many posts refer to content-addressed image."""
+    name = models.CharField(max_length=100, unique=True, verbose_name="Файл")
+    refs = models.PositiveIntegerField(default=0, verbose_name="Ссылок")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name_plural = "Файлы картинок"
+
+
+class GroupDailyStats(models.Model):
+    """Posts of group per day and engagement they got, see posts.rollups."""
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name="Группа",
+    )
+    day = models.DateField(verbose_name="День")
+    posts = models.PositiveIntegerField(default=0, verbose_name="Постов")
+    comments = models.PositiveIntegerField(
+        default=0, verbose_name="Комментариев")
+    likes = models.PositiveIntegerField(default=0, verbose_name="Лайков")
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'day'], name='unique_group_day'),
+        ]
+        indexes = [models.Index(fields=['day'])]
+        verbose_name_plural = "Статистика групп по дням"
+
+
+class AuthorDailyStats(models.Model):
+    """Posts of author per day and engagement they got, see posts.rollups."""
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name="Автор",
+    )
+    day = models.DateField(verbose_name="День")
+    posts = models.PositiveIntegerField(default=0, verbose_name="Постов")
+    comments = models.PositiveIntegerField(
+        default=0, verbose_name="Комментариев")
+    likes = models.PositiveIntegerField(default=0, verbose_name="Лайков")
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['author', 'day'], name='unique_author_day'),
+        ]
+        indexes = [models.Index(fields=['day'])]
+        verbose_name_plural = "Статистика авторов по дням"
+
+
+class DeletionRequest(models.Model):
+    """User or group deleted in small batches by process_deletions."""
+    USER = 'user'
+    GROUP = 'group'
+    KIND_CHOICES = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Группа'),
+    )
+    kind = models.CharField(
+        max_length=10, choices=KIND_CHOICES, verbose_name="Что удаляем")
+    object_id = models.PositiveIntegerField(verbose_name="id")
+    name = models.CharField(max_length=200, verbose_name="Название")
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата запроса"
+    )
+    finished = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Дата удаления"
+    )
+    deleted = models.PositiveIntegerField(
+        default=0, verbose_name="Удалено строк")
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.name}'
+
+    class Meta:
+        ordering = ['created']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                condition=models.Q(finished__isnull=True),
+                name='unique_pending_deletion'),
+        ]
+        verbose_name_plural = "Запросы на удаление"
+
+
+class RelatedPost(models.Model):
+    """Top-K similar posts of the same group, see posts.related."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='related_links',
+        verbose_name="Пост",
+    )
+    related = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Похожий пост",
+    )
+    score = models.FloatField(verbose_name="Сходство")
+
+    class Meta:
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'related'], name='unique_related_post'),
+        ]
+        indexes = [models.Index(fields=['post', '-score'])]
+        verbose_name_plural = "Похожие посты"
+
+
+class RelatedIndex(models.Model):
+    """Up to which post id and post change time related posts are built."""
+    group = models.OneToOneField(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='related_index',
+        verbose_name="Группа",
+    )
+    last_post_id = models.PositiveIntegerField(
+        default=0, verbose_name="Последний пост")
+    updated = models.DateTimeField(
+        default=timezone.now, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name_plural = "Индекс похожих постов"
+
+
+class UserSearchPrefix(models.Model):
+    """Prefix of normalized user name for search, see posts.user_search."""
+    prefix = models.CharField(
+        max_length=USER_SEARCH_PREFIX_LENGTH, verbose_name="Префикс")
+    term = models.CharField(max_length=300, verbose_name="Имя для поиска")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Пользователь",
+    )
+    followers = models.PositiveIntegerField(
+        default=0, verbose_name="Подписчиков")
+
+    class Meta:
+        indexes = [models.Index(fields=['prefix', '-followers'])]
+        verbose_name_plural = "Поиск юзеров"
@@ -0,0 +1,136 @@
+"""Сколько вышло новых постов - для баннера "Новых постов: N".
+
+Клиент присылает id самого нового поста, который видел. У общей ленты,
+у каждой группы и у каждого автора есть кольцо id последних
+NEW_POSTS_RING_SIZE видимых постов, новые первыми. Кольца лежат в общем
+кэше 'shared', их видят все процессы. Своего кольца у ленты подписок
+нет: её кольцо сливается из колец авторов, на которых подписан читатель.
+
+Кольцо - снимок из базы после коммита поста, а не дописывание в кэш:
+одновременные посты не теряются, а снимок старше лежащего в кэше не
+пишется. В ключе колец версия спрятанного (posts.deletion): спрятали
+юзера - кольца начинаются заново, уже без его постов.
+
+Опрос идёт через кэш процесса: кольцо ленты процесс держит
+SHARED_REFRESH секунд, список авторов ленты подписок -
+NEW_POSTS_FOLLOWS_TIMEOUT (свой процесс сбрасывает его на подписке).
+Раз в SHARED_REFRESH секунд на ленту процесс читает 'shared'; совсем
+без SQL опрос только тогда, когда 'shared' - не таблица в базе
+(memcached, redis).
+"""
+from itertools import chain
+
+from django.core import signing
+from django.core.cache import cache, caches
+from django.db import transaction
+
+from yatube.settings import (NEW_POSTS_FOLLOW_AUTHORS,
+                             NEW_POSTS_FOLLOWS_TIMEOUT, NEW_POSTS_RING_SIZE,
+                             NEW_POSTS_TIMEOUT, SHARED_REFRESH)
+
+from .deletion import hidden_version
+from .models import Follow, Post
+
+SALT = 'yatube.new_posts'
+
+
+def ring_key(scope, version):
+    return f'new_posts:{version}:{scope}'
+
+
+def local_ring_key(feed):
+    """Копия кольца ленты в кэше процесса: (версия спрятанного, кольцо)."""
+    return f'new_posts:local:{feed}'
+
+
+def follows_key(user_id):
+    return f'new_posts:follows:{user_id}'
+
+
+def post_scopes(post):
+    """{лента: фильтр её постов} для лент, куда попадает пост."""
+    scopes = {
+        'all': {},
+        f'author:{post.author_id}': {'author_id': post.author_id},
+    }
+    if post.group_id:
+        scopes[f'group:{post.group_id}'] = {'group_id': post.group_id}
+    return scopes
+
+
+def push(post):
+    """Пересобираем кольца лент поста, когда он закоммичен."""
+    transaction.on_commit(lambda: rebuild(post_scopes(post)))
+
+
+def rebuild(scopes):
+    version = hidden_version()
+    rings = {
+        scope: list(
+            Post.objects.visible().filter(**filters).order_by(
+                '-id').values_list('id', flat=True)[:NEW_POSTS_RING_SIZE])
+        for scope, filters in scopes.items()
+    }
+    shared = caches['shared']
+    cached = shared.get_many([ring_key(scope, version) for scope in rings])
+    fresh = {
+        scope: ring for scope, ring in rings.items()
+        # Параллельный пост успел записать снимок новее - не затираем
+        if ring[:1] >= cached.get(ring_key(scope, version), [])[:1]
+    }
+    shared.set_many({
+        ring_key(scope, version): ring for scope, ring in fresh.items()
+    }, NEW_POSTS_TIMEOUT)
+    # Свой процесс видит новый пост сразу
+    cache.set_many({
+        local_ring_key(scope): (version, ring)
+        for scope, ring in fresh.items()
+    }, SHARED_REFRESH)
+
+
+def count_newer(feed, scopes, after):
+    """(сколько постов ленты новее after, их может быть больше).
+
+    Кольцо ленты - слияние колец scopes.
+    """
+    version = hidden_version()
+    key = local_ring_key(feed)
+    stored = cache.get(key)
+    if stored is not None and stored[0] == version:
+        ring = stored[1]
+    else:
+        rings = caches['shared'].get_many(
+            [ring_key(scope, version) for scope in scopes])
+        ring = sorted(chain.from_iterable(rings.values()),
+                      reverse=True)[:NEW_POSTS_RING_SIZE]
+        cache.set(key, (version, ring), SHARED_REFRESH)
+    count = sum(1 for post_id in ring if post_id > after)
+    return count, count == NEW_POSTS_RING_SIZE
+
+
+def follow_token(user):
+    """Подписанный id юзера: ленту подписок опрашиваем без сессии."""
+    return signing.Signer(salt=SALT).sign(str(user.id))
+
+
+def follow_feed(token):
+    """(лента, кольца авторов) подписок юзера токена или None."""
+    try:
+        user_id = signing.Signer(salt=SALT).unsign(token)
+    except signing.BadSignature:
+        return None
+    key = follows_key(user_id)
+    scopes = cache.get(key)
+    if scopes is None:
+        author_ids = Follow.objects.filter(user_id=user_id).order_by(
+            '-id').values_list('author_id', flat=True)
+        scopes = [f'author:{author_id}'
+                  for author_id in author_ids[:NEW_POSTS_FOLLOW_AUTHORS]]
+        cache.set(key, scopes, NEW_POSTS_FOLLOWS_TIMEOUT)
+    return f'follow:{user_id}', scopes
+
+
+def forget_follows(user_id):
+    """Подписки юзера изменились: его лента собирается заново."""
+    cache.delete_many(
+        [follows_key(user_id), local_ring_key(f'follow:{user_id}')])
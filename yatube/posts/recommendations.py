@@ -0,0 +1,86 @@
+"""Кого почитать: офлайн-расчёт рекомендаций по графу подписок.
+
+Граф подписок грузится целиком в компактные массивы (CSR):
+подписки пользователя u лежат в targets[offsets[u]:offsets[u + 1]].
+Кандидаты - авторы, на которых подписаны те, на кого подписан u.
+"""
+import heapq
+import math
+from array import array
+from datetime import timedelta
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Follow, Post, User
+
+# Вес активности автора относительно одной общей подписки
+ACTIVITY_WEIGHT = 0.5
+
+_graph = None
+
+
+def load_follow_graph():
+    """Грузим подписки в массивы offsets/targets, индекс - id юзера."""
+    max_id = User.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    offsets = array('q', bytes(8 * (max_id + 2)))
+    targets = array('i')
+    edges = Follow.objects.order_by('user_id', 'author_id').values_list(
+        'user_id', 'author_id')
+    for user_id, author_id in edges.iterator(chunk_size=10000):
+        if user_id > max_id or author_id > max_id:
+            # Юзер появился уже после подсчёта max_id
+            continue
+        targets.append(author_id)
+        offsets[user_id + 1] += 1
+    for i in range(1, len(offsets)):
+        offsets[i] += offsets[i - 1]
+    return offsets, targets
+
+
+def load_activity(max_id, days):
+    """Число постов каждого автора за последние days дней."""
+    activity = array('i', bytes(4 * (max_id + 1)))
+    since = timezone.now() - timedelta(days=days)
+    counts = Post.objects.filter(pub_date__gte=since).order_by().values(
+        'author_id').annotate(count=Count('id')).values_list(
+        'author_id', 'count')
+    for author_id, count in counts:
+        activity[author_id] = count
+    return activity
+
+
+def init_graph(offsets, targets, activity):
+    """Кладём граф в глобал процесса (initializer для Pool)."""
+    global _graph
+    _graph = (offsets, targets, activity)
+
+
+def suggest_for_user(user_id, top):
+    """Top авторов для user_id: (author_id, score) по убыванию score."""
+    offsets, targets, activity = _graph
+    following = targets[offsets[user_id]:offsets[user_id + 1]]
+    followed = set(following)
+    common = {}
+    for friend in following:
+        for author in targets[offsets[friend]:offsets[friend + 1]]:
+            if author != user_id and author not in followed:
+                common[author] = common.get(author, 0) + 1
+    scored = (
+        (count + ACTIVITY_WEIGHT * math.log1p(activity[author]), author)
+        for author, count in common.items()
+    )
+    return [(author, score) for score, author in heapq.nlargest(top, scored)]
+
+
+def suggest_for_users(user_ids, top):
+    """Рекомендации для пачки юзеров (задача для воркера)."""
+    return [(user_id, suggest_for_user(user_id, top)) for user_id in user_ids]
+
+
+def users_with_follows(offsets):
+    """id юзеров, у которых есть хотя бы одна подписка."""
+    return [
+        user_id for user_id in range(len(offsets) - 1)
+        if offsets[user_id + 1] > offsets[user_id]
+    ]
@@ -0,0 +1,150 @@
+"""Похожие посты для post_detail.
+
+Сравнивать текст с каждым постом на запросе нельзя, поэтому команда
+build_related_posts заранее считает TF-IDF по текстам постов внутри
+каждой группы (посты без группы - тоже одна группа) и кладёт
+RELATED_POSTS_COUNT самых похожих по косинусу в RelatedPost.
+Сходство считаем через инвертированный индекс термов: пост сравнивается
+только с постами, у которых есть общие термы. Инкрементальный прогон
+берёт посты группы новее RelatedIndex.last_post_id и изменённые (текст
+или группа) после RelatedIndex.updated и пересчитывает их, старые
+посты, которым они оказались похожи, и посты, которым они были похожи.
+Статистику термов между прогонами не храним: группа с изменениями
+каждый раз читается и векторизуется целиком, O(постов группы).
+Полная пересборка раскладывает группы по процессам.
+"""
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from yatube.settings import RELATED_MAX_DF, RELATED_POSTS_COUNT
+
+from .models import Post, RelatedIndex, RelatedPost
+
+WORD_RE = re.compile(r'\w{3,}')
+
+
+def terms(text):
+    return Counter(
+        word for word in WORD_RE.findall(text.lower()) if not word.isdigit())
+
+
+def vectorize(texts):
+    """{id: {терм: вес}} - нормированные TF-IDF векторы текстов {id: текст}.
+    """
+    counts = {post_id: terms(text) for post_id, text in texts.items()}
+    df = Counter()
+    for post_terms in counts.values():
+        df.update(post_terms.keys())
+    total = len(counts)
+    vectors = {}
+    for post_id, post_terms in counts.items():
+        weights = {
+            term: (1 + math.log(tf)) * math.log(total / df[term])
+            for term, tf in post_terms.items()
+        }
+        norm = math.sqrt(sum(weight ** 2 for weight in weights.values()))
+        # Терм одного поста ни с кем не совпадёт, а слишком частый
+        # тянет за собой всю группу - в индекс их не берём
+        vectors[post_id] = {
+            term: weight / norm for term, weight in weights.items()
+            if weight and 1 < df[term] <= RELATED_MAX_DF * total
+        } if norm else {}
+    return vectors
+
+
+def neighbours(vectors, post_ids, count=RELATED_POSTS_COUNT):
+    """Строки (пост, похожий пост, сходство) для post_ids."""
+    postings = defaultdict(list)
+    for post_id, vector in vectors.items():
+        for term, weight in vector.items():
+            postings[term].append((post_id, weight))
+    rows = []
+    for post_id in post_ids:
+        scores = defaultdict(float)
+        for term, weight in vectors[post_id].items():
+            for other_id, other_weight in postings[term]:
+                if other_id != post_id:
+                    scores[other_id] += weight * other_weight
+        rows += [
+            (post_id, other_id, score) for other_id, score in heapq.nlargest(
+                count, scores.items(), key=itemgetter(1))
+        ]
+    return rows
+
+
+def group_texts(group_id):
+    return dict(
+        Post.objects.filter(group_id=group_id).values_list('id', 'text'))
+
+
+def build_group(group_id):
+    """Все похожие посты группы - задача для воркера, в базу не пишет."""
+    # Время до чтения текстов: изменённое во время сборки - в следующий раз
+    started = timezone.now()
+    texts = group_texts(group_id)
+    vectors = vectorize(texts)
+    return (group_id, max(texts, default=0), started,
+            neighbours(vectors, texts))
+
+
+def save(group_id, last_post_id, started, rows, post_ids=None):
+    """Заменяем строки постов post_ids (по умолчанию - всей группы)."""
+    with transaction.atomic():
+        if post_ids is None:
+            RelatedPost.objects.filter(post__group_id=group_id).delete()
+        else:
+            RelatedPost.objects.filter(post_id__in=post_ids).delete()
+            # Пост перешёл в эту группу - у постов старой он не похожий
+            RelatedPost.objects.filter(related_id__in=post_ids).exclude(
+                post__group_id=group_id).delete()
+        RelatedPost.objects.bulk_create(
+            [RelatedPost(post_id=post_id, related_id=related_id, score=score)
+             for post_id, related_id, score in rows],
+            batch_size=500)
+        RelatedIndex.objects.update_or_create(
+            group_id=group_id,
+            defaults={'last_post_id': last_post_id, 'updated': started})
+
+
+def update_group(group_id):
+    """Дособираем новые и изменённые посты группы, возвращаем их число."""
+    started = timezone.now()
+    index = RelatedIndex.objects.filter(group_id=group_id).first()
+    changed = Post.objects.filter(group_id=group_id)
+    if index:
+        changed = changed.filter(
+            Q(id__gt=index.last_post_id) | Q(updated__gt=index.updated))
+    changed_ids = set(changed.values_list('id', flat=True))
+    if not changed_ids:
+        return 0
+    texts = group_texts(group_id)
+    changed_ids &= texts.keys()
+    vectors = vectorize(texts)
+    rows = neighbours(vectors, changed_ids)
+    # Пересчитываем целиком старые посты, которым изменённые похожи
+    # сейчас или были похожи до изменения
+    affected = {related_id for _, related_id, _ in rows}
+    affected.update(RelatedPost.objects.filter(
+        related_id__in=changed_ids, post__group_id=group_id,
+    ).values_list('post_id', flat=True))
+    affected = (affected & texts.keys()) - changed_ids
+    rows += neighbours(vectors, affected)
+    save(group_id, max(texts), started, rows, changed_ids | affected)
+    return len(changed_ids)
+
+
+def related_posts(post):
+    """Похожие посты: чтение по индексу и одна выборка постов по id."""
+    ids = list(RelatedPost.objects.filter(post_id=post.id).values_list(
+        'related_id', flat=True)[:RELATED_POSTS_COUNT])
+    if not ids:
+        return []
+    posts = Post.objects.visible().in_bulk(ids)
+    return [posts[post_id] for post_id in ids if post_id in posts]
@@ -0,0 +1,72 @@
+"""Сводки по группам и авторам за день.
+
+Дашборды читают только маленькие таблицы GroupDailyStats и
+AuthorDailyStats, живые агрегаты по постам, комментариям и лайкам
+считает rebuild_rollups кусками по несколько дней.
+
+День строки - день публикации поста: комментарии и лайки считаем к
+посту, у лайков своей даты нет. Поэтому недавние дни пересчитываем
+каждые сутки, пока к их постам ещё приходят отклики.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (ArchivedComment, ArchivedLike, ArchivedPost,
+                     AuthorDailyStats, Comment, GroupDailyStats, Like, Post)
+
+COUNTERS = ('posts', 'comments', 'likes')
+
+# Горячие и архивные таблицы: (посты, комментарии, лайки)
+SOURCES = (
+    (Post, Comment, Like),
+    (ArchivedPost, ArchivedComment, ArchivedLike),
+)
+
+
+def day_start(day):
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def collect(start_day, end_day):
+    """Сводки за дни [start_day, end_day) - задача для воркера.
+
+    Возвращает строки (id группы или автора, день, посты, комменты, лайки).
+    """
+    start, end = day_start(start_day), day_start(end_day)
+    groups = defaultdict(Counter)
+    authors = defaultdict(Counter)
+    for tables in SOURCES:
+        for counter, model in zip(COUNTERS, tables):
+            prefix = '' if counter == 'posts' else 'post__'
+            rows = model.objects.filter(**{
+                f'{prefix}pub_date__gte': start,
+                f'{prefix}pub_date__lt': end,
+            }).annotate(day=TruncDate(f'{prefix}pub_date')).order_by()
+            for totals, key in ((groups, 'group_id'),
+                                (authors, 'author_id')):
+                for pk, day, count in rows.values_list(
+                        f'{prefix}{key}', 'day').annotate(count=Count('id')):
+                    totals[pk, day][counter] += count
+    return [
+        [(*key, *(counts[name] for name in COUNTERS))
+         for key, counts in totals.items()]
+        for totals in (groups, authors)
+    ]
+
+
+def save(start_day, end_day, group_rows, author_rows):
+    """Заменяем сводки за дни [start_day, end_day) одной транзакцией."""
+    with transaction.atomic():
+        for model, key, rows in (
+                (GroupDailyStats, 'group_id', group_rows),
+                (AuthorDailyStats, 'author_id', author_rows)):
+            model.objects.filter(day__gte=start_day, day__lt=end_day).delete()
+            model.objects.bulk_create([
+                model(**{key: pk}, day=day, **dict(zip(COUNTERS, counts)))
+                for pk, day, *counts in rows
+            ], batch_size=500)
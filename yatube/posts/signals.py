@@ -0,0 +1,108 @@
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import new_posts
+from .media import release, retain
+from .models import ArchivedPost, Follow, Group, Post, User, UserSearchPrefix
+from .tags import extract_tags, sync_tags
+from .user_search import INDEXED_FIELDS, index_users
+from .utils import GROUP_CHOICES_KEY, follow_counts_key
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def reset_follow_counts(sender, instance, **kwargs):
+    """Сбрасываем закэшированное число подписчиков и подписок."""
+    cache.delete_many([
+        follow_counts_key(instance.user_id),
+        follow_counts_key(instance.author_id),
+    ])
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def reset_new_posts_follows(sender, instance, **kwargs):
+    """Лента подписок для баннера новых постов собирается заново."""
+    new_posts.forget_follows(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def update_user_search(sender, instance, raw=False, update_fields=None,
+                       **kwargs):
+    """Пересобираем строки поиска юзера, если поменялось имя."""
+    if raw or update_fields and not INDEXED_FIELDS & set(update_fields):
+        return
+    index_users([instance])
+
+
+@receiver(post_save, sender=Follow)
+def count_search_follower(sender, instance, created, raw=False, **kwargs):
+    """Новый подписчик поднимает автора в поиске."""
+    if created and not raw:
+        UserSearchPrefix.objects.filter(user_id=instance.author_id).update(
+            followers=F('followers') + 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_search_follower(sender, instance, **kwargs):
+    UserSearchPrefix.objects.filter(
+        user_id=instance.author_id, followers__gt=0).update(
+        followers=F('followers') - 1)
+
+
+@receiver([post_save, post_delete], sender=Group)
+def reset_group_choices(sender, instance, **kwargs):
+    """Сбрасываем закэшированный список групп для формы поста."""
+    cache.delete(GROUP_CHOICES_KEY)
+
+
+@receiver(post_save, sender=Post)
+def update_post_tags(sender, instance, created, raw=False, **kwargs):
+    """Разбираем хэштеги поста при каждом сохранении."""
+    if raw or created and not extract_tags(instance.text):
+        return
+    sync_tags([instance])
+
+
+@receiver(post_save, sender=Post)
+def push_new_post(sender, instance, created, raw=False, **kwargs):
+    """Новый пост - в кольца для баннера "Новых постов: N"."""
+    if created and not raw:
+        new_posts.push(instance)
+
+
+@receiver(post_init, sender=Post)
+def remember_post_image(sender, instance, **kwargs):
+    """Запоминаем картинку из базы, чтобы заметить её замену.
+
+    Берём сырое значение: отложенное поле не должно тянуть запрос.
+    У отложенного поля (.only()/.defer()) значение неизвестно - None.
+    """
+    if 'image' not in instance.__dict__:
+        instance._stored_image = None
+        return
+    image = instance.__dict__['image']
+    instance._stored_image = image if isinstance(image, str) else ''
+
+
+@receiver(post_save, sender=Post)
+def count_post_image(sender, instance, created, raw=False, **kwargs):
+    """Новая картинка +1 к счётчику, заменённая -1."""
+    if raw:
+        return
+    old = '' if created else instance._stored_image
+    if old is None:
+        # Прежняя картинка не загружалась - счётчик не трогаем, иначе
+        # каждое сохранение такого поста добавляло бы ссылку
+        return
+    new = instance.image.name or ''
+    if new != old:
+        retain([new])
+        release(old)
+        instance._stored_image = new
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def release_post_image(sender, instance, **kwargs):
+    release(instance.image.name)
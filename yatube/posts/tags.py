@@ -0,0 +1,45 @@
+"""Хэштеги из текста постов: разбираем при сохранении, а не ищем LIKE."""
+from core.formatting import HASHTAG_RE
+
+from .models import PostTag, Tag
+
+
+def extract_tags(text):
+    """Имена тегов из текста, в нижнем регистре."""
+    return {match.group('tag').lower() for match in HASHTAG_RE.finditer(text)}
+
+
+def sync_tags(posts):
+    """Приводим связи пачки постов с тегами к тегам из их текста.
+
+    Число запросов не зависит от размера пачки.
+    """
+    wanted = {post.id: extract_tags(post.text) for post in posts}
+    current = {}
+    for link_id, post_id, name in PostTag.objects.filter(
+            post_id__in=wanted).values_list('id', 'post_id', 'tag__name'):
+        current.setdefault(post_id, {})[name] = link_id
+    stale = [
+        link_id
+        for post_id, links in current.items()
+        for name, link_id in links.items() if name not in wanted[post_id]
+    ]
+    missing = [
+        (post_id, name)
+        for post_id, names in wanted.items()
+        for name in names if name not in current.get(post_id, {})
+    ]
+    if stale:
+        PostTag.objects.filter(id__in=stale).delete()
+    if not missing:
+        return
+    names = {name for _, name in missing}
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names], ignore_conflicts=True)
+    tag_ids = dict(
+        Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    PostTag.objects.bulk_create(
+        [PostTag(post_id=post_id, tag_id=tag_ids[name])
+         for post_id, name in missing],
+        ignore_conflicts=True,
+    )
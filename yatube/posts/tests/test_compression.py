@@ -0,0 +1,85 @@
+import gzip
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+
+from core import compression
+from core.compression import choose_encoding
+
+from ..models import Post, User
+from .utils import get_reverse_url
+
+
+class CompressionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user_author, text=f'{i}й тестовый пост')
+            for i in range(5)
+        ]
+        cls.index = ('posts:index', None, None)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_choose_encoding(self):
+        """Кодировка по Accept-Encoding с учётом q=0."""
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertIsNone(choose_encoding('gzip;q=0, deflate'))
+        self.assertIsNone(choose_encoding(''))
+        self.assertEqual(
+            choose_encoding('br, gzip'),
+            'br' if compression.brotli else 'gzip')
+
+    def test_cached_page_compressed_once(self):
+        """Кэшированная страница: сжатое тело берётся из кэша."""
+        url = get_reverse_url(self.index)
+        plain = self.guest_client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        with patch('core.compression.compress',
+                   wraps=compression.compress) as mocked:
+            first = self.guest_client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.guest_client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(gzip.decompress(second.content), plain.content)
+        self.assertEqual(second['Content-Length'], str(len(second.content)))
+
+    def test_uncached_page_not_stored(self):
+        """Некэшируемая страница сжимается, но в кэш не попадает."""
+        url = get_reverse_url(('posts:post_detail', None, [self.posts[0].id]))
+        with patch('core.compression.cache') as mocked:
+            response = self.guest_client.get(
+                url, HTTP_ACCEPT_ENCODING='gzip')
+        mocked.set.assert_not_called()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(self.posts[0].text, gzip.decompress(
+            response.content).decode())
+
+    def test_streaming_compressed(self):
+        """Потоковый ответ сжимается по кускам."""
+        url = get_reverse_url(('posts:sitemap_chunk', None, [0]))
+        plain = b''.join(self.guest_client.get(url).streaming_content)
+        response = self.guest_client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    @skipUnless(compression.brotli, 'brotli не установлен')
+    def test_brotli(self):
+        """С brotli клиент, умеющий br, получает br."""
+        url = get_reverse_url(self.index)
+        plain = self.guest_client.get(url).content
+        response = self.guest_client.get(url, HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content),
+                         plain)
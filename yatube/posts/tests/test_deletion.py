@@ -0,0 +1,145 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+
+from ..deletion import hidden_version, process, schedule_group_deletion
+from ..models import (Comment, DeletionRequest, Follow, Group, Like, Post,
+                      User)
+from ..utils import group_choices
+from .utils import get_reverse_url
+
+
+class DeletionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.user_reader = User.objects.create_user(username='Reader')
+        cls.user_admin = User.objects.create_superuser(
+            username='Admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user_author,
+                text=f'{i}й пост автора',
+                group=cls.group,
+            )
+            for i in range(5)
+        ]
+        cls.reader_post = Post.objects.create(
+            author=cls.user_reader, text='Пост читателя', group=cls.group)
+        for post in cls.posts:
+            Comment.objects.create(
+                post=post, author=cls.user_reader, text='Коммент читателя')
+            Like.objects.create(post=post, author=cls.user_reader)
+        Comment.objects.create(
+            post=cls.reader_post, author=cls.user_author,
+            text='Коммент автора')
+        Like.objects.create(post=cls.reader_post, author=cls.user_author)
+        Follow.objects.create(user=cls.user_reader, author=cls.user_author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.user_admin)
+
+    def schedule_user(self):
+        self.admin_client.post(
+            '/admin/auth/user/',
+            {'action': 'schedule_deletion',
+             '_selected_action': [self.user_author.id]})
+
+    def test_user_hidden_right_away(self):
+        """Юзер из админки сразу пропадает с сайта и лент."""
+        self.schedule_user()
+        self.assertTrue(DeletionRequest.objects.filter(
+            kind=DeletionRequest.USER, object_id=self.user_author.id,
+            finished=None).exists())
+        for url_tuple in (
+            ('posts:profile', None, [self.user_author.username]),
+            ('posts:post_detail', None, [self.posts[0].id]),
+            ('posts:profile_rss', None, [self.user_author.username]),
+        ):
+            with self.subTest(url=url_tuple[0]):
+                response = self.guest_client.get(get_reverse_url(url_tuple))
+                self.assertEqual(response.status_code, 404)
+        for url_tuple in (
+            ('posts:index', None, None),
+            ('posts:group_list', None, [self.group.slug]),
+            ('posts:index_rss', None, None),
+            ('posts:post_detail', None, [self.reader_post.id]),
+        ):
+            with self.subTest(url=url_tuple[0]):
+                content = self.guest_client.get(
+                    get_reverse_url(url_tuple)).content.decode()
+                self.assertNotIn('пост автора', content)
+                self.assertNotIn('Коммент автора', content)
+        self.assertEqual(Post.objects.count(), 6)
+
+    def test_hidden_user_not_counted(self):
+        """Лайк и коммент прячущегося юзера не входят в счётчики ленты."""
+        self.schedule_user()
+        response = self.guest_client.get(
+            get_reverse_url(('posts:index', None, None)))
+        post = response.context['page_obj'][0]
+        self.assertEqual(post, self.reader_post)
+        self.assertEqual((post.likes_count, post.comments_count), (0, 0))
+
+    def test_hidden_user_not_in_follow_counts(self):
+        """Счётчик подписок сходится со списком без прячущегося юзера."""
+        self.schedule_user()
+        response = self.guest_client.get(get_reverse_url(
+            ('posts:profile_following', None, [self.user_reader.username])))
+        self.assertEqual(response.context['following_count'], 0)
+        self.assertEqual(list(response.context['users']), [])
+
+    def test_deactivated_user_stays_visible(self):
+        """Отключённый, но не удаляемый юзер не прячется."""
+        User.objects.filter(id=self.user_author.id).update(is_active=False)
+        response = self.guest_client.get(get_reverse_url(
+            ('posts:profile', None, [self.user_author.username])))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'пост автора')
+
+    def test_hidden_version_shared(self):
+        """Версию спрятанного видят и другие процессы."""
+        before = hidden_version()
+        self.schedule_user()
+        # Другой процесс: своего кэша нет, читает общий
+        cache.clear()
+        self.assertNotEqual(hidden_version(), before)
+
+    def test_process_user_in_batches(self):
+        """Воркер удаляет юзера со всеми строками мелкими пачками."""
+        self.schedule_user()
+        call_command(
+            'process_deletions', batch_size=2, pause=0, stdout=StringIO())
+        deletion = DeletionRequest.objects.get()
+        self.assertIsNotNone(deletion.finished)
+        # 6 лайков, 6 комментов, подписка, 5 постов и сам юзер
+        self.assertEqual(deletion.deleted, 19)
+        self.assertFalse(User.objects.filter(
+            id=self.user_author.id).exists())
+        self.assertEqual(list(Post.objects.all()), [self.reader_post])
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(Comment.objects.count(), 0)
+
+    def test_group_deletion(self):
+        """Группа сразу прячется, а посты после воркера остаются без неё."""
+        deletion = schedule_group_deletion(self.group)
+        self.assertNotIn(
+            (self.group.id, self.group.title), group_choices())
+        response = self.guest_client.get(
+            get_reverse_url(('posts:group_list', None, [self.group.slug])))
+        self.assertEqual(response.status_code, 404)
+        process(deletion, batch_size=4, pause=0)
+        self.assertFalse(Group.objects.filter(id=self.group.id).exists())
+        self.assertEqual(Post.objects.filter(group=None).count(), 6)
+        self.assertEqual(deletion.deleted, 7)
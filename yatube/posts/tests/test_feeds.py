@@ -0,0 +1,92 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+
+from ..archive import archive_posts
+from ..models import Group, Post, User
+from .utils import get_reverse_url
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user_author,
+                text=f'{i}й тестовый пост',
+                group=cls.group,
+            )
+            for i in range(3)
+        ]
+        # name template arg
+        cls.feeds = (
+            ('posts:index_rss', None, None),
+            ('posts:index_atom', None, None),
+            ('posts:group_rss', None, [cls.group.slug]),
+            ('posts:group_atom', None, [cls.group.slug]),
+            ('posts:profile_rss', None, [cls.user_author.username]),
+            ('posts:profile_atom', None, [cls.user_author.username]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_feeds_have_posts(self):
+        """В лентах есть посты со ссылками на них."""
+        for url_tuple in self.feeds:
+            with self.subTest(url=url_tuple[0]):
+                response = self.guest_client.get(get_reverse_url(url_tuple))
+                self.assertEqual(response.status_code, 200)
+                content = response.content.decode()
+                for post in self.posts:
+                    self.assertIn(post.text, content)
+                    self.assertIn(f'/posts/{post.id}/', content)
+
+    def test_feed_not_modified_until_new_post(self):
+        """304 по ETag, пока не появился новый пост."""
+        url = get_reverse_url(self.feeds[0])
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        post = Post.objects.create(author=self.user_author, text='Новый пост')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(post.text, response.content.decode())
+
+    def test_feed_body_cached(self):
+        """Повторная лента без нового поста - один запрос за ETag."""
+        url = get_reverse_url(self.feeds[2])
+        content = self.guest_client.get(url).content
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(url)
+        self.assertEqual(response.content, content)
+
+    def test_unknown_author_feed(self):
+        """Лента несуществующего автора - 404."""
+        response = self.guest_client.get(
+            get_reverse_url(('posts:profile_rss', None, ['nobody'])))
+        self.assertEqual(response.status_code, 404)
+
+    def test_sitemap(self):
+        """Карта сайта: индекс кусков и посты с архивом в куске."""
+        archive_posts([self.posts[0].id])
+        response = self.guest_client.get(
+            get_reverse_url(('posts:sitemap', None, None)))
+        content = b''.join(response.streaming_content).decode()
+        chunk_url = get_reverse_url(('posts:sitemap_chunk', None, [0]))
+        self.assertIn(f'http://testserver{chunk_url}', content)
+        response = self.guest_client.get(chunk_url)
+        content = b''.join(response.streaming_content).decode()
+        for post in self.posts:
+            self.assertIn(
+                f'<loc>http://testserver/posts/{post.id}/</loc>', content)
+        response = self.guest_client.get(
+            chunk_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -1,11 +1,19 @@
+import hashlib
 import shutil
 import tempfile
+from unittest.mock import patch
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
+from core.storage import hashed_name
+
+from ..forms import PostForm
 from ..models import Comment, Group, Post, User
 from .utils import checking_post_content, get_reverse_url
 
@@ -54,6 +62,9 @@ class PostcreateFormTests(TestCase):
             content=small_2_gif,
             content_type='image/gif'
         )
+        # Имя картинки в хранилище - хэш содержимого
+        cls.image_name = hashed_name(
+            'posts', hashlib.sha256(small_gif).hexdigest(), '.gif')
 
         # name _template arg
         cls.profile = ('posts:profile', 'posts/profile.html',
@@ -95,7 +106,7 @@ class PostcreateFormTests(TestCase):
         checking_post_content(
             self, post,
             form_data['text'], self.user_author.username, form_data['group'],
-            'posts/' + form_data['image'].name
+            self.image_name
         )
 
     def test_authorized_edit_post(self):
@@ -121,9 +132,26 @@ class PostcreateFormTests(TestCase):
         checking_post_content(
             self, post,
             form_data['text'], self.user_author.username, form_data['group'],
-            'posts/' + form_data['image'].name
+            self.image_name
         )
 
+    def test_edit_keeps_views(self):
+        """Правка не затирает просмотры, записанные после загрузки поста."""
+        is_valid = PostForm.is_valid
+
+        def is_valid_with_views(form):
+            # Буфер просмотров сбросился, пока юзер правил пост
+            Post.objects.filter(id=self.post.id).update(views=F('views') + 5)
+            return is_valid(form)
+
+        views = Post.objects.get(id=self.post.id).views
+        with patch.object(PostForm, 'is_valid', is_valid_with_views):
+            self.authorized_client.post(
+                get_reverse_url(self.edit), data={'text': 'Правка'})
+        post = Post.objects.get(id=self.post.id)
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.views, views + 5)
+
     def test_guest_create_post(self):
         """Гость не может создать новую запись и проверяем редирект"""
         posts_count = Post.objects.count()
@@ -189,3 +217,81 @@ class PostcreateFormTests(TestCase):
         self.assertFalse(Comment.objects.filter(
             text='Тестовый гостем коммент').exists()
         )
+
+
+class GroupChoicesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            title='Тестовая Группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+        cls.create = ('posts:post_create', 'posts/post_create.html', None)
+        cls.autocomplete = ('posts:group_autocomplete', None, None)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user_author)
+
+    def group_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        return [query['sql'] for query in context.captured_queries
+                if '"posts_group"' in query['sql']]
+
+    def test_choices_cached_until_group_changes(self):
+        """Список групп формы берётся из кэша до изменения групп."""
+        url = get_reverse_url(self.create)
+        self.assertEqual(len(self.group_queries(url)), 1)
+        self.assertEqual(self.group_queries(url), [])
+        group = Group.objects.create(
+            title='Новая группа', slug='new_slug', description='Описание')
+        response = self.authorized_client.get(url)
+        self.assertContains(response, f'<option value="{group.id}">')
+
+    def test_validation_checks_one_group(self):
+        """Проверка группы - запрос одной группы по id."""
+        form = PostForm(data={'text': 'Пост', 'group': self.group.id})
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(form.is_valid())
+        # Поле формы и валидация модели ищут группу по id, весь список
+        # групп не читается
+        for query in context.captured_queries:
+            self.assertIn('"posts_group"."id" = ', query['sql'])
+        form = PostForm(data={'text': 'Пост', 'group': 100500})
+        self.assertFalse(form.is_valid())
+        self.assertIn('group', form.errors)
+
+    def test_autocomplete(self):
+        """Поиск группы по началу названия без учёта регистра."""
+        url = get_reverse_url(self.autocomplete)
+        cases = {
+            'тестовая гр': [self.group.title],
+            '  ТЕСТ': [self.group.title],
+            '': [self.other_group.title, self.group.title],
+            'нет такой': [],
+        }
+        for query, titles in cases.items():
+            with self.subTest(query=query):
+                response = self.authorized_client.get(url, {'q': query})
+                self.assertEqual(
+                    [group['title'] for group in response.json()['results']],
+                    titles)
+
+    def test_many_groups_use_search(self):
+        """Когда групп много, в форме только выбранная группа и поиск."""
+        with patch('posts.forms.GROUP_SELECT_LIMIT', 1):
+            form = PostForm(initial={'group': self.group.id})
+            html = str(form['group'])
+        self.assertIn(get_reverse_url(self.autocomplete), html)
+        self.assertIn(f'<option value="{self.group.id}" selected>', html)
+        self.assertNotIn(f'value="{self.other_group.id}"', html)
@@ -0,0 +1,267 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core.storage import post_images
+
+from ..archive import archive_posts
+from ..models import ArchivedPost, MediaFile, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+OTHER_GIF = SMALL_GIF[:-1] + b'\x00\x3b'
+
+
+# TransactionTestCase: файлы удаляются в on_commit
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaStorageTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='Writer')
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content, name='meme.gif'):
+        post = Post(author=self.user, text='Мем')
+        post.image.save(name, ContentFile(content), save=False)
+        post.save()
+        return post
+
+    def refs(self, name):
+        media = MediaFile.objects.filter(name=name).first()
+        return media.refs if media else 0
+
+    def test_same_upload_is_stored_once(self):
+        """Одинаковые загрузки - один файл с двумя ссылками."""
+        first = self.create_post(SMALL_GIF, 'first.gif')
+        second = self.create_post(SMALL_GIF, 'second.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}'
+                              r'\.gif$')
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл живёт, пока на него ссылается хоть один пост."""
+        first = self.create_post(SMALL_GIF)
+        second = self.create_post(SMALL_GIF)
+        name = first.image.name
+        first.delete()
+        self.assertTrue(post_images.exists(name))
+        self.assertEqual(self.refs(name), 1)
+        second.delete()
+        self.assertFalse(post_images.exists(name))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+
+    def test_replaced_image_released(self):
+        """Заменённая при правке картинка удаляется."""
+        post = self.create_post(SMALL_GIF)
+        old_name = post.image.name
+        post = Post.objects.get(id=post.id)
+        post.image.save('new.gif', ContentFile(OTHER_GIF))
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post_images.exists(old_name))
+        self.assertEqual(self.refs(post.image.name), 1)
+
+    def test_deferred_image_not_counted(self):
+        """Сохранение поста с отложенной картинкой не меняет счётчик."""
+        post = self.create_post(SMALL_GIF)
+        name = post.image.name
+        for _ in range(2):
+            deferred = Post.objects.only('id', 'text').get(id=post.id)
+            deferred.text = 'Правка'
+            deferred.save()
+        self.assertEqual(self.refs(name), 1)
+        post.delete()
+        self.assertFalse(post_images.exists(name))
+
+    def test_archive_keeps_image(self):
+        """Архивный пост держит ссылку на картинку."""
+        post = self.create_post(SMALL_GIF)
+        name = post.image.name
+        archive_posts([post.id])
+        self.assertTrue(post_images.exists(name))
+        self.assertEqual(self.refs(name), 1)
+        ArchivedPost.objects.get(id=post.id).delete()
+        self.assertFalse(post_images.exists(name))
+
+    def test_dedupe_media(self):
+        """dedupe_media склеивает старые одинаковые файлы."""
+        os.makedirs(post_images.path('posts'))
+        for name in ('posts/old_1.gif', 'posts/old_2.gif'):
+            with open(post_images.path(name), 'wb') as file:
+                file.write(SMALL_GIF)
+            Post.objects.bulk_create(
+                [Post(author=self.user, text='Старый пост', image=name)])
+        call_command('dedupe_media', stdout=StringIO())
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        name = images.pop()
+        self.assertTrue(post_images.exists(name))
+        self.assertEqual(self.refs(name), 2)
+        self.assertFalse(post_images.exists('posts/old_1.gif'))
+        self.assertFalse(post_images.exists('posts/old_2.gif'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaGCTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Writer')
+
+    def setUp(self):
+        # kvstore sorl кэширует строки, а база между тестами откатывается
+        cache.clear()
+        self.post = Post(author=self.user, text='Мем')
+        self.post.image.save('meme.gif', ContentFile(SMALL_GIF))
+        self.thumbnail = get_thumbnail(self.post.image, '10x10')
+        # Картинка отредактированного поста, потерявшая счётчик
+        self.orphan = ImageFile(
+            post_images.save('posts/old.gif', ContentFile(OTHER_GIF)),
+            storage=post_images)
+        self.orphan_thumbnail = get_thumbnail(self.orphan, '10x10')
+        self.stray = default.storage.save(
+            'cache/stray.gif', ContentFile(SMALL_GIF))
+        now = timezone.now()
+        Session.objects.bulk_create([
+            Session(session_key=f'expired{i}', session_data='',
+                    expire_date=now - timedelta(days=1))
+            for i in range(3)
+        ] + [Session(session_key='alive', session_data='',
+                     expire_date=now + timedelta(days=1))])
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_media', '--pause', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_and_min_age(self):
+        """--dry-run только считает, свежие файлы не трогаем."""
+        out = self.gc('--dry-run', '--min-age', '0')
+        self.assertIn('картинок 1', out)
+        self.assertIn('сессий 3', out)
+        self.assertTrue(post_images.exists(self.orphan.name))
+        self.assertEqual(Session.objects.count(), 4)
+        self.gc()
+        self.assertTrue(post_images.exists(self.orphan.name))
+        self.assertTrue(default.storage.exists(self.stray))
+
+    def test_dry_run_counts_match(self):
+        """--dry-run насчитывает столько же, сколько удалит прогон."""
+        # Исходник пропал, а его строка и превью в kvstore остались
+        gone = ImageFile(
+            post_images.save('posts/gone.gif', ContentFile(SMALL_GIF)),
+            storage=post_images)
+        get_thumbnail(gone, '10x10')
+        post_images.delete(gone.name)
+        planned = self.gc('--dry-run', '--min-age', '0')
+        done = self.gc('--min-age', '0')
+        self.assertIn('строк kvstore 2, превью 1', done)
+        self.assertEqual(planned.replace('Будет удалено', 'Удалено'), done)
+
+    def test_garbage_removed(self):
+        """Удаляем мусор, картинки постов и их превью остаются."""
+        self.gc('--min-age', '0', '--batch-size', '2')
+        self.assertFalse(post_images.exists(self.orphan.name))
+        self.assertIsNone(default.kvstore.get(self.orphan))
+        self.assertFalse(self.orphan_thumbnail.exists())
+        self.assertFalse(default.storage.exists(self.stray))
+        self.assertTrue(post_images.exists(self.post.image.name))
+        self.assertTrue(self.thumbnail.exists())
+        self.assertIsNotNone(default.kvstore.get(self.thumbnail))
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['alive'])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.name = post_images.save('posts/meme.gif', ContentFile(SMALL_GIF))
+        cls.url = settings.MEDIA_URL + cls.name
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_full_file(self):
+        """Файл целиком, с ETag и поддержкой диапазонов."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), SMALL_GIF)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(response['ETag'])
+
+    def test_if_none_match(self):
+        """Совпавший ETag - 304 без тела."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_ranges(self):
+        """Диапазоны байт: обычный, с конца и за концом файла."""
+        size = len(SMALL_GIF)
+        cases = {
+            'bytes=2-5': (206, SMALL_GIF[2:6], f'bytes 2-5/{size}'),
+            'bytes=-3': (206, SMALL_GIF[-3:],
+                         f'bytes {size - 3}-{size - 1}/{size}'),
+            f'bytes={size}-': (416, b'', f'bytes */{size}'),
+        }
+        for header, (status, content, content_range) in cases.items():
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response['Content-Range'], content_range)
+                body = (b''.join(response.streaming_content)
+                        if response.streaming else response.content)
+                self.assertEqual(body, content)
+
+    def test_stale_if_range_gets_full_file(self):
+        """If-Range с чужим ETag - отдаём весь файл."""
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_accel_redirect(self):
+        """С nginx отдаём только заголовок, байты шлёт он."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_ACCEL_PREFIX + self.name)
+        self.assertEqual(response.content, b'')
+
+    def test_outside_media_root(self):
+        """Файлы вне MEDIA_ROOT и скрытые не отдаём."""
+        for path in ('../manage.py', 'posts/.upload-tmp', 'posts/missing'):
+            with self.subTest(path=path):
+                response = self.client.get(settings.MEDIA_URL + path)
+                self.assertEqual(response.status_code, 404)
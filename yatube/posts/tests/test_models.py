@@ -1,5 +1,11 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
 
+from core.formatting import FORMATTER_VERSION, render_text
+
 from ..models import Group, Post, User
 
 
@@ -67,3 +73,71 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+class RenderedTextTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_text_rendered_on_save(self):
+        """HTML поста рендерится при сохранении."""
+        post = Post.objects.create(
+            author=self.user,
+            text='**Жирный** и *курсив*\nhttps://ya.ru\n\n<script>',
+        )
+        self.assertEqual(
+            post.text_html,
+            '<p><strong>Жирный</strong> и <em>курсив</em><br>\n'
+            '<a href="https://ya.ru" rel="nofollow noopener" '
+            'target="_blank">https://ya.ru</a></p>\n'
+            '<p>&lt;script&gt;</p>'
+        )
+        self.assertEqual(post.text_html_version, FORMATTER_VERSION)
+
+    def test_only_http_links(self):
+        """Ссылки с чужими схемами остаются текстом."""
+        comment_text = '[жми](javascript:alert(1)) [ок](http://ya.ru)'
+        self.assertEqual(
+            render_text(comment_text),
+            '<p>[жми](javascript:alert(1)) <a href="http://ya.ru" '
+            'rel="nofollow noopener" target="_blank">ок</a></p>'
+        )
+
+    def test_hashtags_linked(self):
+        """Хэштеги превращаются в ссылки на ленту тега."""
+        self.assertEqual(
+            render_text('#Котики, но не a#b'),
+            '<p><a href="/tag/%D0%BA%D0%BE%D1%82%D0%B8%D0%BA%D0%B8/">'
+            '#Котики</a>, но не a#b</p>'
+        )
+
+    def test_render_texts_command(self):
+        """Команда перерендеривает записи старой версии."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'*Пост {i}*') for i in range(3)
+        ])
+        call_command('render_texts', batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list(
+                'text_html', flat=True)),
+            ['<p><em>Пост 0</em></p>', '<p><em>Пост 1</em></p>',
+             '<p><em>Пост 2</em></p>']
+        )
+
+    def test_render_texts_keeps_edited_post(self):
+        """Пост, исправленный во время рендера, команда не затирает."""
+        post = Post.objects.create(author=self.user, text='*Старый*')
+        Post.objects.filter(id=post.id).update(text_html_version=0)
+
+        def edit_then_render(text):
+            post.text = '*Новый*'
+            post.save()
+            return render_text(text)
+
+        with mock.patch('posts.management.commands.render_texts.render_text',
+                        side_effect=edit_then_render):
+            call_command('render_texts', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, '<p><em>Новый</em></p>')
@@ -0,0 +1,85 @@
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import Client, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..deletion import schedule_user_deletion
+from ..models import Follow, Group, Post, User
+from ..new_posts import follow_token
+from .utils import get_reverse_url
+
+
+class NewPostsTest(TransactionTestCase):
+    """Кольца пересобираются после коммита, поэтому без обёртки TestCase."""
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        self.user_author = User.objects.create_user(username='Writer')
+        self.user_other = User.objects.create_user(username='Other')
+        self.user_reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=self.user_reader, author=self.user_author)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.url = get_reverse_url(('posts:new_posts', None, None))
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user_reader)
+        self.seen = Post.objects.create(
+            author=self.user_other, text='Уже видели')
+        Post.objects.create(
+            author=self.user_author, text='Новый пост', group=self.group)
+        Post.objects.create(author=self.user_other, text='Ещё новый пост')
+
+    def count(self, **params):
+        response = self.guest_client.get(
+            self.url, {'after': self.seen.id, **params})
+        return response.json()['count']
+
+    def test_new_posts_counted_from_shared_cache(self):
+        """Опрос не ходит в таблицу постов и видит кольца других процессов."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.count(), 2)
+            self.assertEqual(self.count(group=self.group.id), 1)
+        self.assertFalse(
+            [q for q in queries.captured_queries if 'posts_post' in q['sql']])
+
+    def test_warm_poll_without_queries(self):
+        """Повторный опрос - из кэша процесса, без запросов к базе."""
+        token = follow_token(self.user_reader)
+        for params in ({}, {'group': self.group.id}, {'follow': token}):
+            with self.subTest(params=params):
+                self.count(**params)
+                with self.assertNumQueries(0):
+                    self.count(**params)
+
+    def test_hidden_posts_not_counted(self):
+        """Посты спрятанного юзера в баннер не попадают."""
+        schedule_user_deletion(self.user_other)
+        Post.objects.create(author=self.user_author, text='После удаления')
+        self.assertEqual(self.count(), 2)
+
+    def test_banner_polls_from_newest_post(self):
+        """Баннер на первой странице опрашивает от самого нового поста."""
+        newest = Post.objects.latest('pub_date')
+        response = self.guest_client.get(
+            get_reverse_url(('posts:index', None, None)))
+        self.assertIn(f'{self.url}?after={newest.id}',
+                      response.content.decode())
+
+    def test_follow_feed(self):
+        """Лента подписок - из колец авторов по токену со страницы."""
+        response = self.authorized_client.get(
+            get_reverse_url(('posts:follow_index', None, None)))
+        token = response.context['new_posts_token']
+        self.assertIn('new-posts', response.content.decode())
+        self.assertEqual(self.count(follow=token), 1)
+        Follow.objects.create(user=self.user_reader, author=self.user_other)
+        self.assertEqual(self.count(follow=token), 2)
+        response = self.guest_client.get(
+            self.url, {'after': 0, 'follow': token + 'x'})
+        self.assertEqual(response.status_code, 400)
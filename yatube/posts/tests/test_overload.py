@@ -0,0 +1,181 @@
+from io import StringIO
+
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.overload import LoadMonitor
+
+from ..deletion import process, schedule_user_deletion
+from ..models import ArchivedPost, Comment, Post, User
+from .utils import get_reverse_url
+
+
+class OverloadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.user_staff = User.objects.create_user(
+            username='Staff', is_staff=True)
+        cls.post = Post.objects.create(
+            author=cls.user_author, text='Тестовый пост')
+        Comment.objects.create(
+            post=cls.post, author=cls.user_author, text='Старый коммент')
+        cls.post_detail = ('posts:post_detail', None, [cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user_author)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.user_staff)
+
+    def set_mode(self, mode):
+        self.staff_client.post(reverse('core:overload'), {'mode': mode})
+        self.addCleanup(cache.clear)
+
+    def test_monitor_enters_and_leaves_overload(self):
+        """Перегрузка по числу запросов в работе, выход - с запасом."""
+        monitor = LoadMonitor(max_in_flight=2, latency_ms=100)
+        for _ in range(3):
+            monitor.start()
+        self.assertTrue(monitor.overloaded)
+        monitor.finish('posts:index', 10)
+        monitor.finish('posts:index', 10)
+        self.assertFalse(monitor.overloaded)
+        self.assertEqual(monitor.snapshot()['metrics']['overloads'], 1)
+
+    def test_monitor_overloaded_by_latency(self):
+        """Перегрузка по среднему времени ответа."""
+        monitor = LoadMonitor(max_in_flight=10, latency_ms=100)
+        for _ in range(10):
+            monitor.start()
+            monitor.finish('posts:follow_index', 1000)
+        self.assertTrue(monitor.overloaded)
+        self.assertGreater(
+            dict(monitor.snapshot()['views'])['posts:follow_index'], 100)
+
+    def test_degraded_mode(self):
+        """Анонимам - копия, без комментариев, лайк - 503 с Retry-After."""
+        url = get_reverse_url(self.post_detail)
+        self.guest_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user_author, text='Новый коммент')
+        self.set_mode('on')
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Degraded'], 'stale')
+        content = response.content.decode()
+        self.assertIn('Старый коммент', content)
+        self.assertNotIn('Новый коммент', content)
+
+        response = self.authorized_client.get(url)
+        self.assertIsNone(response.context['comments'])
+        self.assertNotIn('Старый коммент', response.content.decode())
+
+        response = self.authorized_client.get(
+            get_reverse_url(('posts:post_like', None, [self.post.id])))
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response.has_header('Retry-After'))
+
+        response = self.staff_client.get(reverse('core:overload'))
+        self.assertEqual(response.context['mode'], 'on')
+        self.assertGreaterEqual(response.context['state']['metrics']['shed'],
+                                1)
+        self.set_mode('off')
+        response = self.guest_client.get(url)
+        self.assertFalse(response.has_header('X-Degraded'))
+        self.assertIn('Новый коммент', response.content.decode())
+
+    def test_overload_page_for_staff_only(self):
+        """Страница режима - только для staff."""
+        response = self.authorized_client.get(reverse('core:overload'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_mode_shared_between_processes(self):
+        """Ручной режим виден процессу со своим пустым кэшем."""
+        self.set_mode('on')
+        cache.clear()
+        response = self.guest_client.get(
+            get_reverse_url(('posts:index', None, None)))
+        self.assertTrue(response.wsgi_request.degraded)
+
+    def test_stale_copy_only_for_plain_pages(self):
+        """Копии - по пути и ?page=, другие параметры их не плодят."""
+        url = get_reverse_url(('posts:index', None, None))
+        for params in ({'page': 1}, {'utm': 'x'}, {'page': 1000}):
+            self.guest_client.get(url, params)
+        self.set_mode('on')
+        for params, degraded in (
+                ({}, True), ({'page': 1}, True), ({'page': 2}, False),
+                ({'utm': 'x'}, False), ({'page': 1000}, False)):
+            with self.subTest(params=params):
+                response = self.guest_client.get(url, params)
+                self.assertEqual(response.has_header('X-Degraded'), degraded)
+
+    def test_stale_copy_dropped(self):
+        """Копию спрятанного поста больше не отдаём."""
+        hidden = Post.objects.create(
+            author=self.user_staff, text='Спрячем')
+        url = get_reverse_url(('posts:post_detail', None, [hidden.id]))
+        self.guest_client.get(url)
+        schedule_user_deletion(self.user_staff)
+        self.set_mode('on')
+        response = self.guest_client.get(url)
+        self.assertFalse(response.has_header('X-Degraded'))
+        self.assertEqual(response.status_code, 404)
+
+
+class StaleCopyTest(TransactionTestCase):
+    """Версия копий меняется после коммита, поэтому без обёртки TestCase."""
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        self.user_author = User.objects.create_user(username='Writer')
+        self.user_admin = User.objects.create_superuser(
+            username='Admin', email='admin@example.com', password='pass')
+        self.posts = [
+            Post.objects.create(author=self.user_author, text=f'{i}й пост')
+            for i in range(5)
+        ]
+        self.guest_client = Client()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.user_admin)
+        self.addCleanup(cache.clear)
+        self.addCleanup(caches['shared'].clear)
+
+    def shared_queries(self, context):
+        return [query['sql'] for query in context.captured_queries
+                if 'yatube_shared_cache' in query['sql']]
+
+    def test_admin_delete_drops_copy(self):
+        """Копию удалённого в админке поста больше не отдаём."""
+        post = self.posts[0]
+        url = get_reverse_url(('posts:post_detail', None, [post.id]))
+        self.guest_client.get(url)
+        self.admin_client.post(
+            f'/admin/posts/post/{post.id}/delete/', {'post': 'yes'})
+        self.admin_client.post(reverse('core:overload'), {'mode': 'on'})
+        response = self.guest_client.get(url)
+        self.assertFalse(response.has_header('X-Degraded'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_jobs_skip_shared_cache(self):
+        """Архив и удаление пачками не пишут в общий кэш на каждый пост."""
+        with CaptureQueriesContext(connection) as context:
+            call_command('archive_posts', days=0, stdout=StringIO())
+        self.assertEqual(ArchivedPost.objects.count(), len(self.posts))
+        self.assertEqual(self.shared_queries(context), [])
+        Post.objects.bulk_create(
+            Post(author=self.user_author, text=f'{i}й новый пост')
+            for i in range(5))
+        deletion = schedule_user_deletion(self.user_author)
+        with CaptureQueriesContext(connection) as context:
+            process(deletion, pause=0)
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(self.shared_queries(context), [])
@@ -0,0 +1,99 @@
+import os
+import pstats
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import profiling
+
+from ..models import Post, User
+from .utils import get_reverse_url
+
+TEMP_PROFILE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@patch('core.profiling.PROFILE_DIR', TEMP_PROFILE_DIR)
+class ProfilerTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_staff = User.objects.create_user(
+            username='Staff', is_staff=True)
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.post = Post.objects.create(
+            author=cls.user_author, text='Тестовый пост')
+        cls.detail = ('posts:post_detail', None, [cls.post.id])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_PROFILE_DIR, ignore_errors=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.user_staff)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user_author)
+
+    def test_staff_param_profiles_request(self):
+        """?_profile у staff пишет pstats, свёрнутые стеки и описание."""
+        response = self.staff_client.get(
+            get_reverse_url(self.detail), {'_profile': 1})
+        name = response['X-Profile-Id']
+        for extension in profiling.EXTENSIONS:
+            self.assertTrue(os.path.exists(
+                os.path.join(TEMP_PROFILE_DIR, f'{name}.{extension}')))
+        profile, = profiling.list_profiles()
+        self.assertEqual(profile['view'], 'posts:post_detail')
+
+    def test_param_ignored_for_non_staff(self):
+        """Не staff ?_profile не включает."""
+        response = self.authorized_client.get(
+            get_reverse_url(self.detail), {'_profile': 1})
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_signed_header(self):
+        """Подписанный заголовок включает профиль и гостю, чужой - нет."""
+        out = StringIO()
+        call_command('profile_token', stdout=out, stderr=StringIO())
+        client = Client()
+        response = client.get(
+            get_reverse_url(self.detail), HTTP_X_PROFILE='подделка')
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        response = client.get(
+            get_reverse_url(self.detail),
+            HTTP_X_PROFILE=out.getvalue().strip())
+        self.assertTrue(response.has_header('X-Profile-Id'))
+
+    def test_profiles_capped(self):
+        """Хранится не больше PROFILE_MAX_COUNT профилей."""
+        with patch('core.profiling.PROFILE_MAX_COUNT', 2):
+            for _ in range(3):
+                self.staff_client.get(
+                    get_reverse_url(self.detail), {'_profile': 1})
+        self.assertEqual(len(profiling.list_profiles()), 2)
+        self.assertEqual(len(os.listdir(TEMP_PROFILE_DIR)), 6)
+
+    def test_staff_page(self):
+        """Страница профилей только для staff, файлы скачиваются."""
+        name = self.staff_client.get(
+            get_reverse_url(self.detail), {'_profile': 1})['X-Profile-Id']
+        url = reverse('core:profile_list')
+        self.assertEqual(self.authorized_client.get(url).status_code, 302)
+        response = self.staff_client.get(url)
+        self.assertContains(response, name)
+        response = self.staff_client.get(
+            reverse('core:profile_download', args=[name, 'prof']))
+        with tempfile.NamedTemporaryFile() as dump:
+            dump.write(b''.join(response.streaming_content))
+            dump.flush()
+            functions = pstats.Stats(dump.name).stats
+        self.assertIn('post_detail', {name for _, _, name in functions})
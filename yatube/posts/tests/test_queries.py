@@ -0,0 +1,179 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from yatube.settings import POSTS_PER_PAGE
+
+from .. import urls
+from ..counters import post_views
+from ..models import Comment, Follow, Group, Like, Post, User
+from .utils import get_reverse_url
+
+# Сколько постов в базе на каждом прогоне: меньше страницы,
+# ровно страница и несколько страниц
+DATA_SIZES = (1, POSTS_PER_PAGE, 3 * POSTS_PER_PAGE)
+
+# Потолок запросов для каждого url из posts/urls.py,
+# включая два запроса на сессию и юзера, COUNT архива, чтение общего
+# режима перегрузки и общей версии спрятанного в лентах (кэш очищается)
+QUERY_BUDGETS = {
+    'posts:index': 7,
+    'posts:group_list': 8,
+    'posts:tag_posts': 7,
+    'posts:profile': 11,
+    'posts:profile_followers': 8,
+    'posts:profile_following': 7,
+    'posts:post_detail': 11,
+    'posts:post_create': 4,
+    'posts:post_edit': 5,
+    'posts:add_comment': 4,
+    'posts:follow_index': 7,
+    'posts:follow_suggestions': 4,
+    'posts:profile_follow': 6,
+    'posts:profile_unfollow': 7,
+    'posts:post_like': 7,
+    'posts:post_unlike': 4,
+    'posts:index_rss': 4,
+    'posts:index_atom': 4,
+    'posts:group_rss': 5,
+    'posts:group_atom': 5,
+    'posts:profile_rss': 5,
+    'posts:profile_atom': 5,
+    'posts:sitemap': 3,
+    'posts:sitemap_chunk': 3,
+    'posts:group_autocomplete': 2,
+    'posts:new_posts': 3,
+    'posts:user_search': 5,
+    'posts:user_autocomplete': 3,
+}
+
+# Параметры запроса для url, которые без них ничего не делают
+URL_PARAMS = {
+    'posts:user_search': {'q': 'wri'},
+    'posts:user_autocomplete': {'q': 'wri'},
+}
+
+# Полный проход по таблице без индекса
+FULL_SCAN_RE = re.compile(
+    r'^SCAN (TABLE )?posts_(post|comment|like|follow)\b(?!.*\bUSING\b)')
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.user_reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user_reader, author=cls.user_author)
+        cls.post = Post.objects.create(
+            author=cls.user_author,
+            text='Пост, к которому растут комментарии #тест',
+            group=cls.group,
+        )
+
+        cls.url_args = {
+            'slug': cls.group.slug,
+            'name': 'тест',
+            'username': cls.user_author.username,
+            'chunk': 0,
+        }
+
+    def setUp(self):
+        self.authorized_reader = Client()
+        self.authorized_reader.force_login(self.user_reader)
+        self.authorized_author = Client()
+        self.authorized_author.force_login(self.user_author)
+
+    def add_posts(self, count):
+        """Посты автора с комментариями и лайками.
+
+        Комментарии к self.post растут вместе с числом постов.
+        """
+        for i in range(count):
+            Comment.objects.create(
+                post=self.post, author=self.user_reader, text='Ещё ком')
+            post = Post.objects.create(
+                author=self.user_author,
+                text=f'{i}й тестовый пост #тест',
+                group=self.group,
+            )
+            for user in (self.user_author, self.user_reader):
+                Comment.objects.create(post=post, author=user, text='Ком')
+                Like.objects.create(post=post, author=user)
+
+    def url_patterns(self):
+        """Имена и адреса всех url из posts/urls.py."""
+        seen = set()
+        for pattern in urls.urlpatterns:
+            name = f'{urls.app_name}:{pattern.name}'
+            if name in seen:
+                continue
+            seen.add(name)
+            args = [
+                self.post.id if arg == 'post_id' else self.url_args[arg]
+                for arg in pattern.pattern.converters
+            ]
+            yield name, get_reverse_url((name, None, args))
+
+    def capture(self, name, url):
+        """Запросы в базу при обращении к url."""
+        cache.clear()
+        # Сброс просмотров - раз в пачку, а не на каждый запрос
+        post_views.flush()
+        client = (self.authorized_author if name == 'posts:post_edit'
+                  else self.authorized_reader)
+        # Откатываем изменения, чтобы прогоны не зависели от порядка url
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as context:
+                client.get(url, URL_PARAMS.get(name, {}))
+            transaction.set_rollback(True)
+        return context.captured_queries
+
+    def test_every_url_has_budget(self):
+        """У каждого url из posts/urls.py задан потолок запросов."""
+        for name, _ in self.url_patterns():
+            with self.subTest(name=name):
+                self.assertIn(name, QUERY_BUDGETS)
+
+    def test_query_count_does_not_grow(self):
+        """Число запросов в потолке и не растёт с объёмом данных."""
+        counts = {}
+        created = 0
+        for size in DATA_SIZES:
+            self.add_posts(size - created)
+            created = size
+            for name, url in self.url_patterns():
+                with self.subTest(name=name, size=size):
+                    queries = self.capture(name, url)
+                    self.assertLessEqual(
+                        len(queries), QUERY_BUDGETS[name],
+                        '\n'.join(query['sql'] for query in queries))
+                    counts.setdefault(name, set()).add(len(queries))
+        for name, sizes in counts.items():
+            with self.subTest(name=name):
+                self.assertEqual(len(sizes), 1, f'{name}: {sorted(sizes)}')
+
+    def test_no_full_table_scans(self):
+        """В планах запросов нет полных проходов по большим таблицам."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN есть только в SQLite')
+        self.add_posts(DATA_SIZES[-1])
+        for name, url in self.url_patterns():
+            for query in self.capture(name, url):
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                    plan = [row[-1] for row in cursor.fetchall()]
+                with self.subTest(name=name, sql=sql):
+                    scans = [step for step in plan if FULL_SCAN_RE.match(step)]
+                    self.assertEqual(scans, [], '\n'.join(plan))
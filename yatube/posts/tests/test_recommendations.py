@@ -0,0 +1,55 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, FollowSuggestion, Post, User
+
+
+class FollowSuggestionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.friend = User.objects.create_user(username='Friend')
+        cls.popular = User.objects.create_user(username='Popular')
+        cls.active = User.objects.create_user(username='Active')
+        cls.followed = User.objects.create_user(username='Followed')
+        Follow.objects.create(user=cls.reader, author=cls.friend)
+        Follow.objects.create(user=cls.reader, author=cls.followed)
+        Follow.objects.create(user=cls.friend, author=cls.popular)
+        Follow.objects.create(user=cls.friend, author=cls.active)
+        Follow.objects.create(user=cls.friend, author=cls.followed)
+        Follow.objects.create(user=cls.followed, author=cls.popular)
+        Post.objects.create(author=cls.active, text='Активный пост')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_build_suggestions(self):
+        """Рекомендуем авторов друзей по числу общих подписок."""
+        call_command('build_follow_suggestions', stdout=StringIO())
+        authors = list(FollowSuggestion.objects.filter(
+            user=self.reader).values_list('author', flat=True))
+        self.assertEqual(authors, [self.popular.id, self.active.id])
+
+    def test_suggestions_page(self):
+        """Страница рекомендаций читает посчитанные строки."""
+        FollowSuggestion.objects.create(
+            user=self.reader, author=self.popular, score=1)
+        response = self.reader_client.get(
+            reverse('posts:follow_suggestions'))
+        self.assertEqual(
+            [s.author for s in response.context['suggestions']],
+            [self.popular])
+
+    def test_follow_removes_suggestion(self):
+        """После подписки автор пропадает из рекомендаций."""
+        FollowSuggestion.objects.create(
+            user=self.reader, author=self.popular, score=1)
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.popular.username]))
+        self.assertFalse(FollowSuggestion.objects.filter(
+            user=self.reader, author=self.popular).exists())
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+
+from ..models import Group, Post, RelatedPost, User
+from ..related import related_posts
+from .utils import get_reverse_url
+
+CAT_TEXTS = (
+    'Кошка спит на диване, кошка мурлычет',
+    'Моя кошка ловит мышь и мурлычет',
+    'Кошка и котята спят на диване',
+)
+PYTHON_TEXTS = (
+    'Пишем генераторы на python и asyncio',
+    'Профилируем python код и asyncio',
+    'Генераторы python экономят память',
+)
+
+
+class RelatedPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.cats = [
+            Post.objects.create(
+                author=cls.user_author, text=text, group=cls.group)
+            for text in CAT_TEXTS
+        ]
+        cls.pythons = [
+            Post.objects.create(
+                author=cls.user_author, text=text, group=cls.group)
+            for text in PYTHON_TEXTS
+        ]
+        # В другой группе похожий текст не считается
+        cls.other = Post.objects.create(
+            author=cls.user_author, text=CAT_TEXTS[0],
+            group=Group.objects.create(title='Другая', slug='other'))
+
+    def build(self, *args):
+        call_command('build_related_posts', *args, stdout=StringIO())
+
+    def test_related_within_group(self):
+        """Похожие посты - по тексту и только из той же группы."""
+        self.build('--all')
+        with self.assertNumQueries(2):
+            related = related_posts(self.cats[0])
+        self.assertEqual(set(related), set(self.cats[1:]))
+        self.assertEqual(related[0], self.cats[2])
+        response = Client().get(
+            get_reverse_url(('posts:post_detail', None, [self.cats[0].id])))
+        self.assertEqual(response.context['related'], related)
+        self.assertContains(response, 'Похожие посты')
+
+    def test_incremental_update(self):
+        """Новый пост дособирается и попадает в похожие старых постов."""
+        self.build('--all')
+        new_post = Post.objects.create(
+            author=self.user_author, group=self.group,
+            text='Котята и кошка мурлычет на диване')
+        self.assertFalse(RelatedPost.objects.filter(post=new_post).exists())
+        self.build()
+        self.assertIn(self.cats[0], related_posts(new_post))
+        self.assertIn(new_post, related_posts(self.cats[0]))
+        self.assertNotIn(new_post, related_posts(self.pythons[0]))
+
+    def test_changed_posts_reindexed(self):
+        """Изменённый и перенесённый посты переиндексируются без --all."""
+        self.build('--all')
+        edited = self.pythons[2]
+        edited.text = 'Кошка мурлычет и спит на диване'
+        edited.save()
+        moved = self.cats[2]
+        moved.group = self.other.group
+        moved.save()
+        self.build()
+        self.assertIn(self.cats[0], related_posts(edited))
+        self.assertNotIn(edited, related_posts(self.pythons[0]))
+        self.assertFalse(
+            set(related_posts(moved)) & {*self.cats, *self.pythons})
+        self.assertNotIn(moved, related_posts(self.cats[0]))
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..archive import archive_posts
+from ..models import (AuthorDailyStats, Comment, Group, GroupDailyStats, Like,
+                      Post, User)
+
+
+class RollupsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.today = timezone.now().date()
+        cls.yesterday = cls.today - timedelta(days=1)
+        posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}',
+                                group=cls.group if i < 3 else None)
+            for i in range(4)
+        ]
+        # Два поста вчера, один из них уходит в архив
+        Post.objects.filter(id__in=[posts[0].id, posts[1].id]).update(
+            pub_date=timezone.now() - timedelta(days=1))
+        for post in posts[:3]:
+            Comment.objects.create(post=post, author=cls.reader, text='Ком')
+            Like.objects.create(post=post, author=cls.reader)
+        archive_posts([posts[0].id])
+
+    def test_rebuild_rollups(self):
+        """Сводки считают горячие и архивные посты по дню публикации."""
+        call_command('rebuild_rollups', '--all', stdout=StringIO())
+        expected = {
+            (self.group.id, self.yesterday): (2, 2, 2),
+            (self.group.id, self.today): (1, 1, 1),
+            (None, self.today): (1, 0, 0),
+        }
+        rows = {
+            (stats.group_id, stats.day):
+                (stats.posts, stats.comments, stats.likes)
+            for stats in GroupDailyStats.objects.all()
+        }
+        self.assertEqual(rows, expected)
+        rows = {
+            (stats.author_id, stats.day):
+                (stats.posts, stats.comments, stats.likes)
+            for stats in AuthorDailyStats.objects.all()
+        }
+        self.assertEqual(rows, {
+            (self.author.id, self.yesterday): (2, 2, 2),
+            (self.author.id, self.today): (2, 1, 1),
+        })
+
+    def test_rebuild_replaces_days(self):
+        """Повторный пересчёт заменяет строки, а не дописывает."""
+        for _ in range(2):
+            call_command('rebuild_rollups', '--days', '2', stdout=StringIO())
+        self.assertEqual(GroupDailyStats.objects.count(), 3)
+        self.assertEqual(AuthorDailyStats.objects.count(), 2)
+
+    def test_analytics_reads_only_rollups(self):
+        """Дашборд в админке не трогает посты, комменты и лайки."""
+        call_command('rebuild_rollups', '--days', '2', stdout=StringIO())
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        client = Client()
+        client.force_login(admin)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse('admin:posts_analytics'))
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            self.assertNotRegex(
+                query['sql'], r'"posts_(post|comment|like|archived\w+)"')
+        self.assertEqual(
+            response.context['authors'][0]['likes_total'], 3)
@@ -0,0 +1,72 @@
+import json
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+
+from core.slow_queries import fingerprint, normalize
+
+from ..models import Post, User
+from .utils import get_reverse_url
+
+
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.post = Post.objects.create(
+            author=cls.user_author, text='Тестовый пост')
+
+    def test_normalize(self):
+        """Запросы, разные только значениями, дают один отпечаток."""
+        first = normalize(
+            "SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'Вася'")
+        second = normalize(
+            "SELECT *  FROM t WHERE id IN (%s, %s) AND name = 'it''s'")
+        self.assertEqual(first, 'SELECT * FROM t WHERE id IN (...) '
+                                'AND name = ?')
+        self.assertEqual(fingerprint(first), fingerprint(second))
+
+    def test_middleware_logs_view_caller_and_plan(self):
+        """В лог попадают view, строка кода и план запроса."""
+        url = get_reverse_url(('posts:post_detail', None, [self.post.id]))
+        # Middleware создаются на первом запросе клиента
+        with patch('core.middleware.SLOW_QUERY_THRESHOLD_MS', 0):
+            with self.assertLogs('yatube.slow_queries', 'WARNING') as logs:
+                Client().get(url)
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        post_query = next(
+            entry for entry in entries
+            if entry['sql'].startswith('SELECT')
+            and 'FROM "posts_post"' in entry['sql']
+        )
+        self.assertEqual(post_query['view'], 'posts:post_detail')
+        self.assertTrue(post_query['caller'].startswith('posts/views.py:'))
+        self.assertTrue(post_query['plan'])
+
+    def test_report(self):
+        """Сводка группирует по отпечатку и считает сумму и p95."""
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.log', encoding='utf-8') as log:
+            for duration in range(1, 21):
+                log.write(json.dumps({
+                    'fingerprint': 'aaaaaaaaaaaa', 'sql': 'SELECT ?',
+                    'duration_ms': duration, 'view': 'posts:index',
+                    'caller': 'posts/views.py:1 in index',
+                }) + '\n')
+            log.write(json.dumps({
+                'fingerprint': 'bbbbbbbbbbbb', 'sql': 'UPDATE ?',
+                'duration_ms': 500, 'view': None, 'caller': None,
+            }) + '\n')
+            log.flush()
+            out = StringIO()
+            call_command('slow_query_report', log.name, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            lines[1].split(), ['bbbbbbbbbbbb', '1', '500.0', '500.0'])
+        report = out.getvalue()
+        self.assertIn('aaaaaaaaaaaa       20       210.0      19.0', report)
+        self.assertIn('view: posts:index (20)', report)
@@ -0,0 +1,95 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, User, UserSearchPrefix
+from ..user_search import index_users, search_users
+from .utils import get_reverse_url
+
+
+class UserSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_ivan = User.objects.create_user(
+            username='ivan_writer', first_name='Иван', last_name='Петров')
+        cls.user_petr = User.objects.create_user(
+            username='petrovich', first_name='Пётр', last_name='Иванов')
+        cls.user_reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def found(self, query):
+        return [user for user, _ in search_users(query)]
+
+    def test_prefix_of_username_and_names(self):
+        """Ищем по началу username, имени, фамилии, без учёта регистра."""
+        self.assertEqual(self.found('IVAN_'), [self.user_ivan])
+        self.assertEqual(self.found('иван п'), [self.user_ivan])
+        self.assertEqual(self.found('Петро'), [self.user_ivan])
+        self.assertEqual(
+            set(self.found('иван')), {self.user_ivan, self.user_petr})
+        self.assertEqual(self.found('ivan_writer_long'), [])
+        self.assertEqual(self.found(''), [])
+
+    def test_ranked_by_followers(self):
+        """Популярные выше, подписки и отписки меняют порядок."""
+        follow = Follow.objects.create(
+            user=self.user_reader, author=self.user_petr)
+        self.assertEqual(
+            search_users('иван'), [(self.user_petr, 1), (self.user_ivan, 0)])
+        follow.delete()
+        Follow.objects.create(user=self.user_reader, author=self.user_ivan)
+        self.assertEqual(self.found('иван'), [self.user_ivan, self.user_petr])
+
+    def test_reindex_on_change(self):
+        """Смена имени переиндексирует юзера, неактивных не ищем."""
+        self.user_reader.first_name = 'Мария'
+        self.user_reader.save()
+        self.assertEqual(self.found('мар'), [self.user_reader])
+        self.user_reader.is_active = False
+        self.user_reader.save(update_fields=['is_active'])
+        self.assertEqual(self.found('мар'), [])
+
+    def test_lookup_queries(self):
+        """Поиск - чтение индекса и одна выборка юзеров."""
+        with self.assertNumQueries(2):
+            self.found('иван')
+
+    def test_follow_during_rebuild_counted(self):
+        """Подписка посреди пересборки строк не теряется."""
+        bulk_create = UserSearchPrefix.objects.bulk_create
+
+        def follow_then_insert(*args, **kwargs):
+            Follow.objects.create(user=self.user_reader, author=self.user_ivan)
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(UserSearchPrefix.objects, 'bulk_create',
+                               side_effect=follow_then_insert):
+            index_users([self.user_ivan])
+        self.assertEqual(search_users('ivan'), [(self.user_ivan, 1)])
+
+    def test_rebuild_command(self):
+        """Команда пересобирает индекс с нуля."""
+        UserSearchPrefix.objects.all().delete()
+        call_command('rebuild_user_search', stdout=StringIO())
+        self.assertEqual(self.found('petrov'), [self.user_petr])
+
+    def test_search_page_and_autocomplete(self):
+        """Страница поиска и JSON подсказок."""
+        response = self.guest_client.get(
+            get_reverse_url(('posts:user_search', None, None)), {'q': 'ivan'})
+        self.assertTemplateUsed(response, 'posts/user_search.html')
+        self.assertEqual(response.context['results'], [(self.user_ivan, 0)])
+        response = self.guest_client.get(
+            reverse('posts:user_autocomplete'), {'q': 'petrovi'})
+        self.assertEqual(response.json(), {'results': [{
+            'username': 'petrovich',
+            'full_name': 'Пётр Иванов',
+            'followers': 0,
+            'url': reverse('posts:profile', args=['petrovich']),
+        }]})
@@ -1,15 +1,25 @@
 import shutil
 import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
 from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
 
 from yatube.settings import POSTS_PER_PAGE
 
-from ..models import Comment, Follow, Group, Post, User
+from ..counters import post_views
+from ..models import (ArchivedComment, ArchivedPost, Comment, Follow, Group,
+                      Like, Post, Tag, User)
+from ..utils import mark_liked, with_engagement
 from .utils import checking_post_content, get_reverse_url
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -135,6 +145,29 @@ class AllTests(TestCase):
                     self.post.group.id, self.post.image
                 )
 
+    def test_page_show_engagement(self):
+        """В ленте у поста есть лайки, комментарии и отметка моего лайка."""
+        Like.objects.create(post=self.post, author=self.user_follower)
+        clients_liked = (
+            (self.authorized_follower, True),
+            (self.authorized_author, False),
+            (self.guest_client, False),
+        )
+        for client, liked in clients_liked:
+            with self.subTest(liked=liked):
+                response = client.get(get_reverse_url(self.group_list))
+                post = response.context['page_obj'][0]
+                self.assertEqual(post.likes_count, 1)
+                self.assertEqual(post.comments_count, 2)
+                self.assertEqual(post.liked, liked)
+
+    def test_cached_index_per_user(self):
+        """Закэшированная лента одного юзера не достаётся другому."""
+        Like.objects.create(post=self.post, author=self.user_follower)
+        url = get_reverse_url(self.index)
+        self.assertContains(self.authorized_follower.get(url), '💙')
+        self.assertNotContains(self.authorized_author.get(url), '💙')
+
     def test_post_detail_page_show_correct_context(self):
         """Шаблон post_detail сформирован с правильным контекстом."""
         response = self.authorized_author.get(get_reverse_url(self.detail))
@@ -332,3 +365,273 @@ class PostPagesPagenatorTest(TestCase):
                 self.assertEqual(
                     len(response.context['page_obj']),
                     posts_on_last_page)
+
+
+class FollowListTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.user_viewer = User.objects.create_user(username='Viewer')
+        cls.followers = [
+            User.objects.create_user(username=f'Follower{i}')
+            for i in range(25)
+        ]
+        for follower in cls.followers:
+            Follow.objects.create(user=follower, author=cls.user_author)
+        Follow.objects.create(user=cls.user_viewer, author=cls.followers[-1])
+        cls.followers_url = ('posts:profile_followers', None,
+                             [cls.user_author.username])
+        cls.following_url = ('posts:profile_following', None,
+                             [cls.user_viewer.username])
+        cls.profile = ('posts:profile', 'posts/profile.html',
+                       [cls.user_author.username])
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_viewer = Client()
+        self.authorized_viewer.force_login(self.user_viewer)
+
+    def test_followers_cursor_pages(self):
+        """Подписчики отдаются страницами по курсору, новые первыми."""
+        response = self.authorized_viewer.get(
+            get_reverse_url(self.followers_url))
+        users = response.context['users']
+        self.assertEqual(len(users), 20)
+        self.assertEqual(users[0], self.followers[-1])
+        response = self.authorized_viewer.get(
+            get_reverse_url(self.followers_url)
+            + f'?cursor={response.context["next_cursor"]}')
+        self.assertEqual(response.context['users'], self.followers[4::-1])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_followers_marks_followed(self):
+        """Отмечаем, на кого из списка подписан зритель."""
+        response = self.authorized_viewer.get(
+            get_reverse_url(self.followers_url))
+        followed = [user for user in response.context['users']
+                    if user.is_followed]
+        self.assertEqual(followed, [self.followers[-1]])
+
+    def test_following_list(self):
+        """Список подписок юзера."""
+        response = self.authorized_viewer.get(
+            get_reverse_url(self.following_url))
+        self.assertEqual(response.context['users'], [self.followers[-1]])
+
+    def test_follow_counts_cache_reset(self):
+        """Число подписчиков в профиле обновляется после подписки."""
+        response = self.authorized_viewer.get(get_reverse_url(self.profile))
+        self.assertEqual(response.context['followers_count'], 25)
+        Follow.objects.create(user=self.user_viewer, author=self.user_author)
+        response = self.authorized_viewer.get(get_reverse_url(self.profile))
+        self.assertEqual(response.context['followers_count'], 26)
+
+
+class TagFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.post = Post.objects.create(
+            author=cls.user_author,
+            text='Пост про #Django и #котиков',
+        )
+        Post.objects.create(author=cls.user_author, text='Без тегов')
+        cls.tag_list = ('posts:tag_posts', 'posts/tag_list.html',
+                        ['django'])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_tag_feed(self):
+        """В ленте тега только посты с этим тегом."""
+        response = self.guest_client.get(get_reverse_url(self.tag_list))
+        self.assertTemplateUsed(response, self.tag_list[1])
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    def test_tags_follow_text_edit(self):
+        """После правки текста теги поста пересобираются."""
+        self.assertEqual(
+            set(self.post.tags.values_list('name', flat=True)),
+            {'django', 'котиков'})
+        self.post.text = 'Теперь про #python'
+        self.post.save()
+        self.assertEqual(
+            list(self.post.tags.values_list('name', flat=True)), ['python'])
+
+    def test_backfill_tags(self):
+        """Команда разбирает теги постов, созданных без сигналов."""
+        Post.objects.bulk_create([
+            Post(author=self.user_author, text='Старый #архив')])
+        post = Post.objects.get(text='Старый #архив')
+        call_command('backfill_tags', chunk_size=1, stdout=StringIO())
+        self.assertEqual(
+            list(Tag.objects.get(name='архив').posts.all()), [post])
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(username='Writer')
+        for i in range(POSTS_PER_PAGE + 2):
+            post = Post.objects.create(
+                author=cls.user_author,
+                text=f'{i + 1}й тестовый пост',
+            )
+            Comment.objects.create(
+                post=post, author=cls.user_author, text='Коммент')
+        cls.old_ids = list(Post.objects.order_by('id').values_list(
+            'id', flat=True)[:5])
+        for i, post_id in enumerate(cls.old_ids):
+            Post.objects.filter(id=post_id).update(
+                pub_date=timezone.now() - timedelta(days=365, hours=5 - i))
+        cls.index = ('posts:index', 'posts/index.html', None)
+        cls.profile = ('posts:profile', 'posts/profile.html',
+                       [cls.user_author.username])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        call_command('archive_posts', batch_size=2, stdout=StringIO())
+
+    def test_old_posts_moved(self):
+        """Старые посты с комментариями уехали в архив."""
+        self.assertFalse(Post.objects.filter(id__in=self.old_ids).exists())
+        self.assertEqual(
+            sorted(ArchivedPost.objects.values_list('id', flat=True)),
+            self.old_ids)
+        self.assertEqual(
+            ArchivedComment.objects.filter(post_id__in=self.old_ids).count(),
+            len(self.old_ids))
+
+    def test_feed_falls_back_to_archive(self):
+        """Лента после горячих постов листает архивные."""
+        for url_tuple in (self.index, self.profile):
+            with self.subTest(url=url_tuple[0]):
+                url = get_reverse_url(url_tuple)
+                response = self.guest_client.get(url)
+                self.assertEqual(response.context['page_obj'][-1].id, 3)
+                response = self.guest_client.get(url + '?page=2')
+                self.assertEqual(
+                    [post.id for post in response.context['page_obj']],
+                    [2, 1])
+        self.assertEqual(response.context['posts_count'], POSTS_PER_PAGE + 2)
+
+    def test_archived_post_detail(self):
+        """Страница архивного поста открывается по старому id."""
+        response = self.guest_client.get(
+            get_reverse_url(('posts:post_detail', None, [1])))
+        self.assertTrue(response.context['archived'])
+        self.assertEqual(response.context['post'].text, '1й тестовый пост')
+        self.assertEqual(len(response.context['comments']), 1)
+
+
+class ViewCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Просмотры из прошлых тестов не должны попасть на новые посты
+        post_views.flush()
+        cls.user_author = User.objects.create_user(username='Writer')
+        cls.posts = [
+            Post.objects.create(author=cls.user_author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_views_buffered(self):
+        """Просмотры видны сразу, а в базу уходят при сбросе."""
+        post = self.posts[0]
+        url = get_reverse_url(('posts:post_detail', None, [post.id]))
+        for views in range(1, 4):
+            response = self.guest_client.get(url)
+            self.assertEqual(response.context['views'], views)
+        post.refresh_from_db()
+        self.assertEqual(post.views, 0)
+        post_views.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.views, 3)
+
+    def test_flush_is_one_update(self):
+        """Буфер по нескольким постам сбрасывается одним UPDATE."""
+        for count, post in enumerate(self.posts, start=1):
+            for _ in range(count):
+                post_views.add(post.id)
+        with self.assertNumQueries(1):
+            post_views.flush()
+        self.assertEqual(
+            list(Post.objects.order_by('id').values_list('views', flat=True)),
+            [1, 2, 3])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostCardTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create_user(
+            username='a.b+c@d', first_name='<Ann>', last_name='& Bob')
+        cls.group = Group.objects.create(
+            title='Группа <"1">', slug='test_slug')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        Post.objects.create(
+            author=cls.user_author, text='Пост <b>с картинкой</b> & группой',
+            group=cls.group, image=SimpleUploadedFile(
+                name='small.gif', content=small_gif,
+                content_type='image/gif'))
+        Post.objects.create(author=cls.user_author, text='Пост без группы')
+        post = Post.objects.create(author=cls.user_author, text='#тег')
+        Post.objects.filter(id=post.id).update(
+            text_html='<p><a href="/tags/тег/">#тег</a></p>')
+        Like.objects.create(author=cls.user_author, post=post)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def render(self, card, **context):
+        """Лента, как в шаблонах постов, с данной карточкой."""
+        return Template(
+            '{% load post_cards %}{% for post in posts %}' + card
+            + '{% if not forloop.last %}<hr>{% endif %}{% endfor %}'
+        ).render(Context(context))
+
+    def test_post_card_matches_include(self):
+        """post_card выдаёт байт в байт то же, что includes/post.html."""
+        posts = mark_liked(
+            list(with_engagement(Post.objects.select_related(
+                'author', 'group').order_by('id'))),
+            self.user_author)
+        unannotated = list(Post.objects.order_by('id'))
+        for context in ({}, {'author': self.user_author}):
+            for posts_list in (posts, unannotated):
+                annotated = posts_list is posts
+                with self.subTest(context=context, annotated=annotated):
+                    self.assertEqual(
+                        self.render('{% post_card post %}',
+                                    posts=posts_list, **context),
+                        self.render("{% include 'includes/post.html' %}",
+                                    posts=posts_list, **context))
+        self.assertIn('<img class="card-img my-2"',
+                      self.render('{% post_card post %}', posts=posts))
+
+    def test_routes_reversed_once(self):
+        """Маршруты разворачиваются один раз на рендер, а не на пост."""
+        posts = list(Post.objects.select_related('author', 'group'))
+        with patch('core.templatetags.post_cards.reverse',
+                   wraps=reverse) as mocked:
+            self.render('{% post_card post %}', posts=posts * 10)
+        self.assertEqual(mocked.call_count, 3)
@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import Client, LiveServerTestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core import warmup
+from core.storage import post_images
+
+from ..counters import post_views
+from ..models import Group, Post, User
+from .test_media import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+# Живой сервер: команда греет процессы по HTTP, как после деплоя
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class WarmUpTest(LiveServerTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Writer')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.post = Post(
+            author=self.user, group=self.group, text='Мем', views=10)
+        self.post.image.save('meme.gif', ContentFile(SMALL_GIF))
+
+    def tearDown(self):
+        post_views.flush()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_warm_up(self):
+        """Страницы запрошены без ошибок, превью нарезаны, время в отчёте."""
+        out = StringIO()
+        call_command(
+            'warm_up', '--url', self.live_server_url, '--pages', '2',
+            '--concurrency', '2', stdout=out)
+        report = {
+            line.split()[0]: line.split()[1:]
+            for line in out.getvalue().splitlines()[1:-1]
+        }
+        # Маршрут: число запросов, ошибок быть не должно
+        expected = {'index': '2', 'group_list': '1', 'profile': '1',
+                    'post_detail': '1', 'thumbnail': '1'}
+        for route, count in expected.items():
+            with self.subTest(route=route):
+                self.assertEqual(report[route][0], count)
+                self.assertEqual(report[route][2], '0.0')
+        self.assertIn('Прогрев занял', out.getvalue())
+        self.assertIsNotNone(default.kvstore.get(
+            ImageFile(self.post.image.name, storage=post_images)))
+        # Прогрев - не просмотр
+        self.assertEqual(post_views.get(self.post.id), 0)
+
+    def test_unsigned_warmup_header_counted(self):
+        """X-Warmup без подписи - обычный просмотр."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        response = Client().get(url, HTTP_X_WARMUP='1')
+        self.assertEqual(post_views.get(self.post.id), 1)
+        self.assertContains(response, '<img class="card-img my-2" src="')
+        Client().get(url, HTTP_X_WARMUP=warmup.make_token())
+        self.assertEqual(post_views.get(self.post.id), 1)
@@ -1,16 +1,44 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    # Поиск группы для формы поста
+    path(
+        'groups/autocomplete/',
+        views.group_autocomplete,
+        name='group_autocomplete'
+    ),
+    # Сколько вышло новых постов - для баннера в лентах
+    path('new-posts/', views.new_posts, name='new_posts'),
+    # Поиск авторов и подсказки к нему
+    path('people/', views.user_search, name='user_search'),
+    path(
+        'people/autocomplete/',
+        views.user_autocomplete,
+        name='user_autocomplete'
+    ),
+    # Посты с хэштегом
+    path('tag/<str:name>/', views.tag_posts, name='tag_posts'),
     # Главная страница
     path('', views.index, name='index'),
     # Профайл пользователя
     path('profile/<str:username>/', views.profile, name='profile'),
+    # Подписчики и подписки
+    path(
+        'profile/<str:username>/followers/',
+        views.profile_followers,
+        name='profile_followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.profile_following,
+        name='profile_following'
+    ),
     # Просмотр записи
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     # Создание поста
@@ -22,6 +50,12 @@ urlpatterns = [
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    # Кого почитать
+    path(
+        'follow/suggestions/',
+        views.follow_suggestions,
+        name='follow_suggestions'
+    ),
     # Follow
     path(
         'profile/<str:username>/follow/',
@@ -44,5 +78,35 @@ urlpatterns = [
         views.post_unlike,
         name='post_unlike'
     ),
-
+    # RSS и Atom ленты
+    path('feed/rss/', feeds.feed_view(feeds.PostsFeed), name='index_rss'),
+    path(
+        'feed/atom/', feeds.feed_view(feeds.PostsAtomFeed), name='index_atom'),
+    path(
+        'group/<slug:slug>/rss/',
+        feeds.feed_view(feeds.GroupPostsFeed),
+        name='group_rss'
+    ),
+    path(
+        'group/<slug:slug>/atom/',
+        feeds.feed_view(feeds.GroupPostsAtomFeed),
+        name='group_atom'
+    ),
+    path(
+        'profile/<str:username>/rss/',
+        feeds.feed_view(feeds.AuthorPostsFeed),
+        name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.feed_view(feeds.AuthorPostsAtomFeed),
+        name='profile_atom'
+    ),
+    # Карта сайта
+    path('sitemap.xml', feeds.sitemap_index, name='sitemap'),
+    path(
+        'sitemap-<int:chunk>.xml',
+        feeds.sitemap_chunk,
+        name='sitemap_chunk'
+    ),
 ]
@@ -0,0 +1,69 @@
+"""Поиск юзеров по началу username, имени или фамилии.
+
+LIKE по auth_user индекс не использует, поэтому для каждого юзера храним
+строки UserSearchPrefix: все префиксы его нормализованных имён
+(search_key) длиной до USER_SEARCH_PREFIX_LENGTH и число подписчиков.
+Поиск - точное совпадение префикса по индексу (prefix, -followers):
+первые строки индекса и есть самые популярные юзеры, сортировать
+ничего не надо. Запрос длиннее префикса дофильтровывается по term
+среди строк того же префикса. Строки пересобираются на изменении
+юзера, число подписчиков меняют сигналы подписок.
+"""
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from yatube.settings import USER_SEARCH_LIMIT, USER_SEARCH_PREFIX_LENGTH
+
+from .models import Follow, User, UserSearchPrefix, search_key
+
+# Поля юзера, от которых зависят его строки поиска
+INDEXED_FIELDS = {'username', 'first_name', 'last_name', 'is_active'}
+
+
+def user_terms(user):
+    """username, "имя фамилия" и фамилия в виде для поиска."""
+    names = (user.username, f'{user.first_name} {user.last_name}',
+             user.last_name)
+    return {search_key(name) for name in names} - {''}
+
+
+def index_users(users):
+    """Пересобираем строки поиска юзеров; неактивных в поиске нет."""
+    users = list(users)
+    ids = [user.id for user in users]
+    rows = [
+        UserSearchPrefix(prefix=term[:length], term=term, user_id=user.id)
+        for user in users if user.is_active
+        for term in user_terms(user)
+        for length in range(1, min(len(term), USER_SEARCH_PREFIX_LENGTH) + 1)
+    ]
+    followers = Follow.objects.filter(author_id=OuterRef('user_id')).order_by(
+    ).values('author_id').annotate(count=Count('id')).values('count')
+    with transaction.atomic():
+        UserSearchPrefix.objects.filter(user_id__in=ids).delete()
+        UserSearchPrefix.objects.bulk_create(rows, batch_size=500)
+        # Считаем подписчиков уже по вставленным строкам: подписка во
+        # время пересборки поменяла бы удалённые строки и потерялась
+        UserSearchPrefix.objects.filter(user_id__in=ids).update(
+            followers=Coalesce(Subquery(followers), 0))
+
+
+def search_users(query, limit=USER_SEARCH_LIMIT):
+    """[(юзер, подписчиков)] - самые популярные с именем на query."""
+    query = search_key(query)[:300]
+    if not query:
+        return []
+    rows = UserSearchPrefix.objects.filter(
+        prefix=query[:USER_SEARCH_PREFIX_LENGTH]).order_by('-followers')
+    if len(query) > USER_SEARCH_PREFIX_LENGTH:
+        rows = rows.filter(term__startswith=query)
+    found = {}
+    # У юзера может совпасть и username, и имя - берём с запасом
+    for user_id, count in rows.values_list(
+            'user_id', 'followers')[:limit * 3]:
+        found.setdefault(user_id, count)
+    ids = list(found)[:limit]
+    users = User.objects.in_bulk(ids)
+    return [(users[user_id], found[user_id])
+            for user_id in ids if user_id in users]
@@ -1,6 +1,16 @@
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from yatube.settings import POSTS_PER_PAGE
+from yatube.settings import (FOLLOW_COUNTS_TIMEOUT, GROUP_CHOICES_TIMEOUT,
+                             POSTS_PER_PAGE)
+
+from .archive import HotColdPosts
+from .models import (ArchivedComment, ArchivedLike, ArchivedPost, Comment,
+                     Follow, Group, Like, pending_user_ids)
+
+GROUP_CHOICES_KEY = 'group_choices'
 
 
 def paginate(posts_list, request):
@@ -9,3 +19,117 @@ def paginate(posts_list, request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def count_related(model):
+    """Подзапрос: сколько записей model ссылается на пост."""
+    # Лайки и комментарии юзеров, ждущих удаления, не считаем
+    counts = model.objects.filter(post=OuterRef('pk')).exclude(
+        author_id__in=pending_user_ids()).order_by().values(
+        'post').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def with_engagement(posts_list):
+    """Добавляем к постам количество лайков и комментариев."""
+    if isinstance(posts_list, HotColdPosts):
+        return posts_list.map(with_engagement)
+    if posts_list.model is ArchivedPost:
+        like_model, comment_model = ArchivedLike, ArchivedComment
+    else:
+        like_model, comment_model = Like, Comment
+    return posts_list.annotate(
+        likes_count=count_related(like_model),
+        comments_count=count_related(comment_model),
+    )
+
+
+def mark_liked(page_obj, user):
+    """Отмечаем посты страницы, которые лайкнул пользователь.
+
+    Один запрос с IN на всю страницу вместо запроса на каждый пост.
+    """
+    liked = set()
+    if user.is_authenticated:
+        archived = [post.id for post in page_obj
+                    if isinstance(post, ArchivedPost)]
+        hot = [post.id for post in page_obj
+               if not isinstance(post, ArchivedPost)]
+        for like_model, ids in ((Like, hot), (ArchivedLike, archived)):
+            if ids:
+                liked.update(like_model.objects.filter(
+                    author=user, post_id__in=ids
+                ).values_list('post_id', flat=True))
+    for post in page_obj:
+        post.liked = post.id in liked
+    return page_obj
+
+
+def paginate_posts(posts_list, request, archived_list=None):
+    """Страница постов с лайками, комментариями и отметкой "мой лайк".
+
+    Если передан archived_list, за горячими постами листаются архивные.
+    """
+    if archived_list is not None:
+        posts_list = HotColdPosts(posts_list, archived_list)
+    page_obj = paginate(posts_list, request)
+    # Посты считаем без подзапросов, а аннотируем только саму страницу
+    if page_obj.paginator.count:
+        page_obj.object_list = with_engagement(posts_list)[
+            page_obj.start_index() - 1:page_obj.end_index()]
+    return mark_liked(page_obj, request.user)
+
+
+def cursor_paginate(queryset, request, per_page):
+    """Страница по курсору ?cursor=<id>: без COUNT и OFFSET.
+
+    Возвращает записи страницы и курсор следующей (или None).
+    """
+    cursor = request.GET.get('cursor', '')
+    if cursor.isdigit():
+        queryset = queryset.filter(id__lt=int(cursor))
+    items = list(queryset.order_by('-id')[:per_page + 1])
+    next_cursor = items[per_page - 1].id if len(items) > per_page else None
+    return items[:per_page], next_cursor
+
+
+def follow_counts_key(user_id):
+    return f'follow_counts:{user_id}'
+
+
+def follow_counts(user):
+    """Число подписчиков и подписок юзера, недолго держим в кэше.
+
+    Спрятанных юзеров не считаем, как и в списках подписок.
+    """
+    key = follow_counts_key(user.id)
+    counts = cache.get(key)
+    if counts is None:
+        counts = (
+            Follow.objects.filter(author=user).exclude(
+                user_id__in=pending_user_ids()).count(),
+            Follow.objects.filter(user=user).exclude(
+                author_id__in=pending_user_ids()).count(),
+        )
+        cache.set(key, counts, FOLLOW_COUNTS_TIMEOUT)
+    return counts
+
+
+def followed_ids(user, author_ids):
+    """На кого из author_ids подписан user - одним запросом."""
+    if not user.is_authenticated:
+        return set()
+    return set(Follow.objects.filter(
+        user=user, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+
+
+def group_choices():
+    """(id, название) всех групп, недолго держим в кэше."""
+    choices = cache.get(GROUP_CHOICES_KEY)
+    if choices is None:
+        choices = list(Group.objects.filter(
+            pending_deletion=False).order_by('title').values_list(
+            'id', 'title'))
+        cache.set(GROUP_CHOICES_KEY, choices, GROUP_CHOICES_TIMEOUT)
+    return choices
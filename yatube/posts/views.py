@@ -1,56 +1,153 @@
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_cookie
+
+from core import warmup
+from yatube.settings import (FOLLOW_SUGGESTIONS_COUNT, FOLLOWS_PER_PAGE,
+                             GROUP_AUTOCOMPLETE_LIMIT)
 
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Like, Post, User
-from .utils import paginate
+from .archive import cached_count
+from .counters import post_views
+from .new_posts import count_newer, follow_feed, follow_token
+from .related import related_posts
+from .user_search import search_users
+from .models import (ArchivedLike, ArchivedPost, Follow, FollowSuggestion,
+                     Group, Like, Post, Tag, User, pending_user_ids,
+                     search_key, visible_users)
+from .utils import (cursor_paginate, follow_counts, followed_ids,
+                    paginate_posts)
 
 
+# В ленте отметки лайков юзера: кэш страницы - свой на каждую сессию.
+# Vary ставим до cache_page, иначе ключ кэша учтёт его только потом
 @cache_page(5, key_prefix='index_page')
+@vary_on_cookie
 def index(request):
     """Отображаем главную страничку со всеми постами."""
-    posts_list = Post.objects.select_related('group', 'author')
-    page_obj = paginate(posts_list, request)
+    posts_list = Post.objects.visible().select_related('group', 'author')
+    archived_list = ArchivedPost.objects.visible().select_related(
+        'group', 'author')
+    page_obj = paginate_posts(posts_list, request, archived_list)
     context = {'page_obj': page_obj}
     return render(request, 'posts/index.html', context)
 
 
 def group_posts(request, slug):
     """Отображаем посты фильтруя по группе."""
-    group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts.select_related('author')
-    page_obj = paginate(posts_list, request)
+    group = get_object_or_404(Group, slug=slug, pending_deletion=False)
+    posts_list = group.posts.visible().select_related('author')
+    archived_list = group.archived_posts.visible().select_related('author')
+    page_obj = paginate_posts(posts_list, request, archived_list)
     context = {'group': group, 'page_obj': page_obj}
     return render(request, 'posts/group_list.html', context)
 
 
+def tag_posts(request, name):
+    """Отображаем посты с хэштегом."""
+    tag = get_object_or_404(Tag, name=name.lower())
+    posts_list = tag.posts.visible().select_related('group', 'author')
+    page_obj = paginate_posts(posts_list, request)
+    context = {'tag': tag, 'page_obj': page_obj}
+    return render(request, 'posts/tag_list.html', context)
+
+
 def profile(request, username):
     """Отображаем посты фильтруя по юзеру."""
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(visible_users(), username=username)
     posts_list = author.posts.select_related('group', 'author')
-    posts_count = posts_list.count()
-    page_obj = paginate(posts_list, request)
+    archived_list = author.archived_posts.select_related('group', 'author')
+    page_obj = paginate_posts(posts_list, request, archived_list)
+    posts_count = page_obj.paginator.count
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
+    followers_count = following_count = None
+    # Под перегрузкой (core.overload) счётчики подписок не считаем
+    if not getattr(request, 'degraded', False):
+        followers_count, following_count = follow_counts(author)
     context = {
         'author': author,
         'page_obj': page_obj,
         'posts_count': posts_count,
         'following': following,
+        'followers_count': followers_count,
+        'following_count': following_count,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def follow_list(request, username, followers):
+    """Подписчики или подписки юзера, страницы по курсору."""
+    author = get_object_or_404(visible_users(), username=username)
+    if followers:
+        follows = author.following.exclude(
+            user_id__in=pending_user_ids()).select_related('user')
+    else:
+        follows = author.follower.exclude(
+            author_id__in=pending_user_ids()).select_related('author')
+    follows, next_cursor = cursor_paginate(follows, request, FOLLOWS_PER_PAGE)
+    users = [
+        follow.user if followers else follow.author for follow in follows
+    ]
+    followed = followed_ids(request.user, [user.id for user in users])
+    for user in users:
+        user.is_followed = user.id in followed
+    followers_count, following_count = follow_counts(author)
+    context = {
+        'author': author,
+        'users': users,
+        'next_cursor': next_cursor,
+        'followers': followers,
+        'followers_count': followers_count,
+        'following_count': following_count,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+def profile_followers(request, username):
+    """Отображаем подписчиков юзера."""
+    return follow_list(request, username, followers=True)
+
+
+def profile_following(request, username):
+    """Отображаем, на кого подписан юзер."""
+    return follow_list(request, username, followers=False)
+
+
 def post_detail(request, post_id):
     """Отображаем пост фильтруя по id и прочую инфу."""
-    post = get_object_or_404(
-        Post.objects.select_related('author'), id=post_id)
-    posts_count = post.author.posts.count()
-    comments = post.comments.all()
-    like = request.user.is_authenticated and Like.objects.filter(
+    post = Post.objects.visible().select_related('author').filter(
+        id=post_id).first()
+    archived = post is None
+    if archived:
+        # Среди горячих поста нет, ищем в архиве
+        post = get_object_or_404(
+            ArchivedPost.objects.visible().select_related('author'),
+            id=post_id)
+    views = post.views
+    # Прогрев после деплоя (warm_up) просмотром не считаем
+    if not archived and not warmup.requested(request):
+        post_views.add(post.id)
+        views += post_views.get(post.id)
+    like_model = ArchivedLike if archived else Like
+    like = request.user.is_authenticated and like_model.objects.filter(
         post_id=post_id, author=request.user).exists()
-    likes_count = post.likes.count()
+    degraded = getattr(request, 'degraded', False)
+    # Под перегрузкой (core.overload) без счётчиков и комментариев
+    posts_count = comments = likes_count = None
+    related = []
+    if not degraded:
+        posts_count = post.author.posts.count() + cached_count(
+            post.author.archived_posts.all())
+        comments = post.comments.exclude(
+            author_id__in=pending_user_ids()).select_related('author')
+        likes_count = post.likes.exclude(
+            author_id__in=pending_user_ids()).count()
+        if not archived:
+            related = related_posts(post)
     context = {
         'post': post,
         'posts_count': posts_count,
@@ -58,7 +155,10 @@ def post_detail(request, post_id):
         'comments': comments,
         'like': like,
         'likes_count': likes_count,
-
+        'archived': archived,
+        'views': views,
+        'degraded': degraded,
+        'related': related,
     }
     return render(request, 'posts/post_detail.html', context)
 
@@ -85,7 +185,12 @@ def post_edit(request, post_id):
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if request.method == "POST" and form.is_valid():
-        post = form.save()
+        post = form.save(commit=False)
+        # Просмотры пишет буфер через F(): своё старое значение views
+        # не сохраняем, иначе затрём набежавшие после загрузки поста
+        post.save(update_fields=[
+            *PostForm._meta.fields, 'text_html', 'text_html_version',
+            'updated'])
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, 'posts/post_create.html',
                   {'form': form, 'is_edit': is_edit})
@@ -94,7 +199,7 @@ def post_edit(request, post_id):
 @login_required
 def add_comment(request, post_id):
     """Добавляем коммент."""
-    post = get_object_or_404(Post.objects.all(), id=post_id)
+    post = get_object_or_404(Post.objects.visible(), id=post_id)
     form = CommentForm(request.POST or None)
     if request.method == "POST" and form.is_valid():
         comment = form.save(commit=False)
@@ -108,20 +213,38 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Отображаем страничку с постами по подписке."""
     user = request.user
-    posts_list = Post.objects.filter(
+    posts_list = Post.objects.visible().filter(
         author__following__user=user
     ).select_related('group', 'author')
-    page_obj = paginate(posts_list, request)
-    context = {'page_obj': page_obj}
+    archived_list = ArchivedPost.objects.visible().filter(
+        author__following__user=user
+    ).select_related('group', 'author')
+    if getattr(request, 'degraded', False):
+        # Под перегрузкой (core.overload) в архив с его COUNT не ходим
+        archived_list = None
+    page_obj = paginate_posts(posts_list, request, archived_list)
+    context = {'page_obj': page_obj, 'new_posts_token': follow_token(user)}
     return render(request, 'posts/follow.html', context)
 
 
+@login_required
+def follow_suggestions(request):
+    """Отображаем заранее посчитанные рекомендации "Кого почитать"."""
+    suggestions = request.user.follow_suggestions.exclude(
+        author_id__in=pending_user_ids()).select_related(
+        'author')[:FOLLOW_SUGGESTIONS_COUNT]
+    context = {'suggestions': suggestions}
+    return render(request, 'posts/follow_suggestions.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     """Подписываемся."""
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(visible_users(), username=username)
     if author != request.user:
         Follow.objects.get_or_create(author=author, user=request.user)
+        FollowSuggestion.objects.filter(
+            user=request.user, author=author).delete()
     return redirect('posts:profile', username)
 
 
@@ -145,3 +268,62 @@ def post_unlike(request, post_id):
     """Unlike."""
     Like.objects.filter(post_id=post_id, author=request.user).delete()
     return redirect('posts:post_detail', post_id=post_id)
+
+
+def group_autocomplete(request):
+    """Группы по началу названия - для поиска группы в форме поста."""
+    prefix = search_key(request.GET.get('q', ''))[:200]
+    groups = Group.objects.filter(
+        pending_deletion=False).order_by('search_title')
+    if prefix:
+        # Диапазон по индексу вместо LIKE, который индекс не использует
+        groups = groups.filter(
+            search_title__gte=prefix, search_title__lt=prefix + '\U0010ffff')
+    results = [
+        {'id': pk, 'title': title}
+        for pk, title in groups.values_list(
+            'id', 'title')[:GROUP_AUTOCOMPLETE_LIMIT]
+    ]
+    return JsonResponse({'results': results})
+
+
+def user_search(request):
+    """Поиск авторов по началу username, имени или фамилии."""
+    query = request.GET.get('q', '')
+    context = {'query': query, 'results': search_users(query)}
+    return render(request, 'posts/user_search.html', context)
+
+
+def user_autocomplete(request):
+    """Подсказки к поиску авторов, самые популярные первыми."""
+    results = [
+        {
+            'username': user.username,
+            'full_name': user.get_full_name(),
+            'followers': followers,
+            'url': reverse('posts:profile', args=[user.username]),
+        }
+        for user, followers in search_users(request.GET.get('q', ''))
+    ]
+    return JsonResponse({'results': results})
+
+
+def new_posts(request):
+    """Сколько постов новее ?after=<id> - по кольцам, см. posts.new_posts.
+
+    Лента: общая, ?group=<id> или подписки по ?follow=<токен>.
+    """
+    after = request.GET.get('after', '0')
+    group = request.GET.get('group')
+    token = request.GET.get('follow')
+    if token:
+        feed = follow_feed(token)
+    elif group:
+        scope = f'group:{group}'
+        feed = (scope, [scope]) if group.isdigit() else None
+    else:
+        feed = ('all', ['all'])
+    if feed is None or not after.isdigit():
+        return HttpResponseBadRequest()
+    count, more = count_newer(*feed, int(after))
+    return JsonResponse({'count': count, 'more': more})
@@ -0,0 +1,24 @@
+# users/admin.py
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+
+from posts.deletion import schedule_user_deletion
+
+User = get_user_model()
+
+# Стандартную админку юзеров заменяем своей - с удалением в фоне
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class YatubeUserAdmin(UserAdmin):
+    actions = ('schedule_deletion',)
+
+    def schedule_deletion(self, request, queryset):
+        for user in queryset:
+            schedule_user_deletion(user)
+        self.message_user(
+            request, f'Юзеры скрыты и стоят в очереди на удаление: '
+            f'{len(queryset)}. Удалит их команда process_deletions.')
+    schedule_deletion.short_description = 'Удалить в фоне'
@@ -14,11 +14,131 @@ import os
 
 POSTS_PER_PAGE = 10
 
+# Сколько авторов рекомендуем в "Кого почитать"
+FOLLOW_SUGGESTIONS_COUNT = 10
+
+# Подписчиков/подписок на страницу и сколько держать их число в кэше.
+# Кэш у каждого процесса свой, а сигнал подписки сбрасывает его только
+# в своём процессе, поэтому в других число отстаёт не дольше таймаута
+FOLLOWS_PER_PAGE = 20
+FOLLOW_COUNTS_TIMEOUT = 30
+
+# Посты старше стольки дней archive_posts переносит в архивные таблицы,
+# число архивных постов в ленте держим в кэше
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_COUNT_TIMEOUT = 10 * 60
+
+# Просмотры постов копятся в памяти процесса и пишутся в базу пачкой,
+# когда набралось столько просмотров или прошло столько секунд
+VIEWS_FLUSH_SIZE = 100
+VIEWS_FLUSH_INTERVAL = 10
+
+# Постов в RSS/Atom ленте, сколько держать ленту в кэше (ключ меняется
+# с новым постом) и сколько id постов в одном куске карты сайта
+FEED_ITEMS = 20
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
+SITEMAP_CHUNK_SIZE = 10000
+
+# Группы для формы поста держим в кэше недолго: сигнал изменения групп
+# сбрасывает его только в своём процессе. Когда групп больше
+# GROUP_SELECT_LIMIT, вместо списка - поиск по началу названия
+GROUP_CHOICES_TIMEOUT = 60
+GROUP_SELECT_LIMIT = 200
+GROUP_AUTOCOMPLETE_LIMIT = 20
+
+# Поиск юзеров по началу имени: префиксы до такой длины лежат в
+# таблице UserSearchPrefix, результатов на странице и в подсказках
+USER_SEARCH_PREFIX_LENGTH = 10
+USER_SEARCH_LIMIT = 20
+
+# Похожих постов на странице поста; термы, которые встречаются больше
+# чем в такой доле постов группы, для сходства не используем
+RELATED_POSTS_COUNT = 5
+RELATED_MAX_DF = 0.5
+
+# Для баннера "Новых постов: N" помним id стольких последних постов
+# общей ленты, каждой группы и автора и держим их в общем кэше столько
+# секунд. Ленту подписок собираем из колец стольких последних авторов,
+# их список процесс держит у себя столько секунд
+NEW_POSTS_RING_SIZE = 50
+NEW_POSTS_TIMEOUT = 24 * 60 * 60
+NEW_POSTS_FOLLOW_AUTHORS = 500
+NEW_POSTS_FOLLOWS_TIMEOUT = 60
+
+# Деградированный режим (core.overload): процесс входит в него, когда
+# запросов в работе больше OVERLOAD_MAX_IN_FLIGHT или среднее время
+# ответа выше OVERLOAD_LATENCY_MS. Тогда анонимам страницы
+# OVERLOAD_STALE_VIEWS отдаются из копии (обновляем её не чаще раза в
+# OVERLOAD_STALE_REFRESH секунд, храним OVERLOAD_STALE_TIMEOUT; копии
+# только первых OVERLOAD_STALE_MAX_PAGE страниц), а записи
+# OVERLOAD_SHED_VIEWS получают 503 с Retry-After
+OVERLOAD_MAX_IN_FLIGHT = 50
+OVERLOAD_LATENCY_MS = 1000
+OVERLOAD_RETRY_AFTER = 30
+OVERLOAD_STALE_REFRESH = 30
+OVERLOAD_STALE_TIMEOUT = 60 * 60
+OVERLOAD_STALE_MAX_PAGE = 5
+OVERLOAD_STALE_VIEWS = (
+    'posts:index', 'posts:group_list', 'posts:tag_posts', 'posts:profile',
+    'posts:post_detail',
+)
+OVERLOAD_SHED_VIEWS = (
+    'posts:post_like', 'posts:post_unlike', 'posts:add_comment',
+    'posts:profile_follow', 'posts:profile_unfollow',
+)
+
+# Ответы короче COMPRESS_MIN_LENGTH байт и не этих типов не сжимаем;
+# сжатое тело кэшируемых страниц держим в кэше столько секунд
+COMPRESS_MIN_LENGTH = 200
+COMPRESS_CONTENT_TYPES = (
+    'text/', 'application/json', 'application/javascript',
+    'application/xml', 'application/rss+xml', 'application/atom+xml',
+)
+COMPRESSED_CACHE_TIMEOUT = 10 * 60
+
+# process_deletions удаляет зависимые строки юзеров и групп пачками по
+# столько строк, каждая пачка - своя транзакция, между ними пауза в
+# секундах, чтобы другие запросы успевали взять блокировку записи
+DELETION_BATCH_SIZE = 500
+DELETION_BATCH_PAUSE = 0.05
+
+# gc_media удаляет мусор (картинки без постов, строки kvstore sorl,
+# превью без строк, протухшие сессии) пачками по столько штук с паузой
+# между ними. Файлы моложе GC_MIN_AGE секунд не трогаем: их пост может
+# быть ещё не сохранён
+GC_BATCH_SIZE = 500
+GC_BATCH_PAUSE = 0.05
+GC_MIN_AGE = 60 * 60
+
+# warm_up после деплоя прогревает столько страниц общей ленты и
+# столько самых популярных групп, профилей и постов. Столько секунд
+# действует подпись его заголовка X-Warmup
+WARM_INDEX_PAGES = 5
+WARM_TOP_COUNT = 20
+WARMUP_TOKEN_MAX_AGE = 60 * 60
+
+# Запросы к базе дольше порога пишутся в SLOW_QUERY_LOG с планом,
+# сводку по логу печатает slow_query_report
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# 'default' у каждого процесса свой. В 'shared' лежит то, что должны
+# видеть все воркеры (core.shared, кольца new_posts): по умолчанию это
+# таблица в базе, её создаёт `manage.py createcachetable`. Подойдёт
+# и memcached/redis - лишь бы один на все процессы
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_shared_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
+# Сколько секунд процесс держит у себя прочитанное из 'shared'
+SHARED_REFRESH = 2
 
 # Имя view-функции, обрабатывающей ошибку 403
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -35,6 +155,37 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.log')
+
+# Профили запросов по требованию (core.profiling): сколько хранить,
+# как часто снимать стек и сколько живёт токен заголовка X-Profile
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILE_MAX_COUNT = 50
+PROFILE_SAMPLE_INTERVAL = 0.002
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': SLOW_QUERY_LOG_MAX_BYTES,
+            'backupCount': SLOW_QUERY_LOG_BACKUPS,
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
@@ -71,10 +222,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.OverloadMiddleware',
+    'core.middleware.SlowQueryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -157,3 +312,9 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Кто отдаёт байты media: None - сама Django через FileResponse,
+# 'X-Accel-Redirect' - nginx (internal location MEDIA_ACCEL_PREFIX
+# смотрит в MEDIA_ROOT), 'X-Sendfile' - apache или lighttpd
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
@@ -4,6 +4,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import media
+
 # хотя теория говорит что 403 здесь не надо
 # но пайтест ругается
 handler403 = 'core.views.csrf_failure'
@@ -19,12 +21,12 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('', include('core.urls', namespace='core')),
+    # media отдаём и в проде: с прокси байты шлёт он, см. MEDIA_SENDFILE_HEADER
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', media, name='media'),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
     urlpatterns += static(
         settings.STATIC_URL, document_root=settings.STATIC_ROOT
     )